@@ -0,0 +1,135 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_query_db, get_pool_stats
+from app.models.telemetry import CompressionStatsResponse, ChunkSizingAdvice, RefreshStatsResponse, CacheStatsResponse, StreamStatsResponse, QueryStatsResponse, PoolStatsResponse
+from app.services.storage_service import StorageService
+from app.services.refresh_service import refresh_scheduler
+from app.services.metrics_service import metrics_cache
+from app.services.series_cache import series_cache
+from app.services.stream_hub import stream_hub
+from app.services.query_governor import statement_stats
+from app.core.auth_dependency import authenticate_user_endpoint
+from typing import Dict, Any
+
+router = APIRouter()
+
+@router.get("/admin/compression", response_model=CompressionStatsResponse)
+async def get_compression_stats(
+    db: AsyncSession = Depends(get_query_db),
+    current_user: Dict[str, Any] = Depends(authenticate_user_endpoint)
+):
+    """
+    Get TimescaleDB compression statistics.
+    Reports chunk counts, sizes before and after compression and the resulting
+    compression ratio for the requests hypertable and every continuous aggregate.
+    Requires API key authentication via X-API-Key header.
+    """
+
+    storage_service = StorageService(db)
+    try:
+        return await storage_service.get_compression_stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch compression stats: {str(e)}")
+
+
+@router.get("/admin/chunk-advisor", response_model=ChunkSizingAdvice)
+async def get_chunk_advice(
+    db: AsyncSession = Depends(get_query_db),
+    current_user: Dict[str, Any] = Depends(authenticate_user_endpoint)
+):
+    """
+    Get a chunk sizing recommendation for the requests hypertable.
+    Suggests a chunk interval and a number of service hash partitions based on
+    observed data volume, available memory and per-service traffic.
+    Requires API key authentication via X-API-Key header.
+    """
+
+    storage_service = StorageService(db)
+    try:
+        return await storage_service.get_chunk_advice()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to compute chunk advice: {str(e)}")
+
+
+@router.get("/admin/refresh", response_model=RefreshStatsResponse)
+async def get_refresh_stats(
+    current_user: Dict[str, Any] = Depends(authenticate_user_endpoint)
+):
+    """
+    Get targeted continuous aggregate refresh statistics of this process.
+    Reports pending dirty buckets, refresh lag and the work done in the last
+    refresh cycle for every continuous aggregate.
+    Requires API key authentication via X-API-Key header.
+    """
+    return refresh_scheduler.get_stats()
+
+
+@router.get("/admin/stream", response_model=StreamStatsResponse)
+async def get_stream_stats(
+    current_user: Dict[str, Any] = Depends(authenticate_user_endpoint)
+):
+    """
+    Get realtime stream statistics of this process.
+    Reports the distinct filter sets being computed and their subscribers;
+    computations grow with channels, not with subscribers.
+    Requires API key authentication via X-API-Key header.
+    """
+    return stream_hub.get_stats()
+
+
+@router.get("/admin/queries", response_model=QueryStatsResponse)
+async def get_query_stats(
+    current_user: Dict[str, Any] = Depends(authenticate_user_endpoint)
+):
+    """
+    Get metrics statement statistics of this process.
+    Reports governed query outcomes and, per canonical statement, the
+    planning time from its cost estimate and the execution time.
+    Requires API key authentication via X-API-Key header.
+    """
+    return statement_stats.get_stats()
+
+
+@router.get("/admin/pools", response_model=PoolStatsResponse)
+async def get_connection_pool_stats(
+    current_user: Dict[str, Any] = Depends(authenticate_user_endpoint)
+):
+    """
+    Get connection pool statistics of this process.
+    Reports the ingest and query pools with their connections in use and
+    how long checkouts waited for a free connection.
+    Requires API key authentication via X-API-Key header.
+    """
+    return get_pool_stats()
+
+
+@router.get("/admin/cache", response_model=CacheStatsResponse)
+async def get_cache_stats(
+    current_user: Dict[str, Any] = Depends(authenticate_user_endpoint)
+):
+    """
+    Get metrics query result cache statistics of this process.
+    Reports hits, misses, lookups that joined an in-flight identical query
+    and the number of cached entries, together with the closed time series
+    bucket cache.
+    Requires API key authentication via X-API-Key header.
+    """
+    stats = metrics_cache.get_stats()
+    stats.series = series_cache.get_stats()
+    return stats
+
+
+@router.delete("/admin/cache", response_model=CacheStatsResponse)
+async def clear_cache(
+    current_user: Dict[str, Any] = Depends(authenticate_user_endpoint)
+):
+    """
+    Drop all cached metrics query results and time series buckets, e.g. after
+    backfilling old data.
+    Requires API key authentication via X-API-Key header.
+    """
+    await metrics_cache.clear()
+    series_cache.clear()
+    stats = metrics_cache.get_stats()
+    stats.series = series_cache.get_stats()
+    return stats
@@ -1,16 +1,261 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.core.database import get_db
-from app.models.telemetry import MetricsQuery, DashboardMetricsResponse
+from app.core.database import get_query_db, QuerySessionLocal
+from app.models.telemetry import (
+    MetricsQuery,
+    DashboardMetricsResponse,
+    PartialDashboardMetricsResponse,
+    ColumnarDashboardMetricsResponse,
+    ColumnarTimeSeries,
+    ExemplarDrilldownResponse,
+    DimensionValuesResponse,
+    TimeSeriesDataPoint,
+    MetricsCardsSummary,
+    EndpointAggregation,
+    StatusDistribution,
+    ConsumerAggregation,
+    SystemOverview
+)
 from app.services.metrics_service import MetricsService
+from app.services.metrics_query import LIST_PANEL_KEYS, is_other_item
+from app.services.exemplar_service import ExemplarService
+from app.services.dimension_catalog import CATALOG_DIMENSIONS, DimensionCatalogService
+from app.services.stream_hub import stream_hub
+from app.services.query_governor import (
+    ClientDisconnectedError,
+    QueryTimeoutError,
+    QueryTooExpensiveError,
+    cancel_on_disconnect
+)
 from app.core.auth_dependency import authenticate_user_endpoint
-from typing import Optional, Dict, Any
-from datetime import datetime
+from app.core.config import settings
+from app.core.responses import MSGPACK_MEDIA_TYPE, dump_json, etag_matches, negotiated_media_type, negotiated_response
+from typing import Optional, Dict, Any, List, Tuple, Union
+from datetime import datetime, timedelta
+import asyncio
+import base64
+import json
 
 router = APIRouter()
 
-@router.get("/metrics/aggregate", response_model=DashboardMetricsResponse)
+PANELS_DESCRIPTION = (
+    "Comma separated panels to compute (time_series, metrics_summary, endpoints, status_distribution, "
+    "consumers, system_overview, distinct_nodes, distinct_contexts). Defaults to all panels."
+)
+
+FORMAT_DESCRIPTION = (
+    "Time series encoding: rows (one object per bucket) or columnar (a start time, "
+    "a step and one array per metric, with nulls for empty buckets)"
+)
+
+MAX_POINTS_DESCRIPTION = (
+    "Upper bound on time series buckets; wider aligned buckets (15m, 30m, 3h, 6h, 12h, 1d, 7d) "
+    "are used when the interval would give more"
+)
+
+TOP_K_DESCRIPTION = (
+    "Items of the endpoints, status distribution and consumers lists to return, by total requests; "
+    "the rest is summed into a last item labelled (other) and flagged is_other"
+)
+
+CURSOR_DESCRIPTION = "Cursor from the X-Next-Cursor header of the previous page; requires top_k"
+
+SINCE_DESCRIPTION = (
+    "Cursor from the X-Delta-Cursor header of the previous response; only time series buckets "
+    "that are newer or may have been revised since are returned, the other panels in full"
+)
+
+ACCEPT_DESCRIPTION = f"application/json (default) or {MSGPACK_MEDIA_TYPE} for MessagePack, if installed on the server"
+
+IF_NONE_MATCH_DESCRIPTION = "ETag of a previous response; answered with 304 Not Modified while the data is unchanged"
+
+def negotiated_responses(model) -> Dict[int, Dict[str, Any]]:
+    """OpenAPI description of the MessagePack alternative, the columnar time series and 304"""
+    return {
+        200: {"content": {MSGPACK_MEDIA_TYPE: {}}, "model": model},
+        304: {"description": "Not modified since the response with the ETag in If-None-Match"}
+    }
+
+def encode_cursor(offset: int) -> str:
+    """Opaque cursor of the list panel page starting after offset items"""
+    return base64.urlsafe_b64encode(json.dumps({'offset': offset}).encode()).decode()
+
+def decode_cursor(cursor: str) -> int:
+    """Offset of a list panel cursor"""
+    try:
+        offset = json.loads(base64.urlsafe_b64decode(cursor.encode()))['offset']
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=422, detail="Invalid cursor")
+    if not isinstance(offset, int) or offset < 0:
+        raise HTTPException(status_code=422, detail="Invalid cursor")
+    return offset
+
+def encode_delta_cursor(since: datetime, width: timedelta) -> str:
+    """Opaque cursor of the time series buckets from since on"""
+    cursor = {'since': since.isoformat(), 'step': int(width.total_seconds())}
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+def decode_delta_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Start time and bucket width in seconds of a delta cursor"""
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        since, step = datetime.fromisoformat(decoded['since']), decoded['step']
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=422, detail="Invalid since cursor")
+    if since.tzinfo is None or not isinstance(step, int):
+        raise HTTPException(status_code=422, detail="Invalid since cursor")
+    return since, step
+
+async def dashboard_response(
+    request: Request,
+    metrics_service: MetricsService,
+    query: MetricsQuery,
+    accept: Optional[str],
+    if_none_match: Optional[str],
+    panel: Optional[str] = None,
+    since: Optional[str] = None
+) -> Response:
+    """
+    Dashboard payload, or one panel of it, with an ETag and Cache-Control.
+
+    The ETag is derived from data versions before any metrics query runs, so
+    a client polling unchanged data gets 304 Not Modified without the query.
+    Responses with a time series carry an X-Delta-Cursor header; passed back
+    as since, the next response only holds the buckets that are newer or may
+    have been revised in between, for the client to merge by bucket.
+
+    Queries are cancelled when the client disconnects. Queries estimated too
+    expensive for every tier are rejected with 422, and queries that exceed
+    their statement timeout with 503.
+    """
+    # One plan for the cursor, the validators and the payload, so they all use the same buckets
+    plan = metrics_service.plan_query(query)
+    headers: Dict[str, str] = {}
+    if panel in (None, 'time_series') and 'time_series' in (query.panels or ['time_series']):
+        next_since, width = metrics_service.get_delta_cursor(plan)
+        if since is not None:
+            query.since, step = decode_delta_cursor(since)
+            if step != int(width.total_seconds()):
+                raise HTTPException(
+                    status_code=422,
+                    detail="since cursor was issued for another bucket width; request the full range again"
+                )
+        headers["X-Delta-Cursor"] = encode_delta_cursor(next_since, width)
+    elif since is not None:
+        raise HTTPException(status_code=422, detail="since requires the time_series panel")
+    
+    if settings.metrics_etag_enabled:
+        etag, max_age = await metrics_service.get_cache_validators(plan, query, negotiated_media_type(accept))
+        headers.update({"ETag": etag, "Cache-Control": f"private, max-age={max_age}", "Vary": "Accept"})
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+    
+    try:
+        payload = await cancel_on_disconnect(request, metrics_service.get_dashboard_payload(query, plan))
+    except QueryTooExpensiveError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except QueryTimeoutError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ClientDisconnectedError:
+        # Nobody reads the response; 499 is logged by the server like nginx does
+        return Response(status_code=499)
+    content = payload if panel is None else payload[panel]
+    response = negotiated_response(content, accept)
+    response.headers.update(headers)
+    
+    # Pages of list panels point to the next page while more items follow
+    if panel in LIST_PANEL_KEYS and query.top_k and content and is_other_item(content[-1]):
+        response.headers["X-Next-Cursor"] = encode_cursor(query.offset + query.top_k)
+    return response
+
+def validate_realtime_range(query: MetricsQuery) -> None:
+    """Validate time range doesn't exceed 60 minutes for 1-minute resolution"""
+    if query.interval == "1min" and query.start_time and query.end_time:
+        time_range = query.end_time - query.start_time
+        max_range = timedelta(minutes=60)
+        
+        if time_range > max_range:
+            raise HTTPException(
+                status_code=422, 
+                detail="Time range cannot exceed 60 minutes for real-time metrics"
+            )
+
+def metrics_query_params(
+    service: Optional[str] = Query(None, description="Filter by service"),
+    node: Optional[str] = Query(None, description="Filter by node"),
+    method: Optional[str] = Query(None, description="Filter by HTTP method"),
+    endpoint: Optional[str] = Query(None, description="Filter by endpoint"),
+    consumer: Optional[str] = Query(None, description="Filter by consumer"),
+    context: Optional[str] = Query(None, description="Filter by context"),
+    start_time: Optional[datetime] = Query(None, description="Start time for query"),
+    end_time: Optional[datetime] = Query(None, description="End time for query"),
+    interval: str = Query("5min", description="Aggregation interval (1min, 5min, 1hour, 1day); 1min is limited to 60 minutes"),
+    max_points: Optional[int] = Query(None, description=MAX_POINTS_DESCRIPTION),
+    top_k: Optional[int] = Query(None, description=TOP_K_DESCRIPTION),
+    response_format: str = Query("rows", alias="format", description=FORMAT_DESCRIPTION)
+) -> MetricsQuery:
+    """Dependency building the metrics query shared by the per-panel endpoints"""
+    try:
+        query = MetricsQuery(
+            service=service,
+            node=node,
+            method=method,
+            endpoint=endpoint,
+            consumer=consumer,
+            context=context,
+            start_time=start_time,
+            end_time=end_time,
+            interval=interval,
+            max_points=max_points,
+            top_k=top_k,
+            format=response_format
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    validate_realtime_range(query)
+    return query
+
+async def get_panel(
+    request: Request,
+    db: AsyncSession,
+    query: MetricsQuery,
+    panel: str,
+    accept: Optional[str],
+    if_none_match: Optional[str],
+    cursor: Optional[str] = None,
+    since: Optional[str] = None
+) -> Response:
+    """
+    Compute a single dashboard panel.
+
+    With top_k, list panels return one page of items; when more items follow,
+    the X-Next-Cursor header holds the cursor of the next page.
+    """
+    if cursor is not None:
+        if not query.top_k:
+            raise HTTPException(status_code=422, detail="cursor requires top_k")
+        query.offset = decode_cursor(cursor)
+    
+    query.panels = [panel]
+    metrics_service = MetricsService(db)
+    try:
+        return await dashboard_response(request, metrics_service, query, accept, if_none_match, panel, since)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch {panel}: {str(e)}")
+
+@router.get(
+    "/metrics/aggregate",
+    response_model=DashboardMetricsResponse,
+    responses=negotiated_responses(
+        Union[DashboardMetricsResponse, PartialDashboardMetricsResponse, ColumnarDashboardMetricsResponse]
+    )
+)
 async def get_aggregated_metrics(
+    request: Request,
     service: Optional[str] = Query(None, description="Filter by service"),
     node: Optional[str] = Query(None, description="Filter by node"),
     method: Optional[str] = Query(None, description="Filter by HTTP method"),
@@ -19,13 +264,24 @@ async def get_aggregated_metrics(
     context: Optional[str] = Query(None, description="Filter by context"),
     start_time: Optional[datetime] = Query(None, description="Start time for query"),
     end_time: Optional[datetime] = Query(None, description="End time for query"),
-    interval: str = Query("5min", description="Aggregation interval (5min, 1hour)"),
-    db: AsyncSession = Depends(get_db),
+    interval: str = Query("5min", description="Minimum aggregation interval (5min, 1hour, 1day); long or old ranges use coarser tiers"),
+    panels: Optional[str] = Query(None, description=PANELS_DESCRIPTION),
+    max_points: Optional[int] = Query(None, description=MAX_POINTS_DESCRIPTION),
+    top_k: Optional[int] = Query(None, description=TOP_K_DESCRIPTION),
+    response_format: str = Query("rows", alias="format", description=FORMAT_DESCRIPTION),
+    since: Optional[str] = Query(None, description=SINCE_DESCRIPTION),
+    accept: Optional[str] = Header(None, description=ACCEPT_DESCRIPTION),
+    if_none_match: Optional[str] = Header(None, description=IF_NONE_MATCH_DESCRIPTION),
+    db: AsyncSession = Depends(get_query_db),
     current_user: Dict[str, Any] = Depends(authenticate_user_endpoint)
 ):
     """
     Get aggregated dashboard metrics with server-side calculations.
-    Returns structured data for all dashboard components.
+    Returns structured data for all dashboard components, or only for the
+    panels selected with panels=, which are computed concurrently.
+    With format=columnar the time series is encoded as one array per metric,
+    and Accept: application/msgpack returns MessagePack instead of JSON.
+    With since= only the time series buckets after the delta cursor are returned.
     Requires API key authentication via X-API-Key header.
     """
     
@@ -39,20 +295,32 @@ async def get_aggregated_metrics(
             context=context,
             start_time=start_time,
             end_time=end_time,
-            interval=interval
+            interval=interval,
+            panels=panels,
+            max_points=max_points,
+            top_k=top_k,
+            format=response_format
         )
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
     
-    metrics_service = MetricsService(db)
+    metrics_service = MetricsService(db, session_factory=QuerySessionLocal)
     try:
-        results = await metrics_service.get_dashboard_metrics(query)
-        return results
+        return await dashboard_response(request, metrics_service, query, accept, if_none_match, since=since)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch metrics: {str(e)}")
 
-@router.get("/metrics/aggregate/realtime", response_model=DashboardMetricsResponse)
+@router.get(
+    "/metrics/aggregate/realtime",
+    response_model=DashboardMetricsResponse,
+    responses=negotiated_responses(
+        Union[DashboardMetricsResponse, PartialDashboardMetricsResponse, ColumnarDashboardMetricsResponse]
+    )
+)
 async def get_realtime_aggregated_metrics(
+    request: Request,
     service: Optional[str] = Query(None, description="Filter by service"),
     node: Optional[str] = Query(None, description="Filter by node"),
     method: Optional[str] = Query(None, description="Filter by HTTP method"),
@@ -61,13 +329,24 @@ async def get_realtime_aggregated_metrics(
     context: Optional[str] = Query(None, description="Filter by context"),
     start_time: Optional[datetime] = Query(None, description="Start time for query (max 60 minutes ago)"),
     end_time: Optional[datetime] = Query(None, description="End time for query (max 60 minutes range)"),
-    db: AsyncSession = Depends(get_db),
+    panels: Optional[str] = Query(None, description=PANELS_DESCRIPTION),
+    max_points: Optional[int] = Query(None, description=MAX_POINTS_DESCRIPTION),
+    top_k: Optional[int] = Query(None, description=TOP_K_DESCRIPTION),
+    response_format: str = Query("rows", alias="format", description=FORMAT_DESCRIPTION),
+    since: Optional[str] = Query(None, description=SINCE_DESCRIPTION),
+    accept: Optional[str] = Header(None, description=ACCEPT_DESCRIPTION),
+    if_none_match: Optional[str] = Header(None, description=IF_NONE_MATCH_DESCRIPTION),
+    db: AsyncSession = Depends(get_query_db),
     current_user: Dict[str, Any] = Depends(authenticate_user_endpoint)
 ):
     """
     Get real-time aggregated metrics with 1-minute resolution.
     Time range is limited to 60 minutes maximum.
-    Returns structured data for all dashboard components.
+    Returns structured data for all dashboard components, or only for the
+    panels selected with panels=, which are computed concurrently.
+    With format=columnar the time series is encoded as one array per metric,
+    and Accept: application/msgpack returns MessagePack instead of JSON.
+    With since= only the time series buckets after the delta cursor are returned.
     Requires API key authentication via X-API-Key header.
     """
 
@@ -81,28 +360,202 @@ async def get_realtime_aggregated_metrics(
             context=context,
             start_time=start_time,
             end_time=end_time,
-            interval="1min"  # Force 1-minute intervals for real-time
+            interval="1min",  # Force 1-minute intervals for real-time
+            panels=panels,
+            max_points=max_points,
+            top_k=top_k,
+            format=response_format
         )
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
 
-    # Validate time range doesn't exceed 60 minutes
-    if query.start_time and query.end_time:
-        from datetime import timedelta
-        time_range = query.end_time - query.start_time
-        max_range = timedelta(minutes=60)
-        
-        if time_range > max_range:
-            raise HTTPException(
-                status_code=422, 
-                detail="Time range cannot exceed 60 minutes for real-time metrics"
-            )
+    validate_realtime_range(query)
 
-    metrics_service = MetricsService(db)
+    metrics_service = MetricsService(db, session_factory=QuerySessionLocal)
     try:
-        results = await metrics_service.get_dashboard_metrics(query)
-        return results
+        return await dashboard_response(request, metrics_service, query, accept, if_none_match, since=since)
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch real-time metrics: {str(e)}")
+
+@router.get("/metrics/stream", response_class=StreamingResponse, responses={200: {"content": {"text/event-stream": {}}}})
+async def stream_realtime_metrics(
+    service: Optional[str] = Query(None, description="Filter by service"),
+    node: Optional[str] = Query(None, description="Filter by node"),
+    method: Optional[str] = Query(None, description="Filter by HTTP method"),
+    endpoint: Optional[str] = Query(None, description="Filter by endpoint"),
+    consumer: Optional[str] = Query(None, description="Filter by consumer"),
+    context: Optional[str] = Query(None, description="Filter by context"),
+    current_user: Dict[str, Any] = Depends(authenticate_user_endpoint)
+):
+    """
+    Stream the realtime view as server-sent events.
+    Starts with a snapshot event holding the 1-minute time series, metrics
+    summary and system overview of the last 60 minutes, followed by an update
+    event per closed bucket with the new buckets and the current summaries.
+    All streams with the same filters share one computation.
+    Requires API key authentication via X-API-Key header.
+    """
+    filters = {
+        name: value for name, value in (
+            ('service', service), ('node', node), ('method', method),
+            ('endpoint', endpoint), ('consumer', consumer), ('context', context)
+        ) if value
+    }
+    
+    async def events():
+        key, queue = stream_hub.subscribe(filters, QuerySessionLocal)
+        try:
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=settings.stream_keepalive_seconds)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                yield b"event: " + event.encode() + b"\ndata: " + dump_json(data) + b"\n\n"
+        finally:
+            stream_hub.unsubscribe(key, queue)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get(
+    "/metrics/panels/time-series",
+    response_model=List[TimeSeriesDataPoint],
+    responses=negotiated_responses(Union[List[TimeSeriesDataPoint], ColumnarTimeSeries])
+)
+async def get_time_series_panel(
+    request: Request,
+    query: MetricsQuery = Depends(metrics_query_params),
+    since: Optional[str] = Query(None, description=SINCE_DESCRIPTION),
+    accept: Optional[str] = Header(None, description=ACCEPT_DESCRIPTION),
+    if_none_match: Optional[str] = Header(None, description=IF_NONE_MATCH_DESCRIPTION),
+    db: AsyncSession = Depends(get_query_db),
+    current_user: Dict[str, Any] = Depends(authenticate_user_endpoint)
+):
+    """Get the gap-filled latency and throughput time series only, optionally since a delta cursor"""
+    return await get_panel(request, db, query, 'time_series', accept, if_none_match, since=since)
+
+@router.get("/metrics/panels/summary", response_model=MetricsCardsSummary)
+async def get_summary_panel(
+    request: Request,
+    query: MetricsQuery = Depends(metrics_query_params),
+    accept: Optional[str] = Header(None, description=ACCEPT_DESCRIPTION),
+    if_none_match: Optional[str] = Header(None, description=IF_NONE_MATCH_DESCRIPTION),
+    db: AsyncSession = Depends(get_query_db),
+    current_user: Dict[str, Any] = Depends(authenticate_user_endpoint)
+):
+    """Get the metrics cards summary only"""
+    return await get_panel(request, db, query, 'metrics_summary', accept, if_none_match)
+
+@router.get("/metrics/panels/endpoints", response_model=List[EndpointAggregation])
+async def get_endpoints_panel(
+    request: Request,
+    query: MetricsQuery = Depends(metrics_query_params),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    accept: Optional[str] = Header(None, description=ACCEPT_DESCRIPTION),
+    if_none_match: Optional[str] = Header(None, description=IF_NONE_MATCH_DESCRIPTION),
+    db: AsyncSession = Depends(get_query_db),
+    current_user: Dict[str, Any] = Depends(authenticate_user_endpoint)
+):
+    """Get the per-endpoint aggregation only, optionally paged with top_k and cursor"""
+    return await get_panel(request, db, query, 'endpoints', accept, if_none_match, cursor)
+
+@router.get("/metrics/panels/status-distribution", response_model=List[StatusDistribution])
+async def get_status_distribution_panel(
+    request: Request,
+    query: MetricsQuery = Depends(metrics_query_params),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    accept: Optional[str] = Header(None, description=ACCEPT_DESCRIPTION),
+    if_none_match: Optional[str] = Header(None, description=IF_NONE_MATCH_DESCRIPTION),
+    db: AsyncSession = Depends(get_query_db),
+    current_user: Dict[str, Any] = Depends(authenticate_user_endpoint)
+):
+    """Get the status code distribution per service only, optionally paged with top_k and cursor"""
+    return await get_panel(request, db, query, 'status_distribution', accept, if_none_match, cursor)
+
+@router.get("/metrics/panels/consumers", response_model=List[ConsumerAggregation])
+async def get_consumers_panel(
+    request: Request,
+    query: MetricsQuery = Depends(metrics_query_params),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    accept: Optional[str] = Header(None, description=ACCEPT_DESCRIPTION),
+    if_none_match: Optional[str] = Header(None, description=IF_NONE_MATCH_DESCRIPTION),
+    db: AsyncSession = Depends(get_query_db),
+    current_user: Dict[str, Any] = Depends(authenticate_user_endpoint)
+):
+    """Get the per-consumer aggregation only, optionally paged with top_k and cursor"""
+    return await get_panel(request, db, query, 'consumers', accept, if_none_match, cursor)
+
+@router.get("/metrics/panels/overview", response_model=SystemOverview)
+async def get_overview_panel(
+    request: Request,
+    query: MetricsQuery = Depends(metrics_query_params),
+    accept: Optional[str] = Header(None, description=ACCEPT_DESCRIPTION),
+    if_none_match: Optional[str] = Header(None, description=IF_NONE_MATCH_DESCRIPTION),
+    db: AsyncSession = Depends(get_query_db),
+    current_user: Dict[str, Any] = Depends(authenticate_user_endpoint)
+):
+    """Get the system overview only"""
+    return await get_panel(request, db, query, 'system_overview', accept, if_none_match)
+
+@router.get("/metrics/exemplars", response_model=ExemplarDrilldownResponse)
+async def get_exemplars(
+    service: str = Query(..., description="Service to drill into"),
+    endpoint: Optional[str] = Query(None, description="Filter by endpoint"),
+    start_time: Optional[datetime] = Query(None, description="Start time for query (defaults to 24 hours before end_time)"),
+    end_time: Optional[datetime] = Query(None, description="End time for query"),
+    db: AsyncSession = Depends(get_query_db),
+    current_user: Dict[str, Any] = Depends(authenticate_user_endpoint)
+):
+    """
+    Drill down from hourly aggregates to sampled raw requests.
+    Returns hourly buckets from requests_1hour per endpoint together with
+    exemplar requests, which are kept well beyond raw data retention.
+    Requires API key authentication via X-API-Key header.
+    """
+
+    if start_time and end_time and start_time > end_time:
+        raise HTTPException(status_code=422, detail="start_time must be before end_time")
+
+    exemplar_service = ExemplarService(db)
+    try:
+        return await exemplar_service.get_drilldown(service, endpoint, start_time, end_time)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch exemplars: {str(e)}")
+
+@router.get("/metrics/dimensions", response_model=DimensionValuesResponse)
+async def get_dimension_values(
+    dimension: str = Query(..., description="Dimension to list (service, node, method, endpoint, consumer, context)"),
+    prefix: str = Query("", description="Only values starting with this prefix"),
+    service: Optional[str] = Query(None, description="Only values seen for this service"),
+    seen_after: Optional[datetime] = Query(None, description="Only values last seen at or after this time, e.g. live nodes"),
+    seen_before: Optional[datetime] = Query(None, description="Only values first seen before this time"),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of values"),
+    db: AsyncSession = Depends(get_query_db),
+    current_user: Dict[str, Any] = Depends(authenticate_user_endpoint)
+):
+    """
+    Search the values of a dimension for filter dropdowns.
+    Every value comes with the time it was first and last seen, which is
+    maintained incrementally by the ingest path.
+    Requires API key authentication via X-API-Key header.
+    """
+
+    if dimension not in CATALOG_DIMENSIONS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"dimension must be one of: {', '.join(CATALOG_DIMENSIONS)}"
+        )
+
+    catalog_service = DimensionCatalogService(db)
+    try:
+        return await catalog_service.search(dimension, service, prefix, seen_after, seen_before, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch dimension values: {str(e)}")
@@ -1,35 +1,141 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy import text
 from app.core.config import settings
+from app.models.telemetry import PoolStats, PoolStatsResponse
+from typing import Optional
+from datetime import datetime
 import asyncpg
 import logging
+import time
 
 # Configure SQLAlchemy logging
 logging.getLogger('sqlalchemy.engine').setLevel(logging.WARNING)
 logging.getLogger('sqlalchemy.pool').setLevel(logging.WARNING)
 logging.getLogger('sqlalchemy.dialects').setLevel(logging.WARNING)
 
-# Create async engine
-engine = create_async_engine(
-    settings.database_url.replace("postgresql://", "postgresql+asyncpg://"),
-    echo=settings.sqlalchemy_echo  # Use setting to control SQL query logging
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Connection pool that measures how long checkouts wait for a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        waited = time.perf_counter() - started
+        self.checkouts += 1
+        self.wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        return connection
+
+def _create_engine(url: str, pool_size: int, max_overflow: int, pool_timeout: float) -> AsyncEngine:
+    """Create an async engine with its own bounded, timed connection pool"""
+    return create_async_engine(
+        url.replace("postgresql://", "postgresql+asyncpg://"),
+        echo=settings.sqlalchemy_echo,  # Use setting to control SQL query logging
+        poolclass=TimedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_pre_ping=True,
+        # Canonical metrics statements are prepared once per connection and reused
+        connect_args={"prepared_statement_cache_size": settings.database_statement_cache_size}
+    )
+
+# Engine of the primary for ingest and background work: flushes and continuous aggregate refreshes
+engine = _create_engine(
+    settings.database_url,
+    pool_size=settings.ingest_pool_size,
+    max_overflow=settings.ingest_pool_max_overflow,
+    pool_timeout=settings.ingest_pool_timeout_seconds
 )
 
-# Create async session factory
+# Engine for dashboard and admin queries, on the read replica when one is configured. Its
+# own pool keeps slow analytics from taking the connections that ingest needs.
+query_engine = _create_engine(
+    settings.database_replica_url or settings.database_url,
+    pool_size=settings.query_pool_size,
+    max_overflow=settings.query_pool_max_overflow,
+    pool_timeout=settings.query_pool_timeout_seconds
+)
+
+# Create async session factories
 AsyncSessionLocal = async_sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
 
+QuerySessionLocal = async_sessionmaker(
+    query_engine, class_=AsyncSession, expire_on_commit=False
+)
+
 Base = declarative_base()
 
 async def get_db():
-    """Dependency to get database session"""
+    """Dependency to get a database session for ingest"""
     async with AsyncSessionLocal() as session:
         try:
             yield session
         finally:
             await session.close()
 
+async def get_query_db():
+    """Dependency to get a database session for metrics and admin queries"""
+    async with QuerySessionLocal() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+async def get_replay_time(session: AsyncSession) -> Optional[datetime]:
+    """
+    Commit time on the primary of the last transaction the read replica replayed.
+
+    Data committed later is not visible to query sessions yet. None without a
+    replica, before the replica replayed anything, or if it cannot be read.
+    """
+    if not settings.database_replica_url:
+        return None
+    try:
+        return (await session.execute(text("SELECT pg_last_xact_replay_timestamp()"))).scalar()
+    except Exception as e:
+        await session.rollback()
+        logging.getLogger(__name__).warning(f"Reading the replica replay time failed: {e}")
+        return None
+
+def _pool_stats(name: str, pool_engine: AsyncEngine, replica: bool) -> PoolStats:
+    pool = pool_engine.pool
+    checkouts = getattr(pool, "checkouts", 0)
+    return PoolStats(
+        name=name,
+        replica=replica,
+        size=pool.size(),
+        max_overflow=pool._max_overflow,
+        checked_out=pool.checkedout(),
+        overflow=max(pool.overflow(), 0),
+        checkouts=checkouts,
+        timeouts=getattr(pool, "timeouts", 0),
+        avg_wait_ms=getattr(pool, "wait_seconds", 0.0) * 1000 / checkouts if checkouts else 0.0,
+        max_wait_ms=getattr(pool, "max_wait_seconds", 0.0) * 1000
+    )
+
+def get_pool_stats() -> PoolStatsResponse:
+    """Get usage and checkout wait times of the ingest and query pools of this process"""
+    return PoolStatsResponse(pools=[
+        _pool_stats("ingest", engine, replica=False),
+        _pool_stats("query", query_engine, replica=settings.database_replica_url is not None),
+    ])
+
 async def init_db():
     """Initialize database connection"""
     logger = logging.getLogger(__name__)
@@ -37,7 +143,16 @@ async def init_db():
         # Test connection
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+        if settings.database_replica_url:
+            async with query_engine.connect():
+                pass
+            logger.info("Read replica connection established successfully")
         logger.info("Database connection established successfully")
     except Exception as e:
         logger.error(f"Database connection failed: {e}")
-        raise
\ No newline at end of file
+        raise
+
+async def close_db():
+    """Close the connections of both pools"""
+    await query_engine.dispose()
+    await engine.dispose()
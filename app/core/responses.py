@@ -0,0 +1,109 @@
+from fastapi.responses import Response
+from pydantic import BaseModel
+from pydantic.fields import FieldInfo
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple, Type
+import orjson
+
+try:
+    import msgpack
+except ImportError:  # MessagePack responses are optional
+    msgpack = None
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+# Matches pydantic's JSON output: UTC timestamps end in "Z" and integer keys become strings
+_ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+def dump_json(content: Any) -> bytes:
+    """Encode plain response data as JSON"""
+    return orjson.dumps(content, option=_ORJSON_OPTIONS)
+
+@lru_cache(maxsize=None)
+def response_fields(model: Type[BaseModel]) -> Tuple[Tuple[str, FieldInfo], ...]:
+    """Fields of a response model in declaration order"""
+    return tuple(model.model_fields.items())
+
+def project(item: Dict[str, Any], model: Type[BaseModel]) -> Dict[str, Any]:
+    """Keep exactly the fields of a response model, in order, filling in defaults"""
+    return {
+        name: item[name] if name in item else field.get_default(call_default_factory=True)
+        for name, field in response_fields(model)
+    }
+
+class FastJSONResponse(Response):
+    """
+    JSON response for plain data that already has the shape of the declared
+    response model. Returning it skips FastAPI's validation and serialization
+    of the response model, while the model still documents the endpoint.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dump_json(content)
+
+class MsgPackResponse(Response):
+    """
+    MessagePack response for the same plain data. The data goes through its
+    JSON form first, so timestamps are the same ISO strings and the decoded
+    document equals the JSON one.
+    """
+
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(orjson.loads(dump_json(content)))
+
+def parse_qvalues(header: Optional[str]) -> Dict[str, float]:
+    """Quality of every value of an Accept-style header, e.g. {"gzip": 1.0, "br": 0.5}"""
+    qualities: Dict[str, float] = {}
+    for entry in (header or "").split(","):
+        value, _, params = entry.strip().partition(";")
+        if not value.strip():
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, param_value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(param_value)
+                except ValueError:
+                    quality = 0.0
+        qualities[value.strip().lower()] = quality
+    return qualities
+
+def _accepts_msgpack(accept: Optional[str]) -> bool:
+    """Whether an Accept header prefers MessagePack over JSON"""
+    if not accept:
+        return False
+    qualities = parse_qvalues(accept)
+    msgpack_quality = max(qualities.get(MSGPACK_MEDIA_TYPE, 0.0), qualities.get("application/x-msgpack", 0.0))
+    json_quality = max(qualities.get("application/json", 0.0), qualities.get("*/*", 0.0), qualities.get("application/*", 0.0))
+    return msgpack_quality > 0 and msgpack_quality >= json_quality
+
+def negotiated_media_type(accept: Optional[str]) -> str:
+    """
+    Media type of a negotiated response: MessagePack when the Accept header
+    asks for it and msgpack is installed, JSON otherwise.
+    """
+    if msgpack is not None and _accepts_msgpack(accept):
+        return MSGPACK_MEDIA_TYPE
+    return FastJSONResponse.media_type
+
+def negotiated_response(content: Any, accept: Optional[str]) -> Response:
+    """Encode plain response data in the media type negotiated from the Accept header"""
+    if negotiated_media_type(accept) == MSGPACK_MEDIA_TYPE:
+        response = MsgPackResponse(content)
+    else:
+        response = FastJSONResponse(content)
+    response.headers["Vary"] = "Accept"
+    return response
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches an ETag, using weak comparison"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
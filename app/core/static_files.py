@@ -0,0 +1,111 @@
+"""
+Serving of the built dashboard with precompressed variants and cache headers.
+
+The dashboard build writes hashed file names (name.<hash>.ext), whose content
+never changes, so they are cached as immutable. Other files, like
+index.html, are revalidated on every use. Compressed variants (.br, .gz) are
+written next to the assets at build time:
+
+    python -m app.core.static_files app/static
+"""
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+from app.core.compression import COMPRESSIBLE_TYPES, SUPPORTED_ENCODINGS, choose_encoding, compress
+from typing import Dict, Optional
+import mimetypes
+import os
+import re
+import sys
+
+# File extension of every precompressed variant
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+# Hash that the dashboard build puts into asset names, e.g. index.3f9a1c2b.js
+HASHED_NAME = re.compile(r"\.[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Smaller files are not worth a compressed variant
+PRECOMPRESS_MIN_SIZE = 1024
+
+def cache_control_for(path: str) -> str:
+    """Cache-Control of a static file: immutable for hashed names, revalidated otherwise"""
+    return IMMUTABLE_CACHE_CONTROL if HASHED_NAME.search(path) else REVALIDATE_CACHE_CONTROL
+
+def _compressible(path: str) -> bool:
+    media_type, _ = mimetypes.guess_type(path)
+    return media_type is not None and media_type.startswith(COMPRESSIBLE_TYPES)
+
+def precompress_directory(directory: str) -> int:
+    """Write compressed variants of every compressible file with the best settings; returns their count"""
+    written = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            if name.endswith(tuple(ENCODING_SUFFIXES.values())) or not _compressible(path):
+                continue
+            with open(path, "rb") as f:
+                body = f.read()
+            if len(body) < PRECOMPRESS_MIN_SIZE:
+                continue
+            for encoding in SUPPORTED_ENCODINGS:
+                compressed = compress(body, encoding, gzip_level=9, brotli_quality=11)
+                if len(compressed) < len(body):
+                    with open(path + ENCODING_SUFFIXES[encoding], "wb") as f:
+                        f.write(compressed)
+                    written += 1
+    return written
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles serving precompressed variants negotiated by Accept-Encoding,
+    with Cache-Control by file name.
+
+    Variants are indexed once when the app starts, so requests do not probe
+    the file system for them.
+    """
+
+    def __init__(self, directory: str, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.variants: Dict[str, Dict[str, str]] = {}
+        for root, _, files in os.walk(directory):
+            for name in files:
+                for encoding, suffix in ENCODING_SUFFIXES.items():
+                    if name.endswith(suffix):
+                        original = os.path.relpath(os.path.join(root, name[:-len(suffix)]), directory)
+                        self.variants.setdefault(original, {})[encoding] = os.path.join(root, name)
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        response = await self._variant_response(path, scope) or await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = cache_control_for(path)
+        if path in self.variants:
+            response.headers.add_vary_header("Accept-Encoding")
+        return response
+
+    async def _variant_response(self, path: str, scope: Scope) -> Optional[Response]:
+        """Response with the precompressed variant of a file the client accepts, if there is one"""
+        variants = self.variants.get(os.path.normpath(path), {})
+        request_headers = Headers(scope=scope)
+        encoding = choose_encoding(request_headers.get("accept-encoding"), tuple(variants))
+        if encoding is None:
+            return None
+
+        full_path = variants[encoding]
+        media_type, _ = mimetypes.guess_type(path)
+        response = FileResponse(
+            full_path,
+            stat_result=os.stat(full_path),
+            media_type=media_type,
+            headers={"Content-Encoding": encoding}
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+if __name__ == "__main__":
+    directory = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.dirname(__file__)), "static")
+    print(f"Wrote {precompress_directory(directory)} compressed variants in {directory}")
@@ -1,13 +1,20 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
-from app.api import auth, ingest, metrics
+from app.api import admin, auth, ingest, metrics
 from app.core.config import settings
-from app.core.database import init_db
+from app.core.compression import CompressionMiddleware
+from app.core.static_files import REVALIDATE_CACHE_CONTROL, PrecompressedStaticFiles
+from app.core.database import init_db, close_db, engine, AsyncSessionLocal
 from app.core.auth_dependency import set_auth_service
 from app.core.rate_limiting import limiter, rate_limit_exceeded_handler
+from app.services.dimension_catalog import DimensionCatalogService, run_dimension_catalog_flush_loop
+from app.services.exemplar_service import ExemplarService, run_exemplar_flush_loop
+from app.services.refresh_service import refresh_scheduler, run_refresh_loop
+from app.services.stream_hub import stream_hub
+import asyncio
+import contextlib
 import logging
 import os
 import sys
@@ -52,6 +59,21 @@ async def lifespan(app: FastAPI):
     auth_service = AuthService()
     set_auth_service(auth_service)
     logger.info(f"Auth service initialized with {len(auth_service.services)} services and {len(auth_service.users)} users")
+
+    # Start background flushing of sampled exemplar requests
+    exemplar_task = asyncio.create_task(
+        run_exemplar_flush_loop(AsyncSessionLocal, settings.exemplar_flush_interval_seconds)
+    )
+
+    # Start background flushing of the dimension catalog
+    catalog_task = asyncio.create_task(
+        run_dimension_catalog_flush_loop(AsyncSessionLocal, settings.dimension_catalog_flush_interval_seconds)
+    )
+
+    # Start targeted refresh of continuous aggregates for buckets that received data
+    refresh_task = asyncio.create_task(
+        run_refresh_loop(engine, settings.cagg_refresh_interval_seconds)
+    )
     
     logger.info("Malti application startup completed")
     yield
@@ -59,6 +81,36 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("Shutting down Malti application...")
 
+    for task in (exemplar_task, catalog_task, refresh_task):
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+    # Stop the computations of realtime streams
+    await stream_hub.close()
+
+    # Materialize buckets that received data since the last refresh cycle
+    try:
+        await refresh_scheduler.refresh_once(engine)
+    except Exception as e:
+        logger.error(f"Final continuous aggregate refresh failed: {e}")
+
+    # Persist exemplars sampled since the last flush
+    try:
+        async with AsyncSessionLocal() as session:
+            await ExemplarService(session).flush()
+    except Exception as e:
+        logger.error(f"Final exemplar flush failed: {e}")
+
+    # Persist dimension values seen since the last flush
+    try:
+        async with AsyncSessionLocal() as session:
+            await DimensionCatalogService(session).flush()
+    except Exception as e:
+        logger.error(f"Final dimension catalog flush failed: {e}")
+
+    await close_db()
+
 
 app = FastAPI(
     title="Malti",
@@ -80,24 +132,36 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress API responses for clients that accept gzip or brotli
+if settings.compression_enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        min_size=settings.compression_min_size,
+        gzip_level=settings.compression_gzip_level,
+        brotli_quality=settings.compression_brotli_quality
+    )
+
 # Include routers
 app.include_router(auth.router, prefix="/api/v1", tags=["auth"])
 app.include_router(ingest.router, prefix="/api/v1", tags=["ingest"])
 app.include_router(metrics.router, prefix="/api/v1", tags=["metrics"])
+app.include_router(admin.router, prefix="/api/v1", tags=["admin"])
 
-# Mount static files for dashboard
+# Mount static files for dashboard, with precompressed variants and cache headers
 static_dir = os.path.join(os.path.dirname(__file__), "static")
 if os.path.exists(static_dir):
-    app.mount("/static", StaticFiles(directory=static_dir), name="static")
+    app.mount("/static", PrecompressedStaticFiles(directory=static_dir), name="static")
+
+# The dashboard is built before the app starts, so this is only checked once
+index_file = os.path.join(static_dir, "index.html")
+dashboard_built = os.path.exists(index_file)
 
 @app.get("/")
 async def root():
     """Serve the dashboard application"""
-    static_dir = os.path.join(os.path.dirname(__file__), "static")
-    index_file = os.path.join(static_dir, "index.html")
-    
-    if os.path.exists(index_file):
-        return FileResponse(index_file)
+    if dashboard_built:
+        # Revalidated on every load, so new builds with new asset hashes are picked up
+        return FileResponse(index_file, headers={"Cache-Control": REVALIDATE_CACHE_CONTROL})
     else:
         return {"message": "Malti - Telemetry Insights API", "version": "1.0.0", "dashboard": "not built"}
 
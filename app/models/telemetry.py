@@ -51,17 +51,76 @@ class MetricsQuery(BaseModel):
     start_time: Optional[datetime] = None
     end_time: Optional[datetime] = None
     interval: str = "5min"
+    panels: Optional[List[str]] = None
+    format: str = "rows"
+    max_points: Optional[int] = None
+    top_k: Optional[int] = None
+    offset: int = 0
+    since: Optional[datetime] = None
 
     
     @field_validator('interval', mode='before')
     @classmethod
     def validate_interval(cls, v):
         """Validate interval parameter"""
-        valid_intervals = ['1min', '5min', '1hour']
+        valid_intervals = ['1min', '5min', '1hour', '1day']
         if v not in valid_intervals:
             raise ValueError(f'Interval must be one of: {valid_intervals}')
         return v
 
+    @field_validator('panels', mode='before')
+    @classmethod
+    def validate_panels(cls, v):
+        """Validate panels parameter, accepting a comma separated string"""
+        if v is None:
+            return None
+        if isinstance(v, str):
+            v = [panel.strip() for panel in v.split(',') if panel.strip()]
+        valid_panels = [
+            'time_series', 'metrics_summary', 'endpoints', 'status_distribution',
+            'consumers', 'system_overview', 'distinct_nodes', 'distinct_contexts'
+        ]
+        invalid = [panel for panel in v if panel not in valid_panels]
+        if invalid:
+            raise ValueError(f'Panels must be among: {valid_panels}')
+        if not v:
+            return None
+        # Drop duplicates, keeping the requested order
+        return list(dict.fromkeys(v))
+
+    @field_validator('format', mode='before')
+    @classmethod
+    def validate_format(cls, v):
+        """Validate the time series encoding"""
+        valid_formats = ['rows', 'columnar']
+        if v not in valid_formats:
+            raise ValueError(f'Format must be one of: {valid_formats}')
+        return v
+
+    @field_validator('max_points')
+    @classmethod
+    def validate_max_points(cls, v):
+        """Validate the time series point limit"""
+        if v is not None and v < 1:
+            raise ValueError('max_points must be at least 1')
+        return v
+
+    @field_validator('top_k')
+    @classmethod
+    def validate_top_k(cls, v):
+        """Validate the item limit of list panels"""
+        if v is not None and v < 1:
+            raise ValueError('top_k must be at least 1')
+        return v
+
+    @field_validator('offset')
+    @classmethod
+    def validate_offset(cls, v):
+        """Validate the items skipped before a page of list panels"""
+        if v < 0:
+            raise ValueError('offset must not be negative')
+        return v
+
 class AggregatedMetrics(BaseModel):
     """Aggregated metrics response"""
     service: str
@@ -96,15 +155,35 @@ class TimeSeriesDataPoint(BaseModel):
     total_requests: int
     min_latency: Optional[float] = None
     avg_latency: Optional[float] = None
+    p50_latency: Optional[float] = None
+    p90_latency: Optional[float] = None
     p95_latency: Optional[float] = None
+    p99_latency: Optional[float] = None
     max_latency: Optional[float] = None
 
+class ColumnarTimeSeries(BaseModel):
+    """Time series as one array per metric; bucket i starts at start + i * step_seconds"""
+    start: Optional[datetime] = None
+    step_seconds: int
+    count: int
+    total_requests: List[int]
+    min_latency: List[Optional[float]]
+    avg_latency: List[Optional[float]]
+    p50_latency: List[Optional[float]]
+    p90_latency: List[Optional[float]]
+    p95_latency: List[Optional[float]]
+    p99_latency: List[Optional[float]]
+    max_latency: List[Optional[float]]
+
 class MetricsCardsSummary(BaseModel):
     """Summary metrics for dashboard cards"""
     total_requests: int
     avg_latency: Optional[float] = None
     min_latency: Optional[float] = None
+    p50_latency: Optional[float] = None
+    p90_latency: Optional[float] = None
     p95_latency: Optional[float] = None
+    p99_latency: Optional[float] = None
     max_latency: Optional[float] = None
 
 class EndpointAggregation(BaseModel):
@@ -115,6 +194,7 @@ class EndpointAggregation(BaseModel):
     total_requests: int
     error_count: int
     error_rate: float
+    is_other: bool = Field(False, description="Whether the item sums the items past top_k")
 
 class StatusDistribution(BaseModel):
     """Status code distribution per service"""
@@ -124,6 +204,7 @@ class StatusDistribution(BaseModel):
     warning_3xx: int
     error_4xx_5xx: int
     status_breakdown: Dict[int, int]
+    is_other: bool = Field(False, description="Whether the item sums the items past top_k")
 
 class ConsumerAggregation(BaseModel):
     """Aggregated metrics per consumer"""
@@ -131,6 +212,7 @@ class ConsumerAggregation(BaseModel):
     total_requests: int
     error_count: int
     error_rate: float
+    is_other: bool = Field(False, description="Whether the item sums the items past top_k")
 
 class SystemOverview(BaseModel):
     """System-wide overview metrics"""
@@ -148,4 +230,169 @@ class DashboardMetricsResponse(BaseModel):
     consumers: List[ConsumerAggregation]
     system_overview: SystemOverview
     distinct_nodes: List[str] = Field(default_factory=list, description="List of distinct nodes for filtering")
-    distinct_contexts: List[str] = Field(default_factory=list, description="List of distinct contexts for filtering")
\ No newline at end of file
+    distinct_contexts: List[str] = Field(default_factory=list, description="List of distinct contexts for filtering")
+
+class PartialDashboardMetricsResponse(DashboardMetricsResponse):
+    """Dashboard metrics response with panels=; panels not selected are left empty"""
+    time_series: List[TimeSeriesDataPoint] = Field(default_factory=list)
+    metrics_summary: Optional[MetricsCardsSummary] = None
+    endpoints: List[EndpointAggregation] = Field(default_factory=list)
+    status_distribution: List[StatusDistribution] = Field(default_factory=list)
+    consumers: List[ConsumerAggregation] = Field(default_factory=list)
+    system_overview: Optional[SystemOverview] = None
+
+class ColumnarDashboardMetricsResponse(PartialDashboardMetricsResponse):
+    """Dashboard metrics response with format=columnar"""
+    time_series: Optional[ColumnarTimeSeries] = None
+
+class Exemplar(BaseModel):
+    """Sampled raw request kept beyond raw data retention"""
+    created_at: datetime
+    node: Optional[str] = None
+    consumer: str
+    context: Optional[str] = None
+    status: int
+    response_time: int
+
+class ExemplarBucket(BaseModel):
+    """Hourly aggregate for one endpoint with its sampled exemplar requests"""
+    bucket: datetime
+    service: str
+    endpoint: str
+    method: str
+    total_requests: int
+    error_count: int
+    max_latency: Optional[float] = None
+    p95_latency: Optional[float] = None
+    exemplars: List[Exemplar] = Field(default_factory=list)
+
+class ExemplarDrilldownResponse(BaseModel):
+    """Drill-down from hourly aggregates to sampled requests"""
+    service: str
+    endpoint: Optional[str] = None
+    start_time: datetime
+    end_time: datetime
+    buckets: List[ExemplarBucket]
+
+class DimensionValue(BaseModel):
+    """Catalog entry of a dimension value"""
+    value: str
+    first_seen: datetime
+    last_seen: datetime
+
+class DimensionValuesResponse(BaseModel):
+    """Dimension values matching a prefix search"""
+    dimension: str
+    service: Optional[str] = None
+    prefix: str = ""
+    values: List[DimensionValue]
+
+class CompressionStats(BaseModel):
+    """Compression statistics of a hypertable or continuous aggregate"""
+    name: str
+    kind: str
+    total_bytes: int
+    total_chunks: int
+    compressed_chunks: int
+    before_compression_bytes: Optional[int] = None
+    after_compression_bytes: Optional[int] = None
+    compression_ratio: Optional[float] = None
+
+class CompressionStatsResponse(BaseModel):
+    """Compression statistics for all hypertables and continuous aggregates"""
+    relations: List[CompressionStats]
+
+class ChunkSizingAdvice(BaseModel):
+    """Chunk interval and space partitioning recommendation for the requests hypertable"""
+    current_chunk_interval_seconds: Optional[int] = None
+    current_service_partitions: int
+    memory_bytes: int
+    bytes_per_day: Optional[int] = None
+    services: int
+    largest_service_share: Optional[float] = None
+    recommended_chunk_interval_seconds: int
+    recommended_service_partitions: int
+    notes: List[str] = Field(default_factory=list)
+
+class RefreshViewStats(BaseModel):
+    """Targeted refresh statistics of one continuous aggregate"""
+    view: str
+    pending_buckets: int
+    pending_lag_seconds: float
+    last_cycle_ranges: int
+    last_cycle_buckets: int
+    last_cycle_duration_ms: float
+    last_refresh_lag_seconds: Optional[float] = None
+    last_refreshed_at: Optional[datetime] = None
+    total_ranges: int
+    total_buckets: int
+    failures: int
+    skipped_buckets: int = 0  # Distinct buckets per ingest batch older than the view's refresh horizon
+
+class RefreshStatsResponse(BaseModel):
+    """Targeted continuous aggregate refresh statistics of this process"""
+    cycles: int
+    views: List[RefreshViewStats]
+
+class StreamStatsResponse(BaseModel):
+    """Realtime stream statistics of this process"""
+    channels: int = Field(description="Distinct filter sets being computed")
+    subscribers: int
+    computations: int = Field(description="Payloads computed for all channels")
+    resyncs: int = Field(description="Snapshots sent to subscribers that fell behind")
+
+class QueryStatementStats(BaseModel):
+    """Timings of one canonical metrics statement"""
+    statement: str = Field(description="Sources, filtered dimensions and panels of the statement")
+    executions: int
+    avg_planning_ms: Optional[float] = Field(None, description="Planning time reported by the cost estimate")
+    avg_execution_ms: float
+    max_execution_ms: float
+
+class QueryStatsResponse(BaseModel):
+    """Metrics statement statistics of this process"""
+    statements: int = Field(description="Distinct canonical statements executed")
+    prepared_statement_cache_size: int = Field(description="Prepared statements kept per connection")
+    outcomes: Dict[str, int] = Field(description="Governed queries by outcome")
+    slowest: List[QueryStatementStats] = Field(description="Statements by average execution time, slowest first")
+
+class PoolStats(BaseModel):
+    """Usage and checkout wait times of one connection pool"""
+    name: str
+    replica: bool = Field(description="Whether the pool connects to the read replica")
+    size: int
+    max_overflow: int
+    checked_out: int
+    overflow: int = Field(description="Connections open beyond the pool size")
+    checkouts: int
+    timeouts: int = Field(description="Checkouts that gave up waiting for a connection")
+    avg_wait_ms: float
+    max_wait_ms: float
+
+class PoolStatsResponse(BaseModel):
+    """Connection pool statistics of this process"""
+    pools: List[PoolStats]
+
+class SeriesCacheStats(BaseModel):
+    """Closed time series bucket cache statistics of this process"""
+    enabled: bool
+    series: int
+    buckets: int
+    hit_buckets: int = Field(description="Buckets served from the cache")
+    queried_buckets: int = Field(description="Buckets queried from the database")
+    invalidated_buckets: int
+
+class CacheStatsResponse(BaseModel):
+    """Metrics query result cache statistics of this process"""
+    enabled: bool
+    backend: str
+    entries: int
+    max_entries: Optional[int] = None
+    hits: int
+    misses: int
+    shared: int = Field(description="Lookups that joined an identical in-flight query")
+    hit_ratio: float
+    in_flight: int
+    evictions: int
+    errors: int
+    series: Optional[SeriesCacheStats] = None
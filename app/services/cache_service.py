@@ -0,0 +1,212 @@
+from app.core.config import settings
+from app.models.telemetry import CacheStatsResponse
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Union
+from datetime import datetime
+import asyncio
+import hashlib
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class MemoryCacheBackend:
+    """In-process LRU cache with per-entry expiry"""
+
+    shared = False
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class RedisCacheBackend:
+    """
+    Cache shared by all replicas through a Redis (or compatible) server.
+
+    Values are stored as JSON produced by the given dumps/loads callables.
+    Bounding memory is left to the server's maxmemory-policy (allkeys-lru).
+    Server errors are logged and treated as cache misses.
+    """
+
+    shared = True
+
+    def __init__(self, url: str, dumps: Callable[[Any], Union[str, bytes]], loads: Callable[[bytes], Any], prefix: str = "malti:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("The redis cache backend requires the 'redis' package (pip install redis)")
+        self.client = redis.from_url(url)
+        self.dumps = dumps
+        self.loads = loads
+        self.prefix = prefix
+        self.evictions = 0
+        self.errors = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        try:
+            value = await self.client.get(self.prefix + key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Cache get failed: {e}")
+            return None
+        return self.loads(value) if value is not None else None
+
+    async def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        try:
+            await self.client.set(self.prefix + key, self.dumps(value), px=max(int(ttl_seconds * 1000), 1))
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Cache set failed: {e}")
+
+    async def clear(self) -> None:
+        try:
+            async for key in self.client.scan_iter(match=self.prefix + "*"):
+                await self.client.delete(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Cache clear failed: {e}")
+
+    def __len__(self) -> int:
+        return 0  # not tracked locally
+
+class SingleFlight:
+    """Lets concurrent callers with the same key share one in-flight computation"""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Run compute for key, or wait for the running one; returns (value, shared)"""
+        while key in self._inflight:
+            future = self._inflight[key]
+            try:
+                # Shield, so a cancelled waiter does not cancel the shared computation
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The caller running the computation was cancelled; take over
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Retrieve it, so asyncio does not warn when nobody was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            return value, False
+        finally:
+            del self._inflight[key]
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def make_cache_key(namespace: str, parts: Dict[str, Any]) -> str:
+    """Build a stable cache key from query parts"""
+    payload = json.dumps(parts, sort_keys=True, default=_json_default, separators=(",", ":"))
+    return f"{namespace}:{hashlib.sha1(payload.encode()).hexdigest()}"
+
+class QueryResultCache:
+    """
+    Result cache with single-flight in front of an expensive query.
+
+    A lookup first checks the backend; on a miss, concurrent identical lookups
+    share one computation whose result is stored with the given TTL.
+    """
+
+    def __init__(self, backend, enabled: bool = True):
+        self.backend = backend
+        self.enabled = enabled
+        self.single_flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+
+    async def get_or_compute(self, key: str, ttl_seconds: float, compute: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.enabled or ttl_seconds <= 0:
+            return await compute()
+
+        value = await self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        async def compute_and_store():
+            result = await compute()
+            await self.backend.set(key, result, ttl_seconds)
+            return result
+
+        value, shared = await self.single_flight.do(key, compute_and_store)
+        if shared:
+            self.shared += 1
+        else:
+            self.misses += 1
+        return value
+
+    async def clear(self) -> None:
+        await self.backend.clear()
+
+    def get_stats(self) -> CacheStatsResponse:
+        """Get hit, miss and single-flight counters of this process"""
+        lookups = self.hits + self.misses + self.shared
+        return CacheStatsResponse(
+            enabled=self.enabled,
+            backend="redis" if self.backend.shared else "memory",
+            entries=len(self.backend),
+            max_entries=getattr(self.backend, "max_entries", None),
+            hits=self.hits,
+            misses=self.misses,
+            shared=self.shared,
+            hit_ratio=(self.hits + self.shared) / lookups if lookups else 0.0,
+            in_flight=len(self.single_flight),
+            evictions=self.backend.evictions,
+            errors=getattr(self.backend, "errors", 0)
+        )
+
+def create_cache_backend(dumps: Callable[[Any], Union[str, bytes]], loads: Callable[[bytes], Any]):
+    """Create the configured cache backend"""
+    if settings.metrics_cache_backend == "redis":
+        if not settings.metrics_cache_redis_url:
+            raise RuntimeError("METRICS_CACHE_REDIS_URL must be set for the redis cache backend")
+        return RedisCacheBackend(settings.metrics_cache_redis_url, dumps, loads)
+    if settings.metrics_cache_backend != "memory":
+        raise RuntimeError(f"Unknown metrics cache backend: {settings.metrics_cache_backend}")
+    return MemoryCacheBackend(settings.metrics_cache_max_entries)
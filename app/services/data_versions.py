@@ -0,0 +1,45 @@
+from app.services.refresh_service import RAW_SOURCE, refresh_scheduler
+from typing import Dict, Iterable, Optional
+from datetime import datetime
+import uuid
+
+class DataVersions:
+    """
+    Change counters of the data this process ingested or refreshed.
+
+    Ingest bumps the counter of every service it stored rows for, and targeted
+    refreshes bump the refreshed view. Together with the materialization
+    watermarks they tell cheaply whether a metrics response may have changed.
+    Counters are per process; the instance token keeps versions of different
+    processes and restarts apart.
+    """
+
+    def __init__(self):
+        self._instance = uuid.uuid4().hex[:12]
+        self._sequence = 0
+        self._ingested = 0
+        self._services: Dict[str, int] = {}
+        self._sources: Dict[str, int] = {}
+
+    def mark_ingest(self, services: Iterable[str]) -> None:
+        """Record that rows of the given services were stored"""
+        self._sequence += 1
+        self._ingested = self._sequence
+        for service in services:
+            self._services[service] = self._sequence
+
+    def invalidate(self, source: str, start: datetime, end: datetime) -> None:
+        """Refresh listener recording that a view was refreshed"""
+        if source != RAW_SOURCE:
+            self._sequence += 1
+            self._sources[source] = self._sequence
+
+    def version(self, service: Optional[str], sources: Iterable[str]) -> str:
+        """Version of the data of one service, or of all services, read from the given sources"""
+        ingested = self._services.get(service, 0) if service else self._ingested
+        refreshed = max((self._sources.get(source, 0) for source in sources), default=0)
+        return f"{self._instance}-{ingested}-{refreshed}"
+
+# Global data versions of this process
+data_versions = DataVersions()
+refresh_scheduler.add_listener(data_versions.invalidate)
@@ -0,0 +1,245 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+from app.core.config import settings
+from app.services.rollups import SOURCE_RETENTION
+from app.models.telemetry import DimensionValue, DimensionValuesResponse
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timezone
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Dimensions recorded in the catalog; every value is kept per service
+CATALOG_DIMENSIONS = ('service', 'node', 'method', 'endpoint', 'consumer', 'context')
+
+CatalogKey = Tuple[str, str, str]  # dimension, service, value
+
+# Values last seen before the longest retention of any source have no data left to filter
+CATALOG_RETENTION = max(SOURCE_RETENTION.values())
+
+class DimensionCatalog:
+    """
+    In-memory first-seen and last-seen times of dimension values between flushes.
+
+    The ingest path observes every stored request; a flush upserts the pending
+    values into dimension_catalog, keeping the earliest first_seen and the
+    latest last_seen, so flushes of several replicas merge.
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self.dropped = 0
+        self._pending: Dict[CatalogKey, List[datetime]] = {}
+
+    def observe(self, row: dict) -> None:
+        """Record the dimension values of a stored request row"""
+        created_at = row['created_at']
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+
+        for dimension in CATALOG_DIMENSIONS:
+            value = row.get(dimension)
+            if value is None:
+                continue
+            key = (dimension, row['service'], value)
+            seen = self._pending.get(key)
+            if seen is None:
+                if len(self._pending) >= self.max_keys:
+                    self.dropped += 1
+                    continue
+                self._pending[key] = [created_at, created_at]
+            elif created_at < seen[0]:
+                seen[0] = created_at
+            elif created_at > seen[1]:
+                seen[1] = created_at
+
+    def pending(self, dimension: str, service: Optional[str] = None, prefix: str = "") -> List[Tuple[str, str, datetime, datetime]]:
+        """Values of a dimension observed since the last flush, as (service, value, first_seen, last_seen)"""
+        return [
+            (key_service, value, seen[0], seen[1])
+            for (key_dimension, key_service, value), seen in self._pending.items()
+            if key_dimension == dimension
+            and (service is None or key_service == service)
+            and value.startswith(prefix)
+        ]
+
+    def drain(self) -> Dict[CatalogKey, List[datetime]]:
+        """Take all pending values, leaving the catalog empty"""
+        pending, self._pending = self._pending, {}
+        return pending
+
+    def restore(self, pending: Dict[CatalogKey, List[datetime]]) -> None:
+        """Put values back after a failed flush so they are retried on the next one"""
+        for key, (first_seen, last_seen) in pending.items():
+            seen = self._pending.setdefault(key, [first_seen, last_seen])
+            seen[0] = min(seen[0], first_seen)
+            seen[1] = max(seen[1], last_seen)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+# Global catalog fed by all ingest requests of this process
+dimension_catalog = DimensionCatalog(max_keys=settings.dimension_catalog_max_keys)
+
+def _like_prefix(prefix: str) -> str:
+    """LIKE pattern matching values that start with prefix"""
+    return prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+class DimensionCatalogService:
+    """Service for persisting and searching the dimension catalog"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def flush(self, catalog: DimensionCatalog = dimension_catalog) -> int:
+        """Upsert the pending values into dimension_catalog"""
+        pending = catalog.drain()
+        if not pending:
+            return 0
+
+        upsert_query = text("""
+            INSERT INTO dimension_catalog (dimension, service, value, first_seen, last_seen)
+            VALUES (:dimension, :service, :value, :first_seen, :last_seen)
+            ON CONFLICT (dimension, service, value) DO UPDATE SET
+                first_seen = LEAST(dimension_catalog.first_seen, EXCLUDED.first_seen),
+                last_seen = GREATEST(dimension_catalog.last_seen, EXCLUDED.last_seen)
+        """)
+
+        try:
+            await self.db.execute(upsert_query, [
+                {
+                    'dimension': dimension,
+                    'service': service,
+                    'value': value,
+                    'first_seen': first_seen,
+                    'last_seen': last_seen
+                }
+                for (dimension, service, value), (first_seen, last_seen) in pending.items()
+            ])
+            await self.db.commit()
+            return len(pending)
+        except Exception as e:
+            await self.db.rollback()
+            catalog.restore(pending)
+            raise e
+
+    async def expire(self, now: Optional[datetime] = None) -> int:
+        """Delete the values last seen before CATALOG_RETENTION"""
+        cutoff = (now or datetime.now(timezone.utc)) - CATALOG_RETENTION
+        try:
+            result = await self.db.execute(
+                text("DELETE FROM dimension_catalog WHERE last_seen < :cutoff"), {'cutoff': cutoff}
+            )
+            await self.db.commit()
+            return result.rowcount
+        except Exception as e:
+            await self.db.rollback()
+            raise e
+
+    async def search(
+        self,
+        dimension: str,
+        service: Optional[str] = None,
+        prefix: str = "",
+        seen_after: Optional[datetime] = None,
+        seen_before: Optional[datetime] = None,
+        limit: int = 100,
+        catalog: DimensionCatalog = dimension_catalog
+    ) -> DimensionValuesResponse:
+        """
+        Get the values of a dimension with their first-seen and last-seen times.
+
+        Values are matched by prefix and, optionally, restricted to those seen
+        in [seen_after, seen_before). Without a service, values of all services
+        are merged. Values observed by this process since the last flush are
+        included.
+        """
+        where_conditions = ["dimension = :dimension"]
+        params = {'dimension': dimension, 'limit': limit}
+
+        if service:
+            where_conditions.append("service = :service")
+            params['service'] = service
+
+        if prefix:
+            where_conditions.append("value LIKE :prefix")
+            params['prefix'] = _like_prefix(prefix)
+
+        where_clause = " AND ".join(where_conditions)
+
+        having_conditions = []
+        if seen_after:
+            having_conditions.append("MAX(last_seen) >= :seen_after")
+            params['seen_after'] = seen_after
+        if seen_before:
+            having_conditions.append("MIN(first_seen) < :seen_before")
+            params['seen_before'] = seen_before
+        having_clause = f"HAVING {' AND '.join(having_conditions)}" if having_conditions else ""
+
+        search_query = text(f"""
+            SELECT
+                value,
+                MIN(first_seen) as first_seen,
+                MAX(last_seen) as last_seen
+            FROM dimension_catalog
+            WHERE {where_clause}
+            GROUP BY value
+            {having_clause}
+            ORDER BY value
+            LIMIT :limit
+        """)
+
+        rows = (await self.db.execute(search_query, params)).fetchall()
+
+        values: Dict[str, List[datetime]] = {row.value: [row.first_seen, row.last_seen] for row in rows}
+        for _, value, first_seen, last_seen in catalog.pending(dimension, service or None, prefix):
+            seen = values.setdefault(value, [first_seen, last_seen])
+            seen[0] = min(seen[0], first_seen)
+            seen[1] = max(seen[1], last_seen)
+
+        results = sorted(
+            (value, first_seen, last_seen)
+            for value, (first_seen, last_seen) in values.items()
+            if (seen_after is None or last_seen >= seen_after)
+            and (seen_before is None or first_seen < seen_before)
+        )[:limit]
+
+        return DimensionValuesResponse(
+            dimension=dimension,
+            service=service,
+            prefix=prefix,
+            values=[
+                DimensionValue(value=value, first_seen=first_seen, last_seen=last_seen)
+                for value, first_seen, last_seen in results
+            ]
+        )
+
+async def run_dimension_catalog_flush_loop(
+    session_factory,
+    interval_seconds: int,
+    expire_interval_seconds: int = settings.dimension_catalog_expire_interval_seconds
+) -> None:
+    """Periodically flush the dimension catalog, and expire old values less often, until cancelled"""
+    expired_at = None
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            async with session_factory() as session:
+                flushed = await DimensionCatalogService(session).flush()
+            if flushed:
+                logger.debug(f"Flushed {flushed} dimension catalog entries")
+        except Exception as e:
+            logger.error(f"Dimension catalog flush failed: {e}")
+
+        if expired_at is not None and time.monotonic() - expired_at < expire_interval_seconds:
+            continue
+        expired_at = time.monotonic()
+        try:
+            async with session_factory() as session:
+                expired = await DimensionCatalogService(session).expire()
+            if expired:
+                logger.info(f"Expired {expired} dimension catalog entries")
+        except Exception as e:
+            logger.error(f"Dimension catalog expiry failed: {e}")
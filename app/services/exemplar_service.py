@@ -0,0 +1,272 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+from app.core.config import settings
+from app.services.latency_sketch import clamp, histogram_quantiles, trim_histogram
+from app.models.telemetry import (
+    Exemplar,
+    ExemplarBucket,
+    ExemplarDrilldownResponse
+)
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timezone, timedelta
+import asyncio
+import heapq
+import logging
+import random
+
+logger = logging.getLogger(__name__)
+
+ReservoirKey = Tuple[str, str, datetime]
+
+class ExemplarReservoir:
+    """
+    In-memory weighted reservoir of raw requests per service, endpoint and hour.
+
+    Uses weighted reservoir sampling (A-Res): every request gets the key
+    u ** (1 / weight) and the reservoir keeps the highest keys. Slow requests
+    and errors get a higher weight, so they are preferred without starving
+    normal traffic. Because the keys are stored with the sampled rows, the
+    top keys of several flushes (or replicas) are again a valid sample.
+    """
+
+    def __init__(self, size: int, max_keys: int):
+        self.size = size
+        self.max_keys = max_keys
+        self.dropped = 0
+        self._reservoirs: Dict[ReservoirKey, List[Tuple[float, int, dict]]] = {}
+        self._counter = 0
+
+    @staticmethod
+    def hour_bucket(created_at: datetime) -> datetime:
+        """Truncate a timestamp to the start of its UTC hour"""
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        return created_at.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+    @staticmethod
+    def weight(status: int, response_time: int) -> float:
+        """Sampling weight biased toward slow requests and errors"""
+        weight = 1.0 + max(response_time, 0) / max(settings.exemplar_latency_reference_ms, 1)
+        if status >= 400 and status != 401:
+            weight *= settings.exemplar_error_weight
+        return weight
+
+    def offer(self, row: dict) -> None:
+        """Offer a stored request row to the reservoir of its service, endpoint and hour"""
+        bucket = self.hour_bucket(row['created_at'])
+        key = (row['service'], row['endpoint'], bucket)
+
+        reservoir = self._reservoirs.get(key)
+        if reservoir is None:
+            if len(self._reservoirs) >= self.max_keys:
+                self.dropped += 1
+                return
+            reservoir = self._reservoirs[key] = []
+
+        # random() is in [0, 1); use 1 - random() to avoid a zero key
+        sample_key = (1.0 - random.random()) ** (1.0 / self.weight(row['status'], row['response_time']))
+        self._counter += 1
+        entry = (sample_key, self._counter, {**row, 'bucket': bucket, 'sample_key': sample_key})
+
+        if len(reservoir) < self.size:
+            heapq.heappush(reservoir, entry)
+        elif sample_key > reservoir[0][0]:
+            heapq.heapreplace(reservoir, entry)
+
+    def drain(self) -> Tuple[List[dict], List[ReservoirKey]]:
+        """Take all sampled rows and the keys they belong to, leaving the reservoir empty"""
+        reservoirs, self._reservoirs = self._reservoirs, {}
+        rows = [entry[2] for reservoir in reservoirs.values() for entry in reservoir]
+        return rows, list(reservoirs.keys())
+
+    def restore(self, rows: List[dict]) -> None:
+        """Put rows back after a failed flush so they are retried on the next one"""
+        for row in rows:
+            key = (row['service'], row['endpoint'], row['bucket'])
+            reservoir = self._reservoirs.setdefault(key, [])
+            self._counter += 1
+            entry = (row['sample_key'], self._counter, row)
+            if len(reservoir) < self.size:
+                heapq.heappush(reservoir, entry)
+            elif row['sample_key'] > reservoir[0][0]:
+                heapq.heapreplace(reservoir, entry)
+
+# Global reservoir shared by all ingest requests of this process
+exemplar_reservoir = ExemplarReservoir(
+    size=settings.exemplar_reservoir_size,
+    max_keys=settings.exemplar_max_keys
+)
+
+class ExemplarService:
+    """Service for persisting and querying sampled exemplar requests"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def flush(self, reservoir: ExemplarReservoir = exemplar_reservoir) -> int:
+        """Write the sampled rows to request_exemplars and trim every touched hour back to the reservoir size"""
+        rows, keys = reservoir.drain()
+        if not rows:
+            return 0
+
+        insert_query = text("""
+            INSERT INTO request_exemplars (bucket, created_at, service, node, method, endpoint, consumer, context, status, response_time, sample_key)
+            VALUES (:bucket, :created_at, :service, :node, :method, :endpoint, :consumer, :context, :status, :response_time, :sample_key)
+        """)
+
+        # Keep only the highest sample keys per service, endpoint and hour, which merges
+        # this flush with earlier flushes and other replicas into one weighted sample
+        trim_query = text("""
+            DELETE FROM request_exemplars
+            WHERE service = :service
+            AND endpoint = :endpoint
+            AND bucket = :bucket
+            AND sample_key < (
+                SELECT sample_key
+                FROM request_exemplars
+                WHERE service = :service
+                AND endpoint = :endpoint
+                AND bucket = :bucket
+                ORDER BY sample_key DESC
+                OFFSET :keep_offset
+                LIMIT 1
+            )
+        """)
+
+        try:
+            await self.db.execute(insert_query, rows)
+            await self.db.execute(trim_query, [
+                {
+                    'service': service,
+                    'endpoint': endpoint,
+                    'bucket': bucket,
+                    'keep_offset': reservoir.size - 1
+                }
+                for service, endpoint, bucket in keys
+            ])
+            await self.db.commit()
+            return len(rows)
+        except Exception as e:
+            await self.db.rollback()
+            reservoir.restore(rows)
+            raise e
+
+    async def get_drilldown(
+        self,
+        service: str,
+        endpoint: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
+    ) -> ExemplarDrilldownResponse:
+        """Get hourly buckets from requests_1hour together with their sampled exemplar requests"""
+        now = datetime.now(timezone.utc)
+        if not end_time:
+            end_time = now
+        if not start_time:
+            start_time = end_time - timedelta(days=1)
+
+        where_conditions = ["service = :service"]
+        params = {
+            'service': service,
+            'start_time': ExemplarReservoir.hour_bucket(start_time),
+            'end_time': end_time
+        }
+
+        if endpoint:
+            where_conditions.append("endpoint = :endpoint")
+            params['endpoint'] = endpoint
+
+        where_clause = " AND ".join(where_conditions)
+
+        buckets_query = text(f"""
+            SELECT
+                bucket,
+                service,
+                endpoint,
+                method,
+                SUM(count_requests) as total_requests,
+                SUM(CASE WHEN status >= 400 AND status != 401 THEN count_requests ELSE 0 END) as error_count,
+                MIN(min_response_time) FILTER (WHERE status >= 200 AND status < 300)::float as min_latency,
+                MAX(max_response_time) FILTER (WHERE status >= 200 AND status < 300)::float as max_latency,
+                malti_hist_merge(latency_histogram) FILTER (WHERE status >= 200 AND status < 300) as latency_histogram
+            FROM requests_1hour
+            WHERE {where_clause}
+            AND bucket >= :start_time
+            AND bucket <= :end_time
+            GROUP BY bucket, service, endpoint, method
+            ORDER BY bucket DESC, total_requests DESC
+        """)
+
+        exemplars_query = text(f"""
+            SELECT
+                bucket,
+                created_at,
+                service,
+                node,
+                method,
+                endpoint,
+                consumer,
+                context,
+                status,
+                response_time
+            FROM request_exemplars
+            WHERE {where_clause}
+            AND bucket >= :start_time
+            AND bucket <= :end_time
+            ORDER BY bucket DESC, response_time DESC
+        """)
+
+        bucket_rows = (await self.db.execute(buckets_query, params)).fetchall()
+        exemplar_rows = (await self.db.execute(exemplars_query, params)).fetchall()
+
+        exemplars: Dict[Tuple[datetime, str, str, str], List[Exemplar]] = {}
+        for row in exemplar_rows:
+            exemplars.setdefault((row.bucket, row.service, row.endpoint, row.method), []).append(
+                Exemplar(
+                    created_at=row.created_at,
+                    node=row.node,
+                    consumer=row.consumer,
+                    context=row.context,
+                    status=row.status,
+                    response_time=row.response_time
+                )
+            )
+
+        buckets = [
+            ExemplarBucket(
+                bucket=row.bucket,
+                service=row.service,
+                endpoint=row.endpoint,
+                method=row.method,
+                total_requests=row.total_requests,
+                error_count=row.error_count,
+                max_latency=row.max_latency,
+                p95_latency=clamp(
+                    histogram_quantiles(trim_histogram(row.latency_histogram), [0.95])[0],
+                    row.min_latency,
+                    row.max_latency
+                ),
+                exemplars=exemplars.get((row.bucket, row.service, row.endpoint, row.method), [])
+            )
+            for row in bucket_rows
+        ]
+
+        return ExemplarDrilldownResponse(
+            service=service,
+            endpoint=endpoint,
+            start_time=params['start_time'],
+            end_time=end_time,
+            buckets=buckets
+        )
+
+async def run_exemplar_flush_loop(session_factory, interval_seconds: int) -> None:
+    """Periodically flush the exemplar reservoir until cancelled"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            async with session_factory() as session:
+                flushed = await ExemplarService(session).flush()
+            if flushed:
+                logger.debug(f"Flushed {flushed} exemplar requests")
+        except Exception as e:
+            logger.error(f"Exemplar flush failed: {e}")
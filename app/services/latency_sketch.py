@@ -0,0 +1,98 @@
+"""
+Mergeable log-scale latency histograms.
+
+The continuous aggregates store a histogram of ln(1 + response_time) with
+HISTOGRAM_BINS equal-width bins over [0, ln(1 + HISTOGRAM_MAX_MS)), computed
+with TimescaleDB's histogram(). Bins are therefore about 11% wide in
+latency, and a quantile interpolated inside its bin is within a few percent
+of the exact value, for any number of merged buckets. Histograms are merged
+in SQL with the malti_hist_merge aggregate (see database/init.sql) and turned
+into quantiles here.
+
+histogram() returns HISTOGRAM_BINS + 2 counts: values below the range first
+(never for latencies), then the bins, then values at or above
+HISTOGRAM_MAX_MS. In Python a histogram is kept trimmed to its non-zero span
+as (offset, counts), which keeps cached time series buckets small.
+"""
+from typing import Iterable, List, Optional, Sequence, Tuple
+import math
+
+HISTOGRAM_BINS = 128
+HISTOGRAM_MAX_MS = 600000  # 10 minutes; slower requests fall into the overflow bin
+
+# Quantiles reported for every latency series
+PERCENTILES = (('p50_latency', 0.50), ('p90_latency', 0.90), ('p95_latency', 0.95), ('p99_latency', 0.99))
+
+# Bin width in ln(1 + ms)
+_BIN_WIDTH = math.log1p(HISTOGRAM_MAX_MS) / HISTOGRAM_BINS
+
+Histogram = Tuple[int, Tuple[int, ...]]
+
+def histogram_sql(value: str) -> str:
+    """SQL expression building the latency histogram of a response time column"""
+    return (
+        f"histogram(ln(1 + {value}::double precision), 0, ln({HISTOGRAM_MAX_MS + 1}), {HISTOGRAM_BINS})::bigint[]"
+    )
+
+def trim_histogram(counts: Optional[Sequence[int]]) -> Optional[Histogram]:
+    """Trim a full histogram array to its non-zero span"""
+    if not counts:
+        return None
+    first = next((i for i, count in enumerate(counts) if count), None)
+    if first is None:
+        return None
+    last = max(i for i, count in enumerate(counts) if count)
+    return first, tuple(counts[first:last + 1])
+
+def merge_histograms(histograms: Iterable[Optional[Histogram]]) -> Optional[Histogram]:
+    """Add up trimmed histograms"""
+    histograms = [histogram for histogram in histograms if histogram]
+    if not histograms:
+        return None
+    start = min(offset for offset, _ in histograms)
+    end = max(offset + len(counts) for offset, counts in histograms)
+    merged = [0] * (end - start)
+    for offset, counts in histograms:
+        for i, count in enumerate(counts, offset - start):
+            merged[i] += count
+    return start, tuple(merged)
+
+def _bin_value(position: int, fraction: float) -> float:
+    """Latency at a fraction of the way through the bin at a position of the full array"""
+    if position <= 0:
+        return 0.0
+    if position > HISTOGRAM_BINS:
+        return float(HISTOGRAM_MAX_MS)
+    return math.expm1((position - 1 + fraction) * _BIN_WIDTH)
+
+def histogram_quantiles(histogram: Optional[Histogram], quantiles: Sequence[float]) -> List[Optional[float]]:
+    """Estimate quantiles by interpolating the rank inside its bin"""
+    if not histogram:
+        return [None] * len(quantiles)
+    offset, counts = histogram
+    total = sum(counts)
+    if not total:
+        return [None] * len(quantiles)
+
+    results: List[Optional[float]] = []
+    for quantile in quantiles:
+        target = quantile * total
+        cumulative = 0
+        value = _bin_value(offset + len(counts) - 1, 1.0)
+        for i, count in enumerate(counts):
+            if count and cumulative + count >= target:
+                value = _bin_value(offset + i, (target - cumulative) / count)
+                break
+            cumulative += count
+        results.append(value)
+    return results
+
+def clamp(value: Optional[float], low: Optional[float], high: Optional[float]) -> Optional[float]:
+    """Limit an estimate to the exact minimum and maximum"""
+    if value is None:
+        return None
+    if low is not None:
+        value = max(value, low)
+    if high is not None:
+        value = min(value, high)
+    return value
@@ -0,0 +1,578 @@
+"""
+Single-scan query engine for dashboard metrics.
+
+All dashboard panels are computed from one scan of the source table using
+GROUPING SETS: every panel corresponds to one grouping set, and the result
+rows are split back into panels in Python by their GROUPING() id. Gap filling
+of the time series happens in Python as well, since time_bucket_gapfill
+cannot be combined with grouping sets. Only the node and context lists come
+from the dimension catalog instead.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from datetime import datetime, timedelta
+from app.services.refresh_service import align_bucket
+from app.services.rollups import FULL_DIMENSIONS, HISTORY_ROLLUPS, ROLLUP_TIER_TABLE, RollupTier, plan_segments
+from app.services.latency_sketch import (
+    PERCENTILES,
+    clamp,
+    histogram_quantiles,
+    merge_histograms,
+    trim_histogram
+)
+
+SUCCESS_CONDITION = "status >= 200 AND status < 300"
+ERROR_CONDITION = "status >= 400 AND status != 401"
+
+# Columns that take part in GROUPING(), in argument order
+GROUPING_COLUMNS = ('bucket', 'service', 'node', 'method', 'endpoint', 'consumer', 'context', 'status')
+
+# Dimension columns of the sources, in the order they are selected
+DIMENSION_COLUMNS = GROUPING_COLUMNS[1:]
+
+# Dimensions a query can filter by, in the order their conditions are written
+FILTER_COLUMNS = ('service', 'node', 'method', 'endpoint', 'consumer', 'context')
+
+# Sources statements may read, with their time column; the only identifiers put into statements
+SOURCE_TIME_COLUMNS: Dict[str, str] = {
+    'requests': 'created_at',
+    **{table_name: 'bucket' for table_name in ROLLUP_TIER_TABLE},
+    **{table_name: 'bucket' for table_name in HISTORY_ROLLUPS},
+}
+
+# Grouping set of every dashboard panel
+PANEL_GROUPING_SETS: Dict[str, Tuple[str, ...]] = {
+    'time_series': ('bucket',),
+    'metrics_summary': (),
+    'endpoints': ('endpoint', 'method', 'service'),
+    'status_distribution': ('service', 'status'),
+    'consumers': ('consumer',),
+    'system_overview': (),
+}
+
+# Panels listing filter values, served from the dimension catalog instead of a DISTINCT scan
+CATALOG_PANELS: Dict[str, str] = {
+    'distinct_nodes': 'node',
+    'distinct_contexts': 'context',
+}
+
+# Panels computed by the GROUPING SETS scan
+SCAN_PANELS = tuple(PANEL_GROUPING_SETS.keys())
+
+ALL_PANELS = SCAN_PANELS + tuple(CATALOG_PANELS.keys())
+
+# Panels that list items, with the columns identifying one item; top_k limits these
+LIST_PANEL_KEYS: Dict[str, Tuple[str, ...]] = {
+    'endpoints': ('endpoint', 'method', 'service'),
+    'status_distribution': ('service',),
+    'consumers': ('consumer',),
+}
+
+# Value of the identifying columns of the item that aggregates the items past top_k,
+# which is flagged is_other
+OTHER_LABEL = "(other)"
+
+# Panels that can be derived exactly from cached time series buckets of a rollup
+SERIES_DERIVABLE_PANELS = frozenset(('time_series', 'metrics_summary', 'system_overview'))
+
+_PERCENTILE_ARRAY = "ARRAY[" + ", ".join(str(quantile) for _, quantile in PERCENTILES) + "]"
+
+# Dimensions that are not grouped by in the time series and summary grouping sets
+_LATENCY_SETS_CONDITION = f"GROUPING({', '.join(DIMENSION_COLUMNS)}) = {2 ** len(DIMENSION_COLUMNS) - 1}"
+
+# Aggregate expressions re-aggregating the pre-aggregated columns of the continuous aggregates
+ROLLUP_AGGREGATES = {
+    'total_requests': "SUM(count_requests)::bigint",
+    'error_count': f"COALESCE(SUM(count_requests) FILTER (WHERE {ERROR_CONDITION}), 0)::bigint",
+    'success_count': f"COALESCE(SUM(count_requests) FILTER (WHERE {SUCCESS_CONDITION}), 0)::bigint",
+    'min_latency': f"MIN(min_response_time) FILTER (WHERE {SUCCESS_CONDITION})::float",
+    'avg_latency': (
+        f"(SUM(sum_response_time) FILTER (WHERE {SUCCESS_CONDITION}) / "
+        f"NULLIF(SUM(count_requests) FILTER (WHERE {SUCCESS_CONDITION}), 0))::float"
+    ),
+    'max_latency': f"MAX(max_response_time) FILTER (WHERE {SUCCESS_CONDITION})::float",
+    # Merged latency histograms, returned only where latency percentiles are shown
+    'latency_histogram': (
+        f"CASE WHEN {_LATENCY_SETS_CONDITION} "
+        f"THEN malti_hist_merge(latency_histogram) FILTER (WHERE {SUCCESS_CONDITION}) END"
+    ),
+}
+
+# Columns every rollup provides for ROLLUP_AGGREGATES
+ROLLUP_MEASURES = "count_requests, min_response_time, max_response_time, sum_response_time, latency_histogram"
+
+class QueryPlan:
+    """Source table, bucket width and filters resolved for one metrics query"""
+
+    def __init__(
+        self,
+        table_name: str,
+        bucket_size: str,
+        bucket_width: timedelta,
+        params: Dict[str, Any],
+        start_time: datetime,
+        end_time: datetime,
+        tier: Optional[RollupTier] = None,
+        filters: Tuple[str, ...] = (),
+        top_k: Optional[int] = None,
+        offset: int = 0
+    ):
+        self.table_name = table_name
+        self.bucket_size = bucket_size
+        self.bucket_width = bucket_width
+        self.params = params
+        self.start_time = start_time
+        self.end_time = end_time
+        # Rollup tier of table_name, whose narrower rollups may serve some panels
+        self.tier = tier
+        # Dimensions the where clause filters by
+        self.filters = filters
+        # Items of list panels to return, after skipping the first offset items
+        self.top_k = top_k
+        self.offset = offset
+
+    def with_range(self, start_time: datetime, end_time: datetime) -> "QueryPlan":
+        """Copy of this plan over another time range"""
+        return QueryPlan(
+            table_name=self.table_name,
+            bucket_size=self.bucket_size,
+            bucket_width=self.bucket_width,
+            params={**self.params, 'start_time': start_time, 'end_time': end_time},
+            start_time=start_time,
+            end_time=end_time,
+            tier=self.tier,
+            filters=self.filters,
+            top_k=self.top_k,
+            offset=self.offset
+        )
+
+    def segments_for(
+        self,
+        panels: Iterable[str],
+        watermarks: Dict[str, datetime],
+        history: Optional[Dict[str, Tuple[str, datetime]]] = None
+    ) -> List[Tuple[str, Tuple[str, ...], datetime, datetime]]:
+        """
+        Sources that compute the panels, as (table_name, dimensions, start, end).
+
+        Every segment reads the smallest rollup of its tier that has each
+        filtered and grouped dimension. The range is served by the plan's tier
+        up to its materialization watermark and finished by finer tiers; ranges
+        before the tier's history end are read from its history view.
+        """
+        if self.tier is None:
+            return [(self.table_name, FULL_DIMENSIONS, self.start_time, self.end_time)]
+        dimensions = set(self.filters) | panel_dimensions(panels)
+        return [
+            (rollup.table_name, rollup.dimensions, start_time, end_time)
+            for rollup, start_time, end_time in plan_segments(
+                self.tier, dimensions, self.start_time, self.end_time, watermarks, history=history
+            )
+        ]
+
+def group_panels(panels: Iterable[str]) -> List[List[str]]:
+    """Group panels that share a grouping set, so each group needs exactly one statement"""
+    groups: Dict[Tuple[str, ...], List[str]] = {}
+    for panel in panels:
+        groups.setdefault(PANEL_GROUPING_SETS[panel], []).append(panel)
+    return list(groups.values())
+
+def grouping_id(grouping_set: Sequence[str]) -> int:
+    """GROUPING() value of a grouping set: a bit is set for every column not grouped by"""
+    value = 0
+    for column in GROUPING_COLUMNS:
+        value = (value << 1) | (0 if column in grouping_set else 1)
+    return value
+
+def panel_dimensions(panels: Iterable[str]) -> Set[str]:
+    """Dimensions the panels group by"""
+    return {column for panel in panels for column in PANEL_GROUPING_SETS[panel] if column != 'bucket'}
+
+def filter_conditions(filters: Iterable[str]) -> str:
+    """
+    WHERE conditions of the filtered dimensions, each bound to the parameter of its name.
+
+    Conditions are written in FILTER_COLUMNS order, so every filter combination
+    has exactly one statement text.
+    """
+    filters = set(filters)
+    unknown = filters - set(FILTER_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown filter columns: {sorted(unknown)}")
+    conditions = [f"{column} = :{column}" for column in FILTER_COLUMNS if column in filters]
+    return " AND ".join(conditions) if conditions else "1=1"
+
+def _source_select(
+    table_name: str,
+    filters: Iterable[str],
+    measures: str,
+    dimensions: Iterable[str],
+    start_param: str,
+    end_param: str
+) -> str:
+    """Select the rows of one source over a time range, bucketed by :bucket_width"""
+    if table_name not in SOURCE_TIME_COLUMNS:
+        raise ValueError(f"Unknown metrics source: {table_name}")
+    time_column = SOURCE_TIME_COLUMNS[table_name]
+    dimensions = set(dimensions)
+    dimensions_sql = ", ".join(
+        column if column in dimensions else f"NULL::text as {column}" for column in DIMENSION_COLUMNS
+    )
+    return f"""
+                SELECT
+                    time_bucket(CAST(:bucket_width AS interval), {time_column}) as bucket,
+                    {dimensions_sql},
+                    {measures}
+                FROM {table_name}
+                WHERE {filter_conditions(filters)}
+                AND {time_column} >= :{start_param}
+                AND {time_column} < :{end_param}"""
+
+def _grouping_sets_query(base_data: str, aggregates: Dict[str, str], panels: Iterable[str]) -> str:
+    """Aggregate the base rows once per grouping set of the requested panels"""
+    grouping_sets = []
+    for panel in panels:
+        grouping_set = PANEL_GROUPING_SETS[panel]
+        if grouping_set not in grouping_sets:
+            grouping_sets.append(grouping_set)
+
+    grouping_columns = ", ".join(GROUPING_COLUMNS)
+    grouping_sets_sql = ",\n                    ".join(f"({', '.join(columns)})" for columns in grouping_sets)
+    aggregates_sql = ",\n                ".join(f"{expression} as {name}" for name, expression in aggregates.items())
+
+    return f"""
+            SELECT
+                GROUPING({grouping_columns}) as grouping_id,
+                {grouping_columns},
+                {aggregates_sql}
+            FROM ({base_data}
+            ) base_data
+            GROUP BY GROUPING SETS (
+                    {grouping_sets_sql}
+            )
+        """
+
+def build_dashboard_query(
+    table_name: str,
+    filters: Iterable[str] = (),
+    panels: Iterable[str] = SCAN_PANELS,
+    dimensions: Iterable[str] = FULL_DIMENSIONS
+) -> str:
+    """
+    Build the single-scan GROUPING SETS statement for the requested panels.
+
+    Dimensions the source does not have are selected as NULL, so every source
+    yields the same columns and GROUPING() ids. Only the registered source
+    and column names are written into the statement; filter values, the
+    time range and the bucket width are bound as :<filter>, :start_time,
+    :end_time and :bucket_width, so a statement text only depends on the
+    source, the filtered dimensions and the panels, and can be prepared once
+    per connection.
+    """
+    base_data = _source_select(table_name, filters, ROLLUP_MEASURES, dimensions, 'start_time', 'end_time')
+    return _grouping_sets_query(base_data, ROLLUP_AGGREGATES, panels)
+
+def build_stitched_query(
+    segments: Sequence[Tuple[str, Iterable[str]]],
+    filters: Iterable[str] = (),
+    panels: Iterable[str] = SCAN_PANELS
+) -> str:
+    """
+    Build the GROUPING SETS statement over consecutive segments of rollups.
+
+    Segment i is given as (table_name, dimensions) and reads the range bound
+    to :segment_<i>_start and :segment_<i>_end. All rollups share the same
+    measures, so their rows are combined with UNION ALL and aggregated once.
+    """
+    base_data = "\n                UNION ALL".join(
+        _source_select(
+            table_name, filters, ROLLUP_MEASURES, dimensions, f"segment_{i}_start", f"segment_{i}_end"
+        )
+        for i, (table_name, dimensions) in enumerate(segments)
+    )
+    return _grouping_sets_query(base_data, ROLLUP_AGGREGATES, panels)
+
+def build_raw_version_query(filters: Iterable[str] = ()) -> str:
+    """
+    Build the statement counting the raw requests of a range and their newest time.
+
+    Filter values and the range are bound like in build_dashboard_query. It is
+    meant for the short tail past the materialization watermark, whose rows
+    real-time aggregation adds to the 1-minute tier.
+    """
+    time_column = SOURCE_TIME_COLUMNS['requests']
+    return f"""
+            SELECT COUNT(*) as count, MAX({time_column}) as newest
+            FROM requests
+            WHERE {filter_conditions(filters)}
+            AND {time_column} >= :start_time
+            AND {time_column} < :end_time"""
+
+def statement_name(
+    table_names: Iterable[str],
+    filters: Iterable[str],
+    panels: Iterable[str],
+    top_k: bool = False
+) -> str:
+    """Readable identity of a canonical statement: its sources, filtered dimensions and panels"""
+    filters = [column for column in FILTER_COLUMNS if column in set(filters)]
+    name = f"{'+'.join(table_names)} by {','.join(filters) or '-'} for {','.join(panels)}"
+    return f"{name} top_k" if top_k else name
+
+def build_top_k_query(grouping_sql: str, panels: Iterable[str]) -> str:
+    """
+    Limit the items of list panels to those ranked in (:top_offset, :top_offset + :top_k].
+
+    Items are ranked by their total requests, ties broken by their identifying
+    columns, so pages are stable. A status distribution item is a service with
+    all its status rows. The items ranked after the page are summed into one
+    row per status flagged is_other; the items before it are dropped. Rows of
+    other grouping sets are passed through, so totals stay exact.
+    """
+    limited = [grouping_id(PANEL_GROUPING_SETS[panel]) for panel in panels if panel in LIST_PANEL_KEYS]
+    if not limited:
+        return grouping_sql
+
+    # Columns not in a panel's grouping set are NULL, so partitioning by all
+    # identifying columns partitions every list panel by its own items
+    item_columns = ", ".join(dict.fromkeys(column for keys in LIST_PANEL_KEYS.values() for column in keys))
+    limited_ids = ", ".join(str(value) for value in limited)
+    columns = ", ".join(('grouping_id',) + GROUPING_COLUMNS + tuple(ROLLUP_AGGREGATES))
+    other_columns = ", ".join(
+        (('grouping_id',) + tuple(
+            "status" if column == 'status' else f"NULL as {column}" for column in GROUPING_COLUMNS
+        ) + (
+            "SUM(total_requests)::bigint as total_requests",
+            "SUM(error_count)::bigint as error_count",
+            "SUM(success_count)::bigint as success_count",
+        ) + tuple(
+            f"NULL as {name}" for name in ROLLUP_AGGREGATES if name not in ('total_requests', 'error_count', 'success_count')
+        ))
+    )
+
+    return f"""
+            WITH grouped AS ({grouping_sql}),
+            item_totals AS (
+                SELECT
+                    grouped.*,
+                    SUM(total_requests) OVER (PARTITION BY grouping_id, {item_columns}) as item_total
+                FROM grouped
+            ),
+            ranked AS (
+                SELECT
+                    item_totals.*,
+                    CASE WHEN grouping_id IN ({limited_ids})
+                        THEN DENSE_RANK() OVER (PARTITION BY grouping_id ORDER BY item_total DESC, {item_columns})
+                    END as item_rank
+                FROM item_totals
+            )
+            SELECT {columns}, false as is_other
+            FROM ranked
+            WHERE item_rank IS NULL
+            OR (item_rank > CAST(:top_offset AS bigint) AND item_rank <= CAST(:top_offset AS bigint) + CAST(:top_k AS bigint))
+            UNION ALL
+            SELECT {other_columns}, true as is_other
+            FROM ranked
+            WHERE item_rank > CAST(:top_offset AS bigint) + CAST(:top_k AS bigint)
+            GROUP BY grouping_id, status
+        """
+
+def is_other_item(item: Dict[str, Any]) -> bool:
+    """Whether a list panel item is the row aggregating the items past top_k"""
+    return item.get('is_other', False)
+
+def _error_rate(errors: int, total: int) -> float:
+    return errors / total * 100 if total else 0.0
+
+def _empty_percentiles() -> Dict[str, Any]:
+    return {name: None for name, _ in PERCENTILES}
+
+def latency_percentiles(
+    histogram: Optional[Tuple[int, Tuple[int, ...]]],
+    min_latency: Optional[float],
+    max_latency: Optional[float]
+) -> Dict[str, Optional[float]]:
+    """Percentile fields from a merged rollup histogram"""
+    quantiles = histogram_quantiles(histogram, [quantile for _, quantile in PERCENTILES])
+    return {
+        name: clamp(value, min_latency, max_latency)
+        for (name, _), value in zip(PERCENTILES, quantiles)
+    }
+
+def gapfill_time_series(
+    points: Dict[datetime, Dict[str, Any]],
+    start_time: datetime,
+    end_time: datetime,
+    bucket_width: timedelta
+) -> List[Dict[str, Any]]:
+    """Fill missing buckets between start_time and end_time with empty data points"""
+    bucket = align_bucket(start_time, bucket_width)
+    while bucket < end_time:
+        points.setdefault(bucket, {
+            'bucket': bucket,
+            'total_requests': 0,
+            'error_count': 0,
+            'success_count': 0,
+            'min_latency': None,
+            'avg_latency': None,
+            'max_latency': None,
+            'latency_histogram': None,
+            **_empty_percentiles()
+        })
+        bucket += bucket_width
+    return [points[key] for key in sorted(points)]
+
+def summarize_time_series(points: Iterable[Dict[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Derive the metrics summary and system overview from rollup time series points.
+
+    Matches the rollup aggregates exactly: counts are summed, the average is
+    weighted by successful requests, min and max are combined, and the
+    percentiles come from the merged latency histograms of all buckets.
+    """
+    points = list(points)
+    total_requests = sum(point['total_requests'] for point in points)
+    total_errors = sum(point['error_count'] for point in points)
+    latency_sum = sum(point['avg_latency'] * point['success_count'] for point in points if point['avg_latency'] is not None)
+    latency_count = sum(point['success_count'] for point in points if point['avg_latency'] is not None)
+    min_latency = min((point['min_latency'] for point in points if point['min_latency'] is not None), default=None)
+    max_latency = max((point['max_latency'] for point in points if point['max_latency'] is not None), default=None)
+    histogram = merge_histograms(point['latency_histogram'] for point in points)
+
+    avg_latency = latency_sum / latency_count if latency_count else None
+    metrics_summary = {
+        'total_requests': total_requests,
+        'avg_latency': avg_latency,
+        'min_latency': min_latency,
+        'max_latency': max_latency,
+        **latency_percentiles(histogram, min_latency, max_latency)
+    }
+    system_overview = {
+        'total_requests': total_requests,
+        'total_errors': total_errors,
+        'error_rate': _error_rate(total_errors, total_requests),
+        'avg_latency': avg_latency
+    }
+    return metrics_summary, system_overview
+
+def _with_other_flag(rows: Iterable[Any]) -> Iterable[Tuple[Any, bool]]:
+    """Rows with whether they aggregate the items past top_k; only top_k queries flag them"""
+    return ((row, getattr(row, 'is_other', False)) for row in rows)
+
+def _ranked_items(items: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """List panel items by total requests, descending, with the row aggregating the rest last"""
+    ranked, others = [], []
+    for item in items:
+        (others if item['is_other'] else ranked).append(item)
+    ranked.sort(key=lambda item: item['total_requests'], reverse=True)
+    return ranked + others
+
+def split_dashboard_rows(
+    rows: Iterable[Any],
+    panels: Iterable[str],
+    start_time: datetime,
+    end_time: datetime,
+    bucket_width: timedelta
+) -> Dict[str, Any]:
+    """Split grouping set rows into plain panel data, ordered like the dashboard expects"""
+    panels = tuple(panels)
+    by_grouping: Dict[int, List[Any]] = {}
+    for row in rows:
+        by_grouping.setdefault(row.grouping_id, []).append(row)
+
+    def rows_for(panel: str) -> List[Any]:
+        return by_grouping.get(grouping_id(PANEL_GROUPING_SETS[panel]), [])
+
+    data: Dict[str, Any] = {}
+
+    if 'time_series' in panels:
+        points = {}
+        for row in rows_for('time_series'):
+            histogram = trim_histogram(row.latency_histogram)
+            points[row.bucket] = {
+                'bucket': row.bucket,
+                'total_requests': row.total_requests,
+                'error_count': row.error_count,
+                'success_count': row.success_count,
+                'min_latency': row.min_latency,
+                'avg_latency': row.avg_latency,
+                'max_latency': row.max_latency,
+                'latency_histogram': histogram,
+                **latency_percentiles(histogram, row.min_latency, row.max_latency)
+            }
+        data['time_series'] = gapfill_time_series(points, start_time, end_time, bucket_width)
+
+    # The empty grouping set always yields exactly one row, even without data
+    totals: Optional[Any] = next(iter(rows_for('metrics_summary')), None)
+    total_requests = (totals.total_requests or 0) if totals else 0
+    total_errors = (totals.error_count or 0) if totals else 0
+
+    if 'metrics_summary' in panels:
+        data['metrics_summary'] = {
+            'total_requests': total_requests,
+            'avg_latency': totals.avg_latency if totals else None,
+            'min_latency': totals.min_latency if totals else None,
+            'max_latency': totals.max_latency if totals else None,
+            **(
+                latency_percentiles(trim_histogram(totals.latency_histogram), totals.min_latency, totals.max_latency)
+                if totals else _empty_percentiles()
+            )
+        }
+
+    if 'system_overview' in panels:
+        data['system_overview'] = {
+            'total_requests': total_requests,
+            'total_errors': total_errors,
+            'error_rate': _error_rate(total_errors, total_requests),
+            'avg_latency': totals.avg_latency if totals else None
+        }
+
+    if 'endpoints' in panels:
+        data['endpoints'] = _ranked_items(
+            {
+                'endpoint': OTHER_LABEL if other else row.endpoint,
+                'method': OTHER_LABEL if other else row.method,
+                'service': OTHER_LABEL if other else row.service,
+                'total_requests': row.total_requests,
+                'error_count': row.error_count,
+                'error_rate': _error_rate(row.error_count, row.total_requests),
+                'is_other': other
+            }
+            for row, other in _with_other_flag(rows_for('endpoints'))
+        )
+
+    if 'status_distribution' in panels:
+        services: Dict[Tuple[str, bool], Dict[str, Any]] = {}
+        for row, other in _with_other_flag(rows_for('status_distribution')):
+            service = OTHER_LABEL if other else row.service
+            entry = services.setdefault((service, other), {
+                'service': service,
+                'total_requests': 0,
+                'success_2xx': 0,
+                'warning_3xx': 0,
+                'error_4xx_5xx': 0,
+                'status_breakdown': {},
+                'is_other': other
+            })
+            entry['total_requests'] += row.total_requests
+            if 200 <= row.status < 300:
+                entry['success_2xx'] += row.total_requests
+            elif 300 <= row.status < 400:
+                entry['warning_3xx'] += row.total_requests
+            elif row.status >= 400:
+                entry['error_4xx_5xx'] += row.total_requests
+            entry['status_breakdown'][row.status] = row.total_requests
+        data['status_distribution'] = _ranked_items(services.values())
+
+    if 'consumers' in panels:
+        data['consumers'] = _ranked_items(
+            {
+                'consumer': OTHER_LABEL if other else row.consumer,
+                'total_requests': row.total_requests,
+                'error_count': row.error_count,
+                'error_rate': _error_rate(row.error_count, row.total_requests),
+                'is_other': other
+            }
+            for row, other in _with_other_flag(rows_for('consumers'))
+        )
+
+    return data
@@ -1,8 +1,8 @@
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy import text
 from app.models.telemetry import (
     MetricsQuery,
-    DashboardMetricsResponse,
+    PartialDashboardMetricsResponse,
     TimeSeriesDataPoint,
     MetricsCardsSummary,
     EndpointAggregation,
@@ -10,543 +10,488 @@ from app.models.telemetry import (
     ConsumerAggregation,
     SystemOverview
 )
-from typing import Dict, List
+from app.core.config import settings
+from app.core.database import get_replay_time
+from app.core.responses import dump_json, project, response_fields
+from app.services.cache_service import QueryResultCache, create_cache_backend, make_cache_key
+from app.services.refresh_service import align_bucket
+from app.services.watermarks import materialization_watermarks, rollup_history
+from app.services.data_versions import data_versions
+from app.services.dimension_catalog import DimensionCatalogService
+from app.services.series_cache import series_cache
+from app.services.query_governor import QueryTooExpensiveError, execute_governed, log_outcome
+from app.services.rollups import ROLLUP_TIERS, plan_bucket_width, select_tier
+from app.services.metrics_query import (
+    ALL_PANELS,
+    CATALOG_PANELS,
+    FILTER_COLUMNS,
+    SCAN_PANELS,
+    SERIES_DERIVABLE_PANELS,
+    QueryPlan,
+    build_dashboard_query,
+    build_raw_version_query,
+    build_stitched_query,
+    build_top_k_query,
+    group_panels,
+    split_dashboard_rows,
+    statement_name,
+    summarize_time_series
+)
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 from datetime import datetime, timezone, timedelta
+import asyncio
+import logging
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on the values of a node or context list
+CATALOG_PANEL_LIMIT = 1000
+
+# Result cache TTL per source, following how often each source changes
+CACHE_TTLS = {
+    "requests_1min": settings.metrics_cache_ttl_1min_seconds,
+    "requests_5min": settings.metrics_cache_ttl_5min_seconds,
+    "requests_1hour": settings.metrics_cache_ttl_1hour_seconds,
+    "requests_1day": settings.metrics_cache_ttl_1day_seconds,
+}
+
+# Response model of every panel that holds structured items
+PANEL_MODELS = {
+    'time_series': TimeSeriesDataPoint,
+    'metrics_summary': MetricsCardsSummary,
+    'endpoints': EndpointAggregation,
+    'status_distribution': StatusDistribution,
+    'consumers': ConsumerAggregation,
+    'system_overview': SystemOverview,
+}
+
+def load_payload(value: bytes) -> Dict[str, Any]:
+    """
+    Decode a payload stored as JSON by a shared cache backend.
+    
+    JSON turns the time series timestamps into ISO strings; they are restored,
+    so cached payloads are interchangeable with freshly computed ones.
+    """
+    payload = orjson.loads(value)
+    time_series = payload.get('time_series')
+    if isinstance(time_series, list):
+        for point in time_series:
+            point['bucket'] = datetime.fromisoformat(point['bucket'])
+    elif time_series and time_series['start'] is not None:
+        time_series['start'] = datetime.fromisoformat(time_series['start'])
+    return payload
+
+# Global result cache of response payloads shared by all metrics requests of this process
+metrics_cache = QueryResultCache(
+    create_cache_backend(dumps=dump_json, loads=load_payload),
+    enabled=settings.metrics_cache_enabled
+)
 
 class MetricsService:
     """Service for querying metrics data from materialized views"""
     
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, session_factory: Optional[async_sessionmaker] = None):
         self.db = db
+        # Used to run panels concurrently, each on its own pooled connection
+        self.session_factory = session_factory
+    
+    async def get_dashboard_payload(
+        self,
+        query: MetricsQuery,
+        plan: Optional[QueryPlan] = None,
+        cached: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Get dashboard metrics with server-side aggregation and gap filling.
+        
+        Returns plain data shaped like DashboardMetricsResponse (or like
+        PartialDashboardMetricsResponse with panels=), ready to be encoded
+        without validating it again. The plan of the query is made
+        unless given; with cached=False the result cache is bypassed.
+        """
+        plan = plan or self.plan_query(query)
+        panels = query.panels or ALL_PANELS
+        
+        scan_panels = [panel for panel in panels if panel in SCAN_PANELS]
+        catalog_panels = [panel for panel in panels if panel in CATALOG_PANELS]
+        
+        async def compute() -> Dict[str, Any]:
+            current = plan
+            while True:
+                try:
+                    return await self._compute_payload(current, query, scan_panels, catalog_panels)
+                except QueryTooExpensiveError as e:
+                    coarser = self._coarser_plan(current, query) if settings.metrics_cost_downgrade else None
+                    if coarser is None:
+                        log_outcome("rejected", table=e.table_name, cost=round(e.cost), limit=e.limit, panels=panels)
+                        raise
+                    log_outcome(
+                        "downgraded", table=e.table_name, cost=round(e.cost), limit=e.limit,
+                        to_table=coarser.table_name, to_bucket=coarser.bucket_size, panels=panels
+                    )
+                    current = coarser
+        
+        cache_key = make_cache_key("dashboard", self._payload_parts(plan, panels, query))
+        payload = await metrics_cache.get_or_compute(cache_key, CACHE_TTLS[plan.table_name], compute) if cached else await compute()
+        if query.since and payload['time_series'] is not None:
+            # The cached payload is shared, so the trimmed series goes into a copy
+            payload = {**payload, 'time_series': self._time_series_since(payload['time_series'], query.since)}
+        return payload
+    
+    async def _compute_payload(
+        self,
+        plan: QueryPlan,
+        query: MetricsQuery,
+        scan_panels: List[str],
+        catalog_panels: List[str]
+    ) -> Dict[str, Any]:
+        """Compute the dashboard payload of a plan"""
+        data: Dict[str, Any] = {}
+        
+        if scan_panels and self._is_incremental(plan, scan_panels):
+            # Closed buckets come from the series cache, only the open tail is queried
+            data = await self._execute_incremental(plan, scan_panels)
+        elif scan_panels:
+            if query.panels:
+                # Only the selected panels; independent statements run concurrently
+                data = await self._execute_concurrently(plan, scan_panels)
+            else:
+                # Full dashboard: every panel from a single scan on one connection
+                data = await self._execute(self.db, plan, SCAN_PANELS)
+            
+            # Warm the series cache for later time series only requests
+            if 'time_series' in data:
+                await self._store_series(plan, data['time_series'])
+        
+        # Node and context lists come from the dimension catalog
+        for panel in catalog_panels:
+            data[panel] = await self._catalog_values(plan, CATALOG_PANELS[panel])
+        
+        payload = self._build_payload(data)
+        if query.format == "columnar":
+            payload['time_series'] = (
+                self._columnar_time_series(payload['time_series'], plan) if 'time_series' in data else None
+            )
+        return payload
+    
+    def _coarser_plan(self, plan: QueryPlan, query: MetricsQuery) -> Optional[QueryPlan]:
+        """Plan of the query on the next coarser rollup tier, if there is one"""
+        if plan.tier is None or plan.tier is ROLLUP_TIERS[-1]:
+            return None
+        coarser = ROLLUP_TIERS[ROLLUP_TIERS.index(plan.tier) + 1]
+        return self.plan_query(query.model_copy(update={'interval': coarser.interval}))
+    
+    def get_delta_cursor(self, plan: QueryPlan) -> Tuple[datetime, timedelta]:
+        """
+        Start of the first bucket a later delta request must fetch again, and the bucket width.
+        
+        Buckets that ended within the series cache grace period may still
+        receive late data, so they are sent again together with newer ones.
+        """
+        since = min(series_cache.closed_before(plan.bucket_width), plan.end_time)
+        return max(since, plan.start_time), plan.bucket_width
+    
+    async def get_cache_validators(self, plan: QueryPlan, query: MetricsQuery, media_type: str) -> Tuple[str, int]:
+        """
+        ETag and max-age of the dashboard payload of a planned query, without running it.
+        
+        The ETag covers the query and the version of the data it reads: the
+        materialization watermarks of the rollups that can serve it and the
+        ingest and refresh counters of its service scope, and on a read replica
+        the time up to which it replayed the primary. Ingest counters only see
+        this process, so queries that read raw rows past the real-time tier's
+        watermark also include the count and newest time of those rows. The
+        ETag changes whenever new data may be visible, so unchanged polls can
+        be answered with 304.
+        The max-age follows how often the query's tier changes. Every media
+        type of the payload gets its own ETag.
+        """
+        panels = query.panels or ALL_PANELS
+        
+        tiers = ROLLUP_TIERS[:ROLLUP_TIERS.index(plan.tier) + 1] if plan.tier else []
+        sources = [rollup.table_name for tier in tiers for rollup in tier.rollups]
+        watermarks = await materialization_watermarks.get(self.db)
+        
+        etag = make_cache_key("etag", {
+            'raw': await self._raw_version(plan, watermarks),
+            'payload': self._payload_parts(plan, panels, query),
+            'media_type': media_type,
+            'watermarks': {source: watermarks.get(source) for source in sources},
+            'version': data_versions.version(plan.params.get('service'), sources),
+            # Responses of a replica change as it replays, whatever this process ingested
+            'replayed': await get_replay_time(self.db),
+            'since': query.since
+        })
+        return f'"{etag}"', CACHE_TTLS[plan.table_name]
     
-    async def get_dashboard_metrics(self, query: MetricsQuery) -> DashboardMetricsResponse:
-        """Get all dashboard metrics with server-side aggregation and gap filling"""
+    async def _raw_version(self, plan: QueryPlan, watermarks: Dict[str, datetime]) -> Optional[Tuple[int, Any]]:
+        """
+        Count and newest time of the raw rows of the query's range past the realtime watermark.
+        
+        Only the tail after the watermark is scanned. While the watermark is
+        unknown the scan is skipped; the ETag then changes with the watermark
+        once it is read.
+        """
+        realtime = ROLLUP_TIERS[0]
+        if plan.tier is not realtime and not settings.tier_stitching_enabled:
+            return None
+        watermark = watermarks.get(realtime.table_name)
+        if watermark is None or plan.end_time <= watermark:
+            return None
+        
+        params = {**plan.params, 'start_time': max(plan.start_time, watermark)}
+        row = (await self.db.execute(text(build_raw_version_query(plan.filters)), params)).one()
+        return row.count, row.newest
+    
+    @staticmethod
+    def _payload_parts(plan: QueryPlan, panels: Iterable[str], query: MetricsQuery) -> Dict[str, Any]:
+        """Everything that determines a dashboard payload"""
+        return {
+            'table': plan.table_name,
+            'bucket': plan.bucket_size,
+            'params': plan.params,
+            'panels': sorted(panels),
+            'top_k': plan.top_k,
+            'offset': plan.offset,
+            'format': query.format
+        }
+    
+    def plan_query(self, query: MetricsQuery) -> QueryPlan:
+        """
+        Resolve the time range, source table and filters of a query.
+        
+        The query is left as is; the defaulted range, widened to whole buckets,
+        is the plan's. Plan a request once and pass the plan on, so its cursor,
+        validators and payload all use the same tier and buckets.
+        """
         
         # Determine time range for querying
         now = datetime.now(timezone.utc)
+        start_time, end_time = query.start_time, query.end_time
         
         # If no start_time provided, default based on whether it's realtime
-        if not query.start_time:
+        if not start_time:
             if query.interval == "1min":
-                query.start_time = now - timedelta(minutes=60)  # 1 hour for realtime
+                start_time = now - timedelta(minutes=60)  # 1 hour for realtime
             else:
-                query.start_time = now - timedelta(days=7)  # 7 days for regular
+                start_time = now - timedelta(days=7)  # 7 days for regular
         
         # If no end_time provided, use current time
-        if not query.end_time:
-            query.end_time = now
-        
-        # Calculate time range duration
-        time_range = query.end_time - query.start_time
-        
-        # Determine which table/view to use and bucket size
-        if query.interval == "1min":
-            # Real-time: use raw requests table with 1-minute buckets
-            table_name = "requests"
-            bucket_size = "1 minute"
-            time_column = "created_at"
-        elif time_range.days > 4 or query.interval == "1hour":
-            # Long range: use 1-hour aggregates
-            table_name = "requests_1hour"
-            bucket_size = "1 hour"
-            time_column = "bucket"
-        else:
-            # Short range: use 5-minute aggregates
-            table_name = "requests_5min"
-            bucket_size = "5 minutes"
-            time_column = "bucket"
-        
-        # Build WHERE clause for filtering
-        where_conditions = []
-        params = {
-            'start_time': query.start_time,
-            'end_time': query.end_time
-        }
+        if not end_time:
+            end_time = now
         
-        if query.service:
-            where_conditions.append("service = :service")
-            params['service'] = query.service
+        # Treat naive timestamps as UTC, like the database does
+        if start_time.tzinfo is None:
+            start_time = start_time.replace(tzinfo=timezone.utc)
+        if end_time.tzinfo is None:
+            end_time = end_time.replace(tzinfo=timezone.utc)
         
-        if query.node:
-            where_conditions.append("node = :node")
-            params['node'] = query.node
+        # Determine which rollup tier to read, respecting each tier's retention
+        tier = select_tier(query.interval, start_time, end_time, now)
+        bucket_size = tier.bucket_size
+        bucket_width = tier.width
         
-        if query.method:
-            where_conditions.append("method = :method")
-            params['method'] = query.method
+        # Re-bucket to a wider aligned width when the tier would give more than max_points
+        if query.max_points:
+            tier, bucket_size, bucket_width = plan_bucket_width(tier, start_time, end_time, query.max_points)
+        table_name = tier.table_name
         
-        if query.endpoint:
-            where_conditions.append("endpoint = :endpoint")
-            params['endpoint'] = query.endpoint
+        # Widen the range to whole buckets, so that polling clients produce repeating cache keys
+        start_time = align_bucket(start_time, bucket_width)
+        end_bucket = align_bucket(end_time, bucket_width)
+        end_time = end_bucket if end_bucket == end_time else end_bucket + bucket_width
         
-        if query.consumer:
-            where_conditions.append("consumer = :consumer")
-            params['consumer'] = query.consumer
-
-        if query.context:
-            where_conditions.append("context = :context")
-            params['context'] = query.context
-
-        where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
-        
-        # Build comprehensive SQL query with CTEs
-        # Note: For raw requests table, we need to aggregate on-the-fly
-        if table_name == "requests":
-            # Query raw requests table with runtime aggregation
-            sql_query = text(f"""
-                WITH base_data AS (
-                    SELECT
-                        service,
-                        node,
-                        method,
-                        endpoint,
-                        consumer,
-                        context,
-                        status,
-                        response_time,
-                        created_at
-                    FROM requests
-                    WHERE {where_clause}
-                    AND created_at >= :start_time
-                    AND created_at <= :end_time
-                ),
-                time_series AS (
-                    SELECT
-                        time_bucket_gapfill('{bucket_size}', created_at, :start_time, :end_time) as bucket,
-                        COALESCE(COUNT(*), 0) as total_requests,
-                        CASE WHEN COUNT(*) FILTER (WHERE status >= 200 AND status < 300) > 0 
-                            THEN MIN(response_time) FILTER (WHERE status >= 200 AND status < 300)::float 
-                            ELSE NULL END as min_latency,
-                        CASE WHEN COUNT(*) FILTER (WHERE status >= 200 AND status < 300) > 0 
-                            THEN AVG(response_time) FILTER (WHERE status >= 200 AND status < 300)::float 
-                            ELSE NULL END as avg_latency,
-                        CASE WHEN COUNT(*) FILTER (WHERE status >= 200 AND status < 300) > 0 
-                            THEN PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY response_time) FILTER (WHERE status >= 200 AND status < 300)::float 
-                            ELSE NULL END as p95_latency,
-                        CASE WHEN COUNT(*) FILTER (WHERE status >= 200 AND status < 300) > 0 
-                            THEN MAX(response_time) FILTER (WHERE status >= 200 AND status < 300)::float 
-                            ELSE NULL END as max_latency
-                    FROM base_data
-                    GROUP BY time_bucket_gapfill('{bucket_size}', created_at, :start_time, :end_time)
-                    ORDER BY bucket
-                ),
-                metrics_summary AS (
-                    SELECT
-                        COUNT(*) as total_requests,
-                        AVG(response_time) FILTER (WHERE status >= 200 AND status < 300)::float as avg_latency,
-                        MIN(response_time) FILTER (WHERE status >= 200 AND status < 300)::float as min_latency,
-                        PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY response_time) FILTER (WHERE status >= 200 AND status < 300)::float as p95_latency,
-                        MAX(response_time) FILTER (WHERE status >= 200 AND status < 300)::float as max_latency
-                    FROM base_data
-                ),
-                endpoint_agg AS (
-                    SELECT
-                        endpoint,
-                        method,
-                        service,
-                        COUNT(*) as total_requests,
-                        SUM(CASE WHEN status >= 400 AND status != 401 THEN 1 ELSE 0 END) as error_count,
-                        (SUM(CASE WHEN status >= 400 AND status != 401 THEN 1 ELSE 0 END)::float / COUNT(*)::float * 100) as error_rate
-                    FROM base_data
-                    GROUP BY endpoint, method, service
-                    ORDER BY total_requests DESC
-                ),
-                status_dist AS (
-                    SELECT
-                        service,
-                        status,
-                        COUNT(*) as count
-                    FROM base_data
-                    GROUP BY service, status
-                ),
-                status_agg AS (
-                    SELECT
-                        service,
-                        SUM(count) as total_requests,
-                        SUM(CASE WHEN status >= 200 AND status < 300 THEN count ELSE 0 END) as success_2xx,
-                        SUM(CASE WHEN status >= 300 AND status < 400 THEN count ELSE 0 END) as warning_3xx,
-                        SUM(CASE WHEN status >= 400 THEN count ELSE 0 END) as error_4xx_5xx,
-                        jsonb_object_agg(status::text, count) as status_breakdown
-                    FROM status_dist
-                    GROUP BY service
-                    ORDER BY total_requests DESC
-                ),
-                consumer_agg AS (
-                    SELECT
-                        consumer,
-                        COUNT(*) as total_requests,
-                        SUM(CASE WHEN status >= 400 AND status != 401 THEN 1 ELSE 0 END) as error_count,
-                        (SUM(CASE WHEN status >= 400 AND status != 401 THEN 1 ELSE 0 END)::float / COUNT(*)::float * 100) as error_rate
-                    FROM base_data
-                    GROUP BY consumer
-                    ORDER BY total_requests DESC
-                ),
-                system_overview AS (
-                    SELECT
-                        COUNT(*) as total_requests,
-                        SUM(CASE WHEN status >= 400 AND status != 401 THEN 1 ELSE 0 END) as total_errors,
-                        (SUM(CASE WHEN status >= 400 AND status != 401 THEN 1 ELSE 0 END)::float / NULLIF(COUNT(*), 0)::float * 100) as error_rate,
-                        AVG(response_time) FILTER (WHERE status >= 200 AND status < 300)::float as avg_latency
-                    FROM base_data
-                ),
-                distinct_nodes AS (
-                    SELECT DISTINCT node
-                    FROM requests
-                    WHERE node IS NOT NULL
-                    AND created_at >= :start_time
-                    AND created_at <= :end_time
-                ),
-                distinct_contexts AS (
-                    SELECT DISTINCT context
-                    FROM requests
-                    WHERE context IS NOT NULL
-                    AND created_at >= :start_time
-                    AND created_at <= :end_time
-                )
-                SELECT
-                    'time_series' as data_type,
-                    jsonb_agg(jsonb_build_object(
-                        'bucket', bucket,
-                        'total_requests', total_requests,
-                        'min_latency', min_latency,
-                        'avg_latency', avg_latency,
-                        'p95_latency', p95_latency,
-                        'max_latency', max_latency
-                    ) ORDER BY bucket) as data
-                FROM time_series
-                UNION ALL
-                SELECT
-                    'metrics_summary' as data_type,
-                    jsonb_build_object(
-                        'total_requests', COALESCE(total_requests, 0),
-                        'avg_latency', avg_latency,
-                        'min_latency', min_latency,
-                        'p95_latency', p95_latency,
-                        'max_latency', max_latency
-                    ) as data
-                FROM metrics_summary
-                UNION ALL
-                SELECT
-                    'endpoints' as data_type,
-                    jsonb_agg(jsonb_build_object(
-                        'endpoint', endpoint,
-                        'method', method,
-                        'service', service,
-                        'total_requests', total_requests,
-                        'error_count', error_count,
-                        'error_rate', error_rate
-                    ) ORDER BY total_requests DESC) as data
-                FROM endpoint_agg
-                UNION ALL
-                SELECT
-                    'status_distribution' as data_type,
-                    jsonb_agg(jsonb_build_object(
-                        'service', service,
-                        'total_requests', total_requests,
-                        'success_2xx', success_2xx,
-                        'warning_3xx', warning_3xx,
-                        'error_4xx_5xx', error_4xx_5xx,
-                        'status_breakdown', status_breakdown
-                    ) ORDER BY total_requests DESC) as data
-                FROM status_agg
-                UNION ALL
-                SELECT
-                    'consumers' as data_type,
-                    jsonb_agg(jsonb_build_object(
-                        'consumer', consumer,
-                        'total_requests', total_requests,
-                        'error_count', error_count,
-                        'error_rate', error_rate
-                    ) ORDER BY total_requests DESC) as data
-                FROM consumer_agg
-                UNION ALL
-                SELECT
-                    'system_overview' as data_type,
-                    jsonb_build_object(
-                        'total_requests', COALESCE(total_requests, 0),
-                        'total_errors', COALESCE(total_errors, 0),
-                        'error_rate', COALESCE(error_rate, 0),
-                        'avg_latency', avg_latency
-                    ) as data
-                FROM system_overview
-                UNION ALL
-                SELECT
-                    'distinct_nodes' as data_type,
-                    jsonb_agg(node ORDER BY node) as data
-                FROM distinct_nodes
-                UNION ALL
-                SELECT
-                    'distinct_contexts' as data_type,
-                    jsonb_agg(context ORDER BY context) as data
-                FROM distinct_contexts
-            """)
+        # Filter values are bound as parameters; the statement builder writes their conditions
+        params: Dict[str, Any] = {
+            'start_time': start_time,
+            'end_time': end_time
+        }
+        for name in FILTER_COLUMNS:
+            if getattr(query, name):
+                params[name] = getattr(query, name)
+        filters = tuple(name for name in FILTER_COLUMNS if name in params)
+        
+        return QueryPlan(
+            table_name=table_name,
+            bucket_size=bucket_size,
+            bucket_width=bucket_width,
+            params=params,
+            start_time=start_time,
+            end_time=end_time,
+            tier=tier,
+            filters=filters,
+            top_k=query.top_k,
+            offset=query.offset
+        )
+    
+    async def _execute(self, session: AsyncSession, plan: QueryPlan, panels: Iterable[str]) -> Dict[str, Any]:
+        """Compute the given panels in a single scan of the sources using GROUPING SETS"""
+        panels = tuple(panels)
+        
+        # Read the smallest rollups that have every filtered and grouped dimension, finishing
+        # the range past the tier's materialized data from finer tiers
+        watermarks = await materialization_watermarks.get(session) if settings.tier_stitching_enabled else {}
+        segments = plan.segments_for(panels, watermarks, await rollup_history.get(session))
+        logger.debug(
+            f"Reading {', '.join(f'{table_name} [{start}, {end})' for table_name, _, start, end in segments)} "
+            f"for panels {', '.join(panels)}"
+        )
+        
+        params = {**plan.params, 'bucket_width': plan.bucket_width}
+        if len(segments) == 1:
+            table_name, dimensions, _, _ = segments[0]
+            sql = build_dashboard_query(table_name, plan.filters, panels, dimensions)
         else:
-            # Query from materialized views (requests_5min or requests_1hour)
-            sql_query = text(f"""
-                WITH base_data AS (
-                    SELECT
-                        service,
-                        node,
-                        method,
-                        endpoint,
-                        consumer,
-                        context,
-                        status,
-                        bucket,
-                        count_requests,
-                        min_response_time,
-                        max_response_time,
-                        avg_response_time,
-                        p95_response_time
-                    FROM {table_name}
-                    WHERE {where_clause}
-                    AND bucket >= :start_time
-                    AND bucket <= :end_time
-                ),
-                time_series AS (
-                    SELECT
-                        time_bucket_gapfill('{bucket_size}', bucket, :start_time, :end_time) as bucket,
-                        COALESCE(SUM(count_requests), 0) as total_requests,
-                        CASE WHEN SUM(count_requests) FILTER (WHERE status >= 200 AND status < 300) > 0 
-                            THEN MIN(min_response_time) FILTER (WHERE status >= 200 AND status < 300 AND min_response_time IS NOT NULL)::float 
-                            ELSE NULL END as min_latency,
-                        CASE WHEN SUM(count_requests) FILTER (WHERE status >= 200 AND status < 300) > 0 THEN 
-                            (SUM(avg_response_time * count_requests) FILTER (WHERE status >= 200 AND status < 300) / 
-                             SUM(count_requests) FILTER (WHERE status >= 200 AND status < 300))::float 
-                        ELSE NULL END as avg_latency,
-                        -- Note: P95 in time series is approximate when aggregating pre-aggregated data
-                        -- For accurate overall P95, see metrics_summary which queries raw data
-                        CASE WHEN SUM(count_requests) FILTER (WHERE status >= 200 AND status < 300) > 0 
-                            THEN MAX(p95_response_time) FILTER (WHERE status >= 200 AND status < 300 AND p95_response_time IS NOT NULL)::float 
-                            ELSE NULL END as p95_latency,
-                        CASE WHEN SUM(count_requests) FILTER (WHERE status >= 200 AND status < 300) > 0 
-                            THEN MAX(max_response_time) FILTER (WHERE status >= 200 AND status < 300 AND max_response_time IS NOT NULL)::float 
-                            ELSE NULL END as max_latency
-                    FROM base_data
-                    GROUP BY time_bucket_gapfill('{bucket_size}', bucket, :start_time, :end_time)
-                    ORDER BY bucket
-                ),
-                metrics_summary AS (
-                    SELECT
-                        SUM(count_requests) as total_requests,
-                        (SUM(avg_response_time * count_requests) FILTER (WHERE status >= 200 AND status < 300) / 
-                         SUM(count_requests) FILTER (WHERE status >= 200 AND status < 300))::float as avg_latency,
-                        MIN(min_response_time) FILTER (WHERE status >= 200 AND status < 300 AND min_response_time IS NOT NULL)::float as min_latency,
-                        -- Note: P95 calculation from pre-aggregated data is approximate
-                        MAX(p95_response_time) FILTER (WHERE status >= 200 AND status < 300 AND p95_response_time IS NOT NULL)::float as p95_latency,
-                        MAX(max_response_time) FILTER (WHERE status >= 200 AND status < 300 AND max_response_time IS NOT NULL)::float as max_latency
-                    FROM base_data
-                ),
-                endpoint_agg AS (
-                    SELECT
-                        endpoint,
-                        method,
-                        service,
-                        SUM(count_requests) as total_requests,
-                        SUM(CASE WHEN status >= 400 AND status != 401 THEN count_requests ELSE 0 END) as error_count,
-                        (SUM(CASE WHEN status >= 400 AND status != 401 THEN count_requests ELSE 0 END)::float / 
-                         NULLIF(SUM(count_requests), 0)::float * 100) as error_rate
-                    FROM base_data
-                    GROUP BY endpoint, method, service
-                    ORDER BY total_requests DESC
-                ),
-                status_dist AS (
-                    SELECT
-                        service,
-                        status,
-                        SUM(count_requests) as count
-                    FROM base_data
-                    GROUP BY service, status
-                ),
-                status_agg AS (
-                    SELECT
-                        service,
-                        SUM(count) as total_requests,
-                        SUM(CASE WHEN status >= 200 AND status < 300 THEN count ELSE 0 END) as success_2xx,
-                        SUM(CASE WHEN status >= 300 AND status < 400 THEN count ELSE 0 END) as warning_3xx,
-                        SUM(CASE WHEN status >= 400 THEN count ELSE 0 END) as error_4xx_5xx,
-                        jsonb_object_agg(status::text, count) as status_breakdown
-                    FROM status_dist
-                    GROUP BY service
-                    ORDER BY total_requests DESC
-                ),
-                consumer_agg AS (
-                    SELECT
-                        consumer,
-                        SUM(count_requests) as total_requests,
-                        SUM(CASE WHEN status >= 400 AND status != 401 THEN count_requests ELSE 0 END) as error_count,
-                        (SUM(CASE WHEN status >= 400 AND status != 401 THEN count_requests ELSE 0 END)::float / 
-                         NULLIF(SUM(count_requests), 0)::float * 100) as error_rate
-                    FROM base_data
-                    GROUP BY consumer
-                    ORDER BY total_requests DESC
-                ),
-                system_overview AS (
-                    SELECT
-                        SUM(count_requests) as total_requests,
-                        SUM(CASE WHEN status >= 400 AND status != 401 THEN count_requests ELSE 0 END) as total_errors,
-                        (SUM(CASE WHEN status >= 400 AND status != 401 THEN count_requests ELSE 0 END)::float / 
-                         NULLIF(SUM(count_requests), 0)::float * 100) as error_rate,
-                        (SUM(avg_response_time * count_requests) FILTER (WHERE status >= 200 AND status < 300) / 
-                         SUM(count_requests) FILTER (WHERE status >= 200 AND status < 300))::float as avg_latency
-                    FROM base_data
-                ),
-                distinct_nodes AS (
-                    SELECT DISTINCT node
-                    FROM {table_name}
-                    WHERE node IS NOT NULL
-                    AND bucket >= :start_time
-                    AND bucket <= :end_time
-                ),
-                distinct_contexts AS (
-                    SELECT DISTINCT context
-                    FROM {table_name}
-                    WHERE context IS NOT NULL
-                    AND bucket >= :start_time
-                    AND bucket <= :end_time
-                )
-                SELECT
-                    'time_series' as data_type,
-                    jsonb_agg(jsonb_build_object(
-                        'bucket', bucket,
-                        'total_requests', total_requests,
-                        'min_latency', min_latency,
-                        'avg_latency', avg_latency,
-                        'p95_latency', p95_latency,
-                        'max_latency', max_latency
-                    ) ORDER BY bucket) as data
-                FROM time_series
-                UNION ALL
-                SELECT
-                    'metrics_summary' as data_type,
-                    jsonb_build_object(
-                        'total_requests', COALESCE(total_requests, 0),
-                        'avg_latency', avg_latency,
-                        'min_latency', min_latency,
-                        'p95_latency', p95_latency,
-                        'max_latency', max_latency
-                    ) as data
-                FROM metrics_summary
-                UNION ALL
-                SELECT
-                    'endpoints' as data_type,
-                    jsonb_agg(jsonb_build_object(
-                        'endpoint', endpoint,
-                        'method', method,
-                        'service', service,
-                        'total_requests', total_requests,
-                        'error_count', error_count,
-                        'error_rate', error_rate
-                    ) ORDER BY total_requests DESC) as data
-                FROM endpoint_agg
-                UNION ALL
-                SELECT
-                    'status_distribution' as data_type,
-                    jsonb_agg(jsonb_build_object(
-                        'service', service,
-                        'total_requests', total_requests,
-                        'success_2xx', success_2xx,
-                        'warning_3xx', warning_3xx,
-                        'error_4xx_5xx', error_4xx_5xx,
-                        'status_breakdown', status_breakdown
-                    ) ORDER BY total_requests DESC) as data
-                FROM status_agg
-                UNION ALL
-                SELECT
-                    'consumers' as data_type,
-                    jsonb_agg(jsonb_build_object(
-                        'consumer', consumer,
-                        'total_requests', total_requests,
-                        'error_count', error_count,
-                        'error_rate', error_rate
-                    ) ORDER BY total_requests DESC) as data
-                FROM consumer_agg
-                UNION ALL
-                SELECT
-                    'system_overview' as data_type,
-                    jsonb_build_object(
-                        'total_requests', COALESCE(total_requests, 0),
-                        'total_errors', COALESCE(total_errors, 0),
-                        'error_rate', COALESCE(error_rate, 0),
-                        'avg_latency', avg_latency
-                    ) as data
-                FROM system_overview
-                UNION ALL
-                SELECT
-                    'distinct_nodes' as data_type,
-                    jsonb_agg(node ORDER BY node) as data
-                FROM distinct_nodes
-                UNION ALL
-                SELECT
-                    'distinct_contexts' as data_type,
-                    jsonb_agg(context ORDER BY context) as data
-                FROM distinct_contexts
-            """)
-        
-        try:
-            result = await self.db.execute(sql_query, params)
-            rows = result.fetchall()
-            
-            # Parse the results into structured data
-            response_data = {
-                'time_series': [],
-                'metrics_summary': None,
-                'endpoints': [],
-                'status_distribution': [],
-                'consumers': [],
-                'system_overview': None,
-                'distinct_nodes': [],
-                'distinct_contexts': []
-            }
-            
-            for row in rows:
-                data_type = row.data_type
-                data = row.data
-                
-                if data_type == 'time_series' and data:
-                    response_data['time_series'] = [
-                        TimeSeriesDataPoint(**item) for item in data
-                    ]
-                elif data_type == 'metrics_summary' and data:
-                    response_data['metrics_summary'] = MetricsCardsSummary(**data)
-                elif data_type == 'endpoints' and data:
-                    response_data['endpoints'] = [
-                        EndpointAggregation(**item) for item in data
-                    ]
-                elif data_type == 'status_distribution' and data:
-                    response_data['status_distribution'] = [
-                        StatusDistribution(**item) for item in data
-                    ]
-                elif data_type == 'consumers' and data:
-                    response_data['consumers'] = [
-                        ConsumerAggregation(**item) for item in data
-                    ]
-                elif data_type == 'system_overview' and data:
-                    response_data['system_overview'] = SystemOverview(**data)
-                elif data_type == 'distinct_nodes' and data:
-                    response_data['distinct_nodes'] = data
-                elif data_type == 'distinct_contexts' and data:
-                    response_data['distinct_contexts'] = data
-            
-            # Provide defaults if no data
-            if not response_data['metrics_summary']:
-                response_data['metrics_summary'] = MetricsCardsSummary(
-                    total_requests=0,
-                    avg_latency=None,
-                    min_latency=None,
-                    p95_latency=None,
-                    max_latency=None
-                )
-            
-            if not response_data['system_overview']:
-                response_data['system_overview'] = SystemOverview(
-                    total_requests=0,
-                    total_errors=0,
-                    error_rate=0.0,
-                    avg_latency=None
-                )
-            
-            return DashboardMetricsResponse(**response_data)
-            
-        except Exception as e:
-            raise e
+            sql = build_stitched_query(
+                [(table_name, dimensions) for table_name, dimensions, _, _ in segments],
+                plan.filters, panels
+            )
+            for i, (_, _, start, end) in enumerate(segments):
+                params[f'segment_{i}_start'] = start
+                params[f'segment_{i}_end'] = end
+        
+        # Rank and cut list panels in the database, so only the requested items are returned
+        if plan.top_k:
+            sql = build_top_k_query(sql, panels)
+            params['top_k'] = plan.top_k
+            params['top_offset'] = plan.offset
+        
+        # Runs under the statement timeout of the tier, after the cost check
+        statement = statement_name(
+            [table_name for table_name, _, _, _ in segments], plan.filters, panels, bool(plan.top_k)
+        )
+        rows = await execute_governed(session, sql, params, plan.table_name, panels, statement)
+        
+        # Split the grouping set rows into structured panel data
+        return split_dashboard_rows(rows, panels, plan.start_time, plan.end_time, plan.bucket_width)
+    
+    async def _execute_concurrently(self, plan: QueryPlan, panels: Iterable[str]) -> Dict[str, Any]:
+        """Compute panel groups concurrently, each on its own pooled connection"""
+        groups = group_panels(panels)
+        
+        if len(groups) == 1 or self.session_factory is None:
+            return await self._execute(self.db, plan, [panel for group in groups for panel in group])
+        
+        async def run(group):
+            async with self.session_factory() as session:
+                return await self._execute(session, plan, group)
+        
+        data: Dict[str, Any] = {}
+        for result in await asyncio.gather(*(run(group) for group in groups)):
+            data.update(result)
+        return data
+    
+    async def _catalog_values(self, plan: QueryPlan, dimension: str) -> List[str]:
+        """
+        Values of a dimension seen in the queried range, from the dimension catalog.
+        
+        Only the service filter applies: the query's own filter of the dimension
+        is left out, so the list keeps offering the other values to switch to.
+        """
+        catalog = await DimensionCatalogService(self.db).search(
+            dimension,
+            service=plan.params.get('service'),
+            seen_after=plan.start_time,
+            seen_before=plan.end_time,
+            limit=CATALOG_PANEL_LIMIT
+        )
+        return [item.value for item in catalog.values]
+    
+    @staticmethod
+    def _series_key(plan: QueryPlan) -> str:
+        """Series cache key: source, bucket width and filters, but not the time range"""
+        return make_cache_key("series", {
+            'table': plan.table_name,
+            'bucket': plan.bucket_size,
+            'filters': {name: value for name, value in plan.params.items() if name not in ('start_time', 'end_time')}
+        })
+    
+    @staticmethod
+    def _is_incremental(plan: QueryPlan, panels) -> bool:
+        """Whether all panels can be served from cached time series buckets"""
+        return series_cache.enabled and set(panels) <= SERIES_DERIVABLE_PANELS
+    
+    async def _store_series(self, plan: QueryPlan, points) -> None:
+        """Keep the closed, materialized buckets of a freshly queried time series"""
+        if not series_cache.enabled:
+            return
+        # Every rollup of the tier may serve the series, so the earliest watermark bounds it
+        watermarks = await materialization_watermarks.get(self.db)
+        tier_watermarks = [watermarks.get(rollup.table_name) for rollup in plan.tier.rollups]
+        watermark = None if None in tier_watermarks else min(tier_watermarks)
+        if settings.database_replica_url and watermark is not None:
+            # A lagging replica lacks what the primary committed after its replay time,
+            # such as late rows refreshed into buckets below the watermark
+            replay_time = await get_replay_time(self.db)
+            watermark = None if replay_time is None else min(watermark, replay_time)
+        series_cache.store(self._series_key(plan), plan.table_name, plan.bucket_width, points, watermark)
+    
+    async def _execute_incremental(self, plan: QueryPlan, panels: Iterable[str]) -> Dict[str, Any]:
+        """Merge cached closed buckets with the queried open tail and derive summaries from them"""
+        key = self._series_key(plan)
+        cached, tail_start = series_cache.lookup(key, plan.start_time, plan.end_time, plan.bucket_width)
+        
+        points = list(cached)
+        if tail_start < plan.end_time:
+            tail = await self._execute(self.db, plan.with_range(tail_start, plan.end_time), ('time_series',))
+            await self._store_series(plan, tail['time_series'])
+            points.extend(tail['time_series'])
+        
+        data: Dict[str, Any] = {'time_series': points}
+        if 'metrics_summary' in panels or 'system_overview' in panels:
+            data['metrics_summary'], data['system_overview'] = summarize_time_series(points)
+        return {panel: value for panel, value in data.items() if panel in panels}
+    
+    @staticmethod
+    def _columnar_time_series(points: List[Dict[str, Any]], plan: QueryPlan) -> Dict[str, Any]:
+        """Encode gap-filled time series points as one array per metric, shaped like ColumnarTimeSeries"""
+        columnar: Dict[str, Any] = {
+            'start': points[0]['bucket'] if points else None,
+            'step_seconds': int(plan.bucket_width.total_seconds()),
+            'count': len(points)
+        }
+        for name, _ in response_fields(TimeSeriesDataPoint):
+            if name != 'bucket':
+                columnar[name] = [point[name] for point in points]
+        return columnar
+    
+    @staticmethod
+    def _time_series_since(time_series: Any, since: datetime) -> Any:
+        """Buckets starting at or after since, of a time series in rows or columnar format"""
+        if isinstance(time_series, list):
+            return [point for point in time_series if point['bucket'] >= since]
+        if time_series['start'] is None:
+            return time_series
+        
+        step = timedelta(seconds=time_series['step_seconds'])
+        skip = min(max(0, -((time_series['start'] - since) // step)), time_series['count'])
+        columnar = {
+            name: values[skip:] if isinstance(values, list) else values
+            for name, values in time_series.items()
+        }
+        columnar['count'] = time_series['count'] - skip
+        columnar['start'] = time_series['start'] + skip * step if columnar['count'] else None
+        return columnar
+    
+    def _build_payload(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Shape plain panel data like PartialDashboardMetricsResponse, leaving unselected panels empty.
+        
+        The payload is encoded as is, without building the response models, so
+        it must contain exactly their fields in declaration order.
+        """
+        payload: Dict[str, Any] = {}
+        for panel, field in response_fields(PartialDashboardMetricsResponse):
+            if panel not in data:
+                payload[panel] = field.get_default(call_default_factory=True)
+                continue
+            model = PANEL_MODELS.get(panel)
+            value = data[panel]
+            if model is None:
+                payload[panel] = value
+            elif isinstance(value, list):
+                payload[panel] = [project(item, model) for item in value]
+            else:
+                payload[panel] = project(value, model)
+        return payload
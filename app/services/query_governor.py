@@ -0,0 +1,200 @@
+"""
+Governance of metrics queries: statement timeouts, cost guard and cancellation.
+
+Every metrics statement runs with the statement timeout of its tier. Before
+it runs, its EXPLAIN cost estimate is compared to a limit, so queries that
+would scan far too much are stopped before they start; the metrics service
+then serves them from a coarser tier or rejects them. Requests whose client
+disconnects have their queries cancelled, which asyncpg forwards to the
+server.
+
+Each outcome is logged as one JSON object per statement or request, and
+planning and execution times are kept per canonical statement.
+"""
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+from app.core.config import settings
+from app.core.responses import dump_json
+from app.models.telemetry import QueryStatementStats, QueryStatsResponse
+from collections import Counter, OrderedDict
+from typing import Any, Awaitable, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import contextlib
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Statement timeout per source, following how much data a query of each tier reads
+STATEMENT_TIMEOUTS_MS = {
+    "requests_1min": settings.metrics_statement_timeout_1min_ms,
+    "requests_5min": settings.metrics_statement_timeout_5min_ms,
+    "requests_1hour": settings.metrics_statement_timeout_1hour_ms,
+    "requests_1day": settings.metrics_statement_timeout_1day_ms,
+}
+
+# SQLSTATE of statements cancelled by statement_timeout
+QUERY_CANCELED = "57014"
+
+# Upper bound on statements with timings; the canonical statements stay well below it
+MAX_TRACKED_STATEMENTS = 1000
+
+class QueryTooExpensiveError(Exception):
+    """The planner's cost estimate of a query exceeds the cost limit"""
+
+    def __init__(self, table_name: str, cost: float, limit: float):
+        super().__init__(
+            f"Query on {table_name} is too expensive (estimated cost {cost:.0f}, limit {limit:.0f}); "
+            "narrow the time range or add filters"
+        )
+        self.table_name = table_name
+        self.cost = cost
+        self.limit = limit
+
+class QueryTimeoutError(Exception):
+    """A query ran longer than the statement timeout of its tier"""
+
+    def __init__(self, table_name: str, timeout_ms: int):
+        super().__init__(f"Query on {table_name} exceeded its statement timeout of {timeout_ms} ms")
+        self.table_name = table_name
+        self.timeout_ms = timeout_ms
+
+class ClientDisconnectedError(Exception):
+    """The client went away while its request was running"""
+
+class _StatementTimings:
+    def __init__(self):
+        self.executions = 0
+        self.planned = 0
+        self.planning_ms = 0.0
+        self.execution_ms = 0.0
+        self.max_execution_ms = 0.0
+
+class StatementStats:
+    """Planning and execution times per canonical statement, and governed query outcomes"""
+
+    def __init__(self, max_statements: int):
+        self.max_statements = max_statements
+        self.outcomes: Counter = Counter()
+        self._statements: "OrderedDict[str, _StatementTimings]" = OrderedDict()
+
+    def record(self, statement: str, planning_ms: Optional[float], execution_ms: float) -> None:
+        timings = self._statements.get(statement)
+        if timings is None:
+            timings = self._statements[statement] = _StatementTimings()
+            while len(self._statements) > self.max_statements:
+                self._statements.popitem(last=False)
+        self._statements.move_to_end(statement)
+        timings.executions += 1
+        timings.execution_ms += execution_ms
+        timings.max_execution_ms = max(timings.max_execution_ms, execution_ms)
+        if planning_ms is not None:
+            timings.planned += 1
+            timings.planning_ms += planning_ms
+
+    def get_stats(self, limit: int = 20) -> QueryStatsResponse:
+        """Get outcome counters and the slowest statements of this process"""
+        statements = [
+            QueryStatementStats(
+                statement=statement,
+                executions=timings.executions,
+                avg_planning_ms=timings.planning_ms / timings.planned if timings.planned else None,
+                avg_execution_ms=timings.execution_ms / timings.executions,
+                max_execution_ms=timings.max_execution_ms
+            )
+            for statement, timings in self._statements.items()
+        ]
+        statements.sort(key=lambda stats: stats.avg_execution_ms, reverse=True)
+        return QueryStatsResponse(
+            statements=len(self._statements),
+            prepared_statement_cache_size=settings.database_statement_cache_size,
+            outcomes=dict(self.outcomes),
+            slowest=statements[:limit]
+        )
+
+# Global statement statistics of this process
+statement_stats = StatementStats(MAX_TRACKED_STATEMENTS)
+
+def log_outcome(outcome: str, **fields: Any) -> None:
+    """Log the outcome of a governed query as one JSON object"""
+    statement_stats.outcomes[outcome] += 1
+    level = logging.INFO if outcome in ("executed", "downgraded") else logging.WARNING
+    logger.log(level, dump_json({'event': 'metrics_query', 'outcome': outcome, **fields}).decode())
+
+async def estimate_cost(session: AsyncSession, sql: str, params: Dict[str, Any]) -> Tuple[float, float]:
+    """Total cost of the planner's estimate for a statement and its planning time in ms, without running it"""
+    result = await session.execute(text(f"EXPLAIN (FORMAT JSON, SUMMARY) {sql}"), params)
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return float(plan[0]['Plan']['Total Cost']), float(plan[0]['Planning Time'])
+
+async def execute_governed(
+    session: AsyncSession,
+    sql: str,
+    params: Dict[str, Any],
+    table_name: str,
+    panels: Iterable[str],
+    statement: str
+) -> List[Any]:
+    """
+    Run a metrics statement under the cost limit and statement timeout of its source.
+
+    Raises QueryTooExpensiveError before running it when its estimated cost
+    exceeds the limit, and QueryTimeoutError when it runs out of time. The
+    statement name identifies the canonical statement in timings and logs.
+    """
+    fields: Dict[str, Any] = {'statement': statement, 'table': table_name, 'panels': list(panels)}
+
+    planning_ms: Optional[float] = None
+    if settings.metrics_cost_limit > 0:
+        cost, planning_ms = await estimate_cost(session, sql, params)
+        fields['cost'] = round(cost)
+        fields['planning_ms'] = round(planning_ms, 1)
+        if cost > settings.metrics_cost_limit:
+            raise QueryTooExpensiveError(table_name, cost, settings.metrics_cost_limit)
+
+    # Local to the request's transaction, so the pooled connection keeps its default
+    timeout_ms = STATEMENT_TIMEOUTS_MS.get(table_name, settings.metrics_statement_timeout_1day_ms)
+    await session.execute(text("SELECT set_config('statement_timeout', :timeout, true)"), {'timeout': str(timeout_ms)})
+
+    started = time.perf_counter()
+    try:
+        result = await session.execute(text(sql), params)
+        rows = result.fetchall()
+    except DBAPIError as e:
+        if getattr(e.orig, 'sqlstate', None) == QUERY_CANCELED:
+            log_outcome("timeout", timeout_ms=timeout_ms, **fields)
+            raise QueryTimeoutError(table_name, timeout_ms) from e
+        raise
+
+    execution_ms = (time.perf_counter() - started) * 1000
+    statement_stats.record(statement, planning_ms, execution_ms)
+    log_outcome("executed", execution_ms=round(execution_ms, 1), rows=len(rows), **fields)
+    return rows
+
+async def cancel_on_disconnect(request, awaitable: Awaitable[Any]) -> Any:
+    """
+    Await a request's work, cancelling it when the client disconnects.
+
+    Cancelling a task that waits for asyncpg cancels the statement on the
+    server, so abandoned dashboard queries stop using the database.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=settings.metrics_disconnect_poll_seconds)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                break
+    finally:
+        if not task.done():
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await task
+
+    log_outcome("cancelled", path=request.url.path)
+    raise ClientDisconnectedError()
@@ -0,0 +1,205 @@
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy import text
+from app.core.config import settings
+from app.services.rollups import REFRESH_HORIZONS, REFRESH_ORDER, TIME_BUCKET_ORIGIN
+from app.models.telemetry import RefreshViewStats, RefreshStatsResponse
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+from datetime import datetime, timezone, timedelta
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Raw source name passed to refresh listeners when new rows are ingested
+RAW_SOURCE = "requests"
+
+# Continuous aggregates refreshed from ingest with their bucket width, bottom-up,
+# since every tier is built from the tier below it
+REFRESH_VIEWS: List[Tuple[str, timedelta]] = REFRESH_ORDER
+
+def align_bucket(ts: datetime, width: timedelta) -> datetime:
+    """Align a timestamp to the start of its bucket, matching time_bucket"""
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return TIME_BUCKET_ORIGIN + ((ts - TIME_BUCKET_ORIGIN) // width) * width
+
+def coalesce_buckets(buckets: Iterable[datetime], width: timedelta, max_gap: int) -> List[Tuple[datetime, datetime]]:
+    """Merge bucket starts into [start, end) ranges, bridging gaps of up to max_gap clean buckets"""
+    ranges: List[Tuple[datetime, datetime]] = []
+    for bucket in sorted(buckets):
+        if ranges and bucket - ranges[-1][1] <= width * max_gap:
+            ranges[-1] = (ranges[-1][0], bucket + width)
+        else:
+            ranges.append((bucket, bucket + width))
+    return ranges
+
+class _ViewState:
+    """Dirty buckets and refresh counters of one continuous aggregate"""
+
+    def __init__(self, name: str, width: timedelta, horizon: timedelta):
+        self.name = name
+        self.width = width
+        self.horizon = horizon
+        self.dirty: Dict[datetime, float] = {}  # bucket start -> time it was first marked dirty
+        self.last_cycle_ranges = 0
+        self.last_cycle_buckets = 0
+        self.last_cycle_duration_ms = 0.0
+        self.last_refresh_lag_seconds = None
+        self.last_refreshed_at = None
+        self.total_ranges = 0
+        self.total_buckets = 0
+        self.failures = 0
+        self.skipped_buckets = 0
+
+    def oldest_bucket(self, now: datetime) -> datetime:
+        """Oldest bucket that may be refreshed: one bucket inside the horizon, so its
+        source rows are still retained until the refresh has run"""
+        return align_bucket(now - self.horizon, self.width) + self.width
+
+class TargetedRefreshScheduler:
+    """
+    Refreshes continuous aggregates only for buckets that received new rows.
+
+    The ingest path marks the buckets of every stored request as dirty. Each
+    cycle coalesces the closed dirty buckets of a view into a few ranges and calls
+    refresh_continuous_aggregate for exactly those ranges, so idle periods cost
+    nothing and late data gets materialized. Buckets older than a view's
+    refresh horizon are skipped, since their source rows are gone.
+    """
+
+    def __init__(self, views: List[Tuple[str, timedelta]], horizons: Dict[str, timedelta], max_gap: int):
+        self.max_gap = max_gap
+        self.views = [_ViewState(name, width, horizons[name]) for name, width in views]
+        self.cycles = 0
+        self._listeners: List[Callable[[str, datetime, datetime], None]] = []
+
+    def add_listener(self, listener: Callable[[str, datetime, datetime], None]) -> None:
+        """Call listener(source, start, end) whenever rows of a source changed in [start, end)"""
+        self._listeners.append(listener)
+
+    def _notify(self, source: str, start: datetime, end: datetime) -> None:
+        for listener in self._listeners:
+            try:
+                listener(source, start, end)
+            except Exception as e:
+                logger.error(f"Refresh listener failed for {source}: {e}")
+
+    def mark(self, timestamps: Iterable[datetime]) -> None:
+        """Mark the buckets containing the given request timestamps as dirty, within each view's horizon"""
+        now = time.time()
+        timestamps = list(timestamps)
+        if not timestamps:
+            return
+        current_time = datetime.now(timezone.utc)
+        # Align every timestamp once per bucket width; views of the same width share the buckets
+        buckets_by_width: Dict[timedelta, Set[datetime]] = {}
+        for view in self.views:
+            if view.width not in buckets_by_width:
+                buckets_by_width[view.width] = {align_bucket(ts, view.width) for ts in timestamps}
+        for view in self.views:
+            oldest = view.oldest_bucket(current_time)
+            for bucket in buckets_by_width[view.width]:
+                if bucket >= oldest:
+                    view.dirty.setdefault(bucket, now)
+                else:
+                    view.skipped_buckets += 1
+
+        # Raw rows are visible right away
+        self._notify(RAW_SOURCE, min(timestamps), max(timestamps) + timedelta(microseconds=1))
+
+    async def refresh_once(self, engine: AsyncEngine) -> None:
+        """Refresh the dirty ranges of every view, in order"""
+        self.cycles += 1
+        # One clock for the whole cycle, so a bucket never closes between its source's refresh and its own
+        current_time = datetime.now(timezone.utc)
+
+        # refresh_continuous_aggregate cannot run inside a transaction block
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+
+            for view in self.views:
+                dirty, view.dirty = view.dirty, {}
+                # Buckets may have aged past the horizon while waiting for this cycle
+                oldest = view.oldest_bucket(current_time)
+                expired = [bucket for bucket in dirty if bucket < oldest]
+                for bucket in expired:
+                    del dirty[bucket]
+                view.skipped_buckets += len(expired)
+                # The open bucket stays dirty until it closes: materializing it would
+                # move the watermark past rows that are still arriving
+                for bucket in [bucket for bucket in dirty if bucket + view.width > current_time]:
+                    view.dirty[bucket] = dirty.pop(bucket)
+                started = time.perf_counter()
+                ranges = coalesce_buckets(dirty.keys(), view.width, self.max_gap)
+                refreshed_ranges = 0
+                refreshed_buckets = 0
+
+                for start, end in ranges:
+                    in_range = {bucket: marked_at for bucket, marked_at in dirty.items() if start <= bucket < end}
+                    try:
+                        await conn.execute(
+                            text("CALL refresh_continuous_aggregate(CAST(:view AS text)::regclass, CAST(:start AS timestamptz), CAST(:end AS timestamptz))"),
+                            {'view': view.name, 'start': start, 'end': end}
+                        )
+                        refreshed_ranges += 1
+                        refreshed_buckets += len(in_range)
+                        self._notify(view.name, start, end)
+                    except Exception as e:
+                        view.failures += 1
+                        logger.error(f"Refreshing {view.name} from {start} to {end} failed: {e}")
+                        # Keep the range dirty so the next cycle retries it
+                        for bucket, marked_at in in_range.items():
+                            view.dirty.setdefault(bucket, marked_at)
+
+                view.last_cycle_ranges = refreshed_ranges
+                view.last_cycle_buckets = refreshed_buckets
+                view.last_cycle_duration_ms = (time.perf_counter() - started) * 1000
+                view.total_ranges += refreshed_ranges
+                view.total_buckets += refreshed_buckets
+
+                if refreshed_ranges:
+                    view.last_refreshed_at = datetime.now(timezone.utc)
+                    view.last_refresh_lag_seconds = time.time() - min(dirty.values())
+                    logger.debug(
+                        f"Refreshed {refreshed_buckets} buckets of {view.name} in {refreshed_ranges} ranges "
+                        f"({view.last_cycle_duration_ms:.1f} ms)"
+                    )
+
+    def get_stats(self) -> RefreshStatsResponse:
+        """Get refresh lag and work per cycle for every view"""
+        now = time.time()
+        return RefreshStatsResponse(
+            cycles=self.cycles,
+            views=[
+                RefreshViewStats(
+                    view=view.name,
+                    pending_buckets=len(view.dirty),
+                    pending_lag_seconds=now - min(view.dirty.values()) if view.dirty else 0.0,
+                    last_cycle_ranges=view.last_cycle_ranges,
+                    last_cycle_buckets=view.last_cycle_buckets,
+                    last_cycle_duration_ms=view.last_cycle_duration_ms,
+                    last_refresh_lag_seconds=view.last_refresh_lag_seconds,
+                    last_refreshed_at=view.last_refreshed_at,
+                    total_ranges=view.total_ranges,
+                    total_buckets=view.total_buckets,
+                    failures=view.failures,
+                    skipped_buckets=view.skipped_buckets
+                )
+                for view in self.views
+            ]
+        )
+
+# Global scheduler fed by all ingest requests of this process
+refresh_scheduler = TargetedRefreshScheduler(
+    REFRESH_VIEWS, REFRESH_HORIZONS, max_gap=settings.cagg_refresh_max_gap_buckets
+)
+
+async def run_refresh_loop(engine: AsyncEngine, interval_seconds: int) -> None:
+    """Periodically refresh dirty continuous aggregate ranges until cancelled"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await refresh_scheduler.refresh_once(engine)
+        except Exception as e:
+            logger.error(f"Continuous aggregate refresh cycle failed: {e}")
@@ -0,0 +1,244 @@
+"""
+Registry of the continuous aggregates and the rollup planner.
+
+Every tier of the rollup hierarchy has a full rollup grouped by all seven
+dimensions and, above the 1-minute tier, narrower rollups grouped by only a
+few of them, built from the full rollup of their tier. A narrow rollup holds one row per bucket and combination of its
+dimensions, so a query that only filters and groups by those dimensions
+reads far fewer rows. The planner picks the smallest rollup of a tier that
+has every dimension a query filters or groups by.
+
+Names and dimensions must match the views in database/init.sql.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+from datetime import datetime, timezone, timedelta
+
+FULL_DIMENSIONS = ('service', 'node', 'method', 'endpoint', 'consumer', 'context', 'status')
+
+# Narrow rollups by name suffix, smallest first. Status is always kept, since
+# success and error counts are derived from it.
+NARROW_DIMENSIONS: List[Tuple[str, Tuple[str, ...]]] = [
+    ('by_service', ('service', 'status')),
+    ('by_consumer', ('service', 'consumer', 'status')),
+    ('by_endpoint', ('service', 'endpoint', 'method', 'status')),
+]
+
+# Default origin of time_bucket, a Monday; buckets of widths that divide a day
+# are aligned to midnight UTC, weekly buckets start on Mondays
+TIME_BUCKET_ORIGIN = datetime(2000, 1, 3, tzinfo=timezone.utc)
+
+# Bucket widths a time series can be re-bucketed to for max_points, finest first.
+# Every width is a multiple of the previous one, so buckets of all widths nest,
+# and every tier's width is one of them.
+CHART_BUCKET_WIDTHS: List[Tuple[str, timedelta]] = [
+    ('1 minute', timedelta(minutes=1)),
+    ('5 minutes', timedelta(minutes=5)),
+    ('15 minutes', timedelta(minutes=15)),
+    ('30 minutes', timedelta(minutes=30)),
+    ('1 hour', timedelta(hours=1)),
+    ('3 hours', timedelta(hours=3)),
+    ('6 hours', timedelta(hours=6)),
+    ('12 hours', timedelta(hours=12)),
+    ('1 day', timedelta(days=1)),
+    ('7 days', timedelta(days=7)),
+]
+
+class Rollup:
+    """One continuous aggregate and the dimensions it is grouped by"""
+
+    def __init__(self, table_name: str, dimensions: Tuple[str, ...], width: timedelta):
+        self.table_name = table_name
+        self.dimensions = dimensions
+        self.width = width
+
+    def covers(self, dimensions: Iterable[str]) -> bool:
+        return set(dimensions) <= set(self.dimensions)
+
+class RollupTier:
+    """One bucket width of the rollup hierarchy with its full and narrow rollups"""
+
+    def __init__(
+        self,
+        interval: str,
+        table_name: str,
+        bucket_size: str,
+        width: timedelta,
+        retention: timedelta,
+        max_range: Optional[timedelta] = None,
+        narrow: bool = True,
+        realtime: bool = False
+    ):
+        self.interval = interval
+        self.table_name = table_name
+        self.bucket_size = bucket_size
+        self.width = width
+        self.retention = retention
+        # Longer ranges are served by the next coarser tier to bound the number of buckets
+        self.max_range = max_range
+        # Real-time aggregation adds raw rows that are not materialized yet
+        self.realtime = realtime
+        # Smallest first, the full rollup last
+        self.rollups = [
+            Rollup(f"{table_name}_{suffix}", dimensions, width)
+            for suffix, dimensions in (NARROW_DIMENSIONS if narrow else [])
+        ] + [Rollup(table_name, FULL_DIMENSIONS, width)]
+
+# Rollup hierarchy from fine to coarse. The 1-minute tier only serves ranges of
+# about an hour, so it has no narrow rollups, and it is the only real-time tier.
+ROLLUP_TIERS: List[RollupTier] = [
+    RollupTier('1min', 'requests_1min', '1 minute', timedelta(minutes=1), timedelta(days=14), narrow=False, realtime=True),
+    RollupTier('5min', 'requests_5min', '5 minutes', timedelta(minutes=5), timedelta(days=90), max_range=timedelta(days=4)),
+    RollupTier('1hour', 'requests_1hour', '1 hour', timedelta(hours=1), timedelta(days=720), max_range=timedelta(days=90)),
+    RollupTier('1day', 'requests_1day', '1 day', timedelta(days=1), timedelta(days=1825)),
+]
+
+# Retention of every source, matching the retention policies in database/init.sql
+SOURCE_RETENTION: Dict[str, timedelta] = {
+    'requests': timedelta(days=7),
+    **{tier.table_name: tier.retention for tier in ROLLUP_TIERS},
+}
+
+# Tier (full rollup) every rollup belongs to
+ROLLUP_TIER_TABLE: Dict[str, str] = {
+    rollup.table_name: tier.table_name for tier in ROLLUP_TIERS for rollup in tier.rollups
+}
+
+# Every rollup with its bucket width, bottom-up: each full rollup after the tier below
+# it, and the narrow rollups of a tier after its full rollup
+REFRESH_ORDER: List[Tuple[str, timedelta]] = [
+    (rollup.table_name, rollup.width) for tier in ROLLUP_TIERS for rollup in reversed(tier.rollups)
+]
+
+# Source every rollup is computed from: a full rollup from the full rollup of the tier
+# below it (the 1-minute tier from raw requests), a narrow rollup from its tier's full rollup
+REFRESH_SOURCES: Dict[str, str] = {
+    rollup.table_name: (
+        tier.table_name if rollup.table_name != tier.table_name
+        else ROLLUP_TIERS[index - 1].table_name if index else 'requests'
+    )
+    for index, tier in enumerate(ROLLUP_TIERS) for rollup in tier.rollups
+}
+
+# How far back a rollup bucket can be refreshed: the retention of its source. Older
+# buckets would be recomputed from a source whose retention already dropped that
+# window, replacing their history with whatever few late rows arrived.
+REFRESH_HORIZONS: Dict[str, timedelta] = {
+    table_name: SOURCE_RETENTION[source] for table_name, source in REFRESH_SOURCES.items()
+}
+
+# Views with the history of a tier from before the latency histograms, created by
+# database/migrations/009_legacy_history.sql. They have the measures of the rollups;
+# rows from before migration 005 have no histograms. Which tier reads which view up to
+# when is read from rollup_history.
+HISTORY_ROLLUPS: Dict[str, Rollup] = {
+    'requests_5min_history': Rollup('requests_5min_history', FULL_DIMENSIONS, timedelta(minutes=5)),
+    'requests_1hour_history': Rollup('requests_1hour_history', FULL_DIMENSIONS, timedelta(hours=1)),
+}
+
+def select_tier(interval: str, start_time: datetime, end_time: datetime, now: datetime) -> RollupTier:
+    """
+    Pick the rollup tier for a query.
+
+    Starts at the tier of the requested interval and moves to coarser tiers
+    while the range is longer than the tier is meant for, or starts before
+    the tier's retention, so old ranges are not silently empty.
+    """
+    index = next(i for i, tier in enumerate(ROLLUP_TIERS) if tier.interval == interval)
+    while index < len(ROLLUP_TIERS) - 1:
+        tier = ROLLUP_TIERS[index]
+        too_long = tier.max_range is not None and end_time - start_time > tier.max_range
+        if not too_long and start_time >= now - tier.retention:
+            break
+        index += 1
+    return ROLLUP_TIERS[index]
+
+def bucket_count(start_time: datetime, end_time: datetime, width: timedelta) -> int:
+    """Number of aligned buckets of a width that [start_time, end_time) touches"""
+    first_bucket = TIME_BUCKET_ORIGIN + ((start_time - TIME_BUCKET_ORIGIN) // width) * width
+    return -(-(end_time - first_bucket) // width)
+
+def plan_bucket_width(
+    tier: RollupTier,
+    start_time: datetime,
+    end_time: datetime,
+    max_points: int
+) -> Tuple[RollupTier, str, timedelta]:
+    """
+    Pick the bucket width and source tier of a time series limited to max_points.
+
+    The width is the narrowest of CHART_BUCKET_WIDTHS, but at least the given
+    tier's, that yields at most max_points buckets; very long ranges get the
+    widest one. The source is the coarsest tier from the given one up whose
+    buckets nest in that width, which is re-bucketed to it and has the fewest
+    rows to read.
+    """
+    widths = [(bucket_size, width) for bucket_size, width in CHART_BUCKET_WIDTHS if width >= tier.width]
+    bucket_size, width = next(
+        (
+            (bucket_size, width) for bucket_size, width in widths
+            if bucket_count(start_time, end_time, width) <= max_points
+        ),
+        widths[-1]
+    )
+    source = tier
+    for current in ROLLUP_TIERS[ROLLUP_TIERS.index(tier):]:
+        if width % current.width == timedelta(0):
+            source = current
+    return source, bucket_size, width
+
+def plan_rollup(tier: RollupTier, dimensions: Iterable[str]) -> Rollup:
+    """Pick the smallest rollup of a tier that has all the given dimensions"""
+    dimensions = set(dimensions) | {'status'}
+    return next(rollup for rollup in tier.rollups if rollup.covers(dimensions))
+
+def plan_segments(
+    tier: RollupTier,
+    dimensions: Iterable[str],
+    start_time: datetime,
+    end_time: datetime,
+    watermarks: Dict[str, datetime],
+    now: Optional[datetime] = None,
+    history: Optional[Dict[str, Tuple[str, datetime]]] = None
+) -> List[Tuple[Rollup, datetime, datetime]]:
+    """
+    Split [start_time, end_time) into segments served by successively finer tiers.
+
+    Each tier, from the given one down to the real-time tier, serves the time up
+    to the end of its materialized range (its watermark); the real-time tier
+    finishes the range, including raw rows that are not materialized anywhere
+    yet. Watermarks are bucket boundaries of their tier and every coarser
+    boundary is a finer one too, so no bucket of a source straddles two
+    segments. Rollups without a known watermark are treated as up to date.
+
+    A watermark past the start of its tier's open bucket is capped there: the
+    open bucket may have been materialized mid-way, e.g. by a refresh policy,
+    and rows that arrived since are only visible through finer tiers.
+
+    history maps a tier to the history view and end of its history from before
+    the current aggregates; the range before that end is read from the view.
+    """
+    now = now or datetime.now(timezone.utc)
+    dimensions = set(dimensions)
+    tiers = ROLLUP_TIERS[:ROLLUP_TIERS.index(tier) + 1]
+    segments: List[Tuple[Rollup, datetime, datetime]] = []
+    cursor = start_time
+    history_view, history_end = (history or {}).get(tier.table_name, (None, None))
+    if history_view in HISTORY_ROLLUPS and start_time < history_end:
+        cursor = min(history_end, end_time)
+        segments.append((HISTORY_ROLLUPS[history_view], start_time, cursor))
+        if cursor >= end_time:
+            return segments
+    for current in reversed(tiers):
+        rollup = plan_rollup(current, dimensions)
+        watermark = watermarks.get(rollup.table_name)
+        if current.realtime or watermark is None:
+            segment_end = end_time
+        else:
+            open_bucket = TIME_BUCKET_ORIGIN + ((now - TIME_BUCKET_ORIGIN) // current.width) * current.width
+            segment_end = min(max(min(watermark, open_bucket), cursor), end_time)
+        if segment_end > cursor:
+            segments.append((rollup, cursor, segment_end))
+            cursor = segment_end
+        if cursor >= end_time:
+            break
+    return segments or [(plan_rollup(tier, dimensions), start_time, end_time)]
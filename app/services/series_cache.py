@@ -0,0 +1,141 @@
+from app.core.config import settings
+from app.services.rollups import ROLLUP_TIER_TABLE, SOURCE_RETENTION
+from app.services.refresh_service import align_bucket, refresh_scheduler
+from app.models.telemetry import SeriesCacheStats
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timezone, timedelta
+
+class _CachedSeries:
+    """Closed time series buckets of one source and filter combination"""
+
+    def __init__(self, table_name: str, width: timedelta):
+        self.table_name = table_name
+        self.width = width
+        self.points: Dict[datetime, Dict[str, Any]] = {}
+
+class TimeSeriesCache:
+    """
+    Cache of closed time series buckets per source and filters.
+
+    A bucket is closed once it ended more than the grace period ago; closed
+    buckets are kept until they fall out of the source's retention, so a
+    refresh only has to query the open tail. Buckets that receive late data
+    are invalidated by the ingest path (raw source) or by the targeted refresh
+    of a continuous aggregate, but only for data of this process. So only
+    buckets that also ended the grace period before the materialization
+    watermark read from the database are stored: they were materialized, by
+    whichever replica, and are past the usual client batching delay.
+    """
+
+    def __init__(self, max_series: int, grace: timedelta, enabled: bool = True):
+        self.max_series = max_series
+        self.grace = grace
+        self.enabled = enabled
+        self.hit_buckets = 0
+        self.queried_buckets = 0
+        self.invalidated_buckets = 0
+        self._series: "OrderedDict[str, _CachedSeries]" = OrderedDict()
+
+    def closed_before(self, width: timedelta, now: Optional[datetime] = None) -> datetime:
+        """Start of the first bucket that may still change"""
+        now = now or datetime.now(timezone.utc)
+        return align_bucket(now - self.grace, width)
+
+    def lookup(self, key: str, start_time: datetime, end_time: datetime, width: timedelta):
+        """
+        Get the cached leading buckets of [start_time, end_time).
+
+        Returns the cached points and the start of the first bucket that must
+        be queried, i.e. the first bucket that is open or not cached.
+        """
+        series = self._series.get(key)
+        closed_before = min(self.closed_before(width), end_time)
+        if series is None:
+            return [], start_time
+
+        self._series.move_to_end(key)
+        points: List[Dict[str, Any]] = []
+        bucket = start_time
+        while bucket < closed_before and bucket in series.points:
+            points.append(series.points[bucket])
+            bucket += width
+
+        self.hit_buckets += len(points)
+        return points, bucket
+
+    def store(
+        self,
+        key: str,
+        table_name: str,
+        width: timedelta,
+        points: List[Dict[str, Any]],
+        watermark: Optional[datetime]
+    ) -> None:
+        """Keep the closed buckets among freshly queried, gap-filled points that are materialized
+        at the source's watermark; nothing is kept without a watermark"""
+        self.queried_buckets += len(points)
+        if watermark is None:
+            return
+        closed_before = min(self.closed_before(width), align_bucket(watermark - self.grace, width))
+        oldest = datetime.now(timezone.utc) - SOURCE_RETENTION.get(table_name, timedelta(0))
+
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _CachedSeries(table_name, width)
+            while len(self._series) > self.max_series:
+                self._series.popitem(last=False)
+        self._series.move_to_end(key)
+
+        for point in points:
+            if oldest <= point['bucket'] < closed_before:
+                series.points[point['bucket']] = point
+
+        # Drop buckets that fell out of retention
+        for bucket in [bucket for bucket in series.points if bucket < oldest]:
+            del series.points[bucket]
+
+    def invalidate(self, table_name: str, start_time: datetime, end_time: datetime) -> None:
+        """Forget cached buckets of a source that overlap [start_time, end_time)"""
+        # Series are cached per tier, whichever rollup of the tier they were read from
+        table_name = ROLLUP_TIER_TABLE.get(table_name, table_name)
+        for series in self._series.values():
+            if series.table_name != table_name or not series.points:
+                continue
+            first = align_bucket(start_time, series.width)
+            if (end_time - first) / series.width > len(series.points):
+                stale = [bucket for bucket in series.points if first <= bucket < end_time]
+            else:
+                stale = []
+                bucket = first
+                while bucket < end_time:
+                    if bucket in series.points:
+                        stale.append(bucket)
+                    bucket += series.width
+            for bucket in stale:
+                del series.points[bucket]
+            self.invalidated_buckets += len(stale)
+
+    def clear(self) -> None:
+        self._series.clear()
+
+    def get_stats(self) -> SeriesCacheStats:
+        """Get cached series and bucket counters of this process"""
+        return SeriesCacheStats(
+            enabled=self.enabled,
+            series=len(self._series),
+            buckets=sum(len(series.points) for series in self._series.values()),
+            hit_buckets=self.hit_buckets,
+            queried_buckets=self.queried_buckets,
+            invalidated_buckets=self.invalidated_buckets
+        )
+
+# Global time series cache shared by all metrics requests of this process
+series_cache = TimeSeriesCache(
+    max_series=settings.series_cache_max_series,
+    grace=timedelta(seconds=settings.series_cache_grace_seconds),
+    enabled=settings.series_cache_enabled
+)
+
+# Forget buckets that received late data once they are re-materialized
+refresh_scheduler.add_listener(series_cache.invalidate)
@@ -0,0 +1,192 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+from app.models.telemetry import CompressionStats, CompressionStatsResponse, ChunkSizingAdvice
+from datetime import timedelta
+import math
+
+# Chunk intervals the advisor chooses from, smallest first
+CHUNK_INTERVAL_CHOICES = [
+    timedelta(hours=1),
+    timedelta(hours=2),
+    timedelta(hours=4),
+    timedelta(hours=6),
+    timedelta(hours=12),
+    timedelta(days=1),
+    timedelta(days=2),
+    timedelta(days=7)
+]
+
+# Below this size a chunk costs more in planning and per-chunk overhead than it saves
+MIN_CHUNK_BYTES = 100 * 1024 * 1024
+MAX_SERVICE_PARTITIONS = 16
+
+class StorageService:
+    """Service for inspecting TimescaleDB storage of hypertables and continuous aggregates"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_compression_stats(self) -> CompressionStatsResponse:
+        """Get compression ratios for every hypertable and continuous aggregate"""
+
+        # Continuous aggregates store their data in internal materialization hypertables,
+        # so resolve those to report them under the view name
+        sql_query = text("""
+            WITH targets AS (
+                SELECT
+                    hypertable_name::text as name,
+                    'hypertable' as kind,
+                    format('%I.%I', hypertable_schema, hypertable_name)::regclass as relid
+                FROM timescaledb_information.hypertables
+                WHERE hypertable_schema NOT LIKE '\\_timescaledb%'
+                UNION ALL
+                SELECT
+                    view_name::text as name,
+                    'continuous_aggregate' as kind,
+                    format('%I.%I', materialization_hypertable_schema, materialization_hypertable_name)::regclass as relid
+                FROM timescaledb_information.continuous_aggregates
+            )
+            SELECT
+                t.name,
+                t.kind,
+                hypertable_size(t.relid) as total_bytes,
+                COALESCE(SUM(s.total_chunks), 0) as total_chunks,
+                COALESCE(SUM(s.number_compressed_chunks), 0) as compressed_chunks,
+                SUM(s.before_compression_total_bytes) as before_compression_bytes,
+                SUM(s.after_compression_total_bytes) as after_compression_bytes
+            FROM targets t
+            LEFT JOIN LATERAL hypertable_compression_stats(t.relid) s ON TRUE
+            GROUP BY t.name, t.kind, t.relid
+            ORDER BY t.kind, t.name
+        """)
+
+        result = await self.db.execute(sql_query)
+        relations = []
+        for row in result.fetchall():
+            compression_ratio = None
+            if row.before_compression_bytes and row.after_compression_bytes:
+                compression_ratio = row.before_compression_bytes / row.after_compression_bytes
+
+            relations.append(CompressionStats(
+                name=row.name,
+                kind=row.kind,
+                total_bytes=row.total_bytes or 0,
+                total_chunks=row.total_chunks,
+                compressed_chunks=row.compressed_chunks,
+                before_compression_bytes=row.before_compression_bytes,
+                after_compression_bytes=row.after_compression_bytes,
+                compression_ratio=compression_ratio
+            ))
+
+        return CompressionStatsResponse(relations=relations)
+
+    async def get_chunk_advice(self) -> ChunkSizingAdvice:
+        """
+        Recommend a chunk interval and number of service hash partitions for requests.
+
+        Follows the TimescaleDB guideline that the chunks of the current interval,
+        including their indexes, should fit into about 25% of memory
+        (effective_cache_size is used as the memory estimate). Hash partitions
+        divide each interval into per-service chunks; they are only recommended
+        while every partition chunk stays above MIN_CHUNK_BYTES.
+        """
+
+        # Uncompressed chunks reflect the on-disk footprint of fresh, hot data
+        chunk_query = text("""
+            SELECT
+                COALESCE(SUM(s.total_bytes), 0) as total_bytes,
+                MIN(c.range_start) as first_start,
+                LEAST(MAX(c.range_end), now()) as last_end
+            FROM timescaledb_information.chunks c
+            JOIN chunks_detailed_size('requests') s
+                ON s.chunk_schema = c.chunk_schema AND s.chunk_name = c.chunk_name
+            WHERE c.hypertable_name = 'requests'
+            AND NOT c.is_compressed
+        """)
+
+        dimension_query = text("""
+            SELECT column_name, dimension_type, time_interval, num_partitions
+            FROM timescaledb_information.dimensions
+            WHERE hypertable_name = 'requests'
+        """)
+
+        memory_query = text("""
+            SELECT setting::bigint * pg_size_bytes(COALESCE(unit, '1')) as bytes
+            FROM pg_settings
+            WHERE name = 'effective_cache_size'
+        """)
+
+        # Traffic share per service over the last day, from the hourly rollup
+        service_query = text("""
+            SELECT service, SUM(count_requests) as total_requests
+            FROM requests_1hour
+            WHERE bucket >= now() - INTERVAL '1 day'
+            GROUP BY service
+            ORDER BY total_requests DESC
+        """)
+
+        chunks = (await self.db.execute(chunk_query)).fetchone()
+        dimensions = (await self.db.execute(dimension_query)).fetchall()
+        memory_bytes = (await self.db.execute(memory_query)).scalar() or 0
+        services = (await self.db.execute(service_query)).fetchall()
+
+        current_interval = None
+        current_partitions = 1
+        for dimension in dimensions:
+            if dimension.dimension_type == 'Time':
+                current_interval = dimension.time_interval
+            elif dimension.column_name == 'service' and dimension.num_partitions:
+                current_partitions = dimension.num_partitions
+
+        bytes_per_day = None
+        if chunks and chunks.total_bytes and chunks.first_start and chunks.last_end:
+            covered_days = max((chunks.last_end - chunks.first_start) / timedelta(days=1), 1 / 24)
+            bytes_per_day = chunks.total_bytes / covered_days
+
+        target_bytes = memory_bytes * 0.25
+        recommended_interval = CHUNK_INTERVAL_CHOICES[-1]
+        if bytes_per_day:
+            # Largest interval whose data still fits the memory target
+            fitting = [
+                interval for interval in CHUNK_INTERVAL_CHOICES
+                if bytes_per_day * (interval / timedelta(days=1)) <= target_bytes
+            ]
+            recommended_interval = fitting[-1] if fitting else CHUNK_INTERVAL_CHOICES[0]
+
+        total_requests = sum(row.total_requests for row in services)
+        largest_share = services[0].total_requests / total_requests if total_requests else None
+
+        recommended_partitions = 1
+        if bytes_per_day and len(services) > 1:
+            interval_bytes = bytes_per_day * (recommended_interval / timedelta(days=1))
+            recommended_partitions = max(1, min(
+                math.floor(interval_bytes / MIN_CHUNK_BYTES),
+                len(services),
+                MAX_SERVICE_PARTITIONS
+            ))
+
+        notes = []
+        if not bytes_per_day:
+            notes.append("No uncompressed chunks yet; recommendations will improve once data has been ingested.")
+        if recommended_partitions > 1 and current_partitions == 1:
+            notes.append(
+                "Hash partitioning can only be added to an empty hypertable; "
+                "see database/optional/space_partitioning.sql."
+            )
+        if largest_share is not None and largest_share > 0.5 and recommended_partitions > 1:
+            notes.append(
+                "One service produces most of the traffic; hash partitioning keeps "
+                "queries for the other services from scanning its chunks."
+            )
+
+        return ChunkSizingAdvice(
+            current_chunk_interval_seconds=int(current_interval.total_seconds()) if current_interval else None,
+            current_service_partitions=current_partitions,
+            memory_bytes=memory_bytes,
+            bytes_per_day=int(bytes_per_day) if bytes_per_day else None,
+            services=len(services),
+            largest_service_share=largest_share,
+            recommended_chunk_interval_seconds=int(recommended_interval.total_seconds()),
+            recommended_service_partitions=recommended_partitions,
+            notes=notes
+        )
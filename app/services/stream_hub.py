@@ -0,0 +1,170 @@
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.core.config import settings
+from app.models.telemetry import MetricsQuery, StreamStatsResponse
+from app.services.cache_service import make_cache_key
+from app.services.metrics_service import MetricsService
+from app.services.series_cache import series_cache
+from typing import Any, Dict, Optional, Set, Tuple
+from datetime import datetime, timezone, timedelta
+import asyncio
+import contextlib
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Panels of the realtime view pushed to subscribers
+STREAM_PANELS = ['time_series', 'metrics_summary', 'system_overview']
+
+BUCKET_WIDTH = timedelta(minutes=1)
+
+StreamEvent = Tuple[str, Dict[str, Any]]  # event name, data
+
+class _Channel:
+    """One shared realtime computation and its subscribers"""
+
+    def __init__(self, filters: Dict[str, str], session_factory: async_sessionmaker):
+        self.filters = filters
+        self.session_factory = session_factory
+        self.subscribers: Set[asyncio.Queue] = set()
+        # Latest full payload, sent to new subscribers and to those that fell behind
+        self.snapshot: Optional[Dict[str, Any]] = None
+        # Newest closed bucket that was pushed; buckets in the revision window are pushed again
+        self.last_bucket: Optional[datetime] = None
+        self.task: Optional[asyncio.Task] = None
+
+class StreamHub:
+    """
+    Pushes the realtime view to subscribers as 1-minute buckets close.
+
+    Subscriptions with the same filters share one channel, which computes the
+    realtime payload once per closed bucket and fans it out to all its
+    subscribers, so database load follows the number of distinct views rather
+    than the number of open dashboards. A channel stops when its last
+    subscriber leaves.
+
+    Subscribers first get a snapshot of the last 60 minutes, then an update
+    per bucket with the newly closed buckets and the current summaries. Closed
+    buckets that may still be revised by late data, those of the delta cursor's
+    revision window, are sent again with every update; subscribers replace
+    buckets they already have. A subscriber whose queue is full is sent a
+    fresh snapshot instead.
+    """
+
+    def __init__(self, queue_size: int, close_grace_seconds: float):
+        self.queue_size = queue_size
+        # Requests of a bucket may arrive shortly after it ended, and are only
+        # materialized by the next targeted refresh
+        self.close_grace_seconds = close_grace_seconds
+        self.computations = 0
+        self.resyncs = 0
+        self._channels: Dict[str, _Channel] = {}
+
+    def subscribe(self, filters: Dict[str, str], session_factory: async_sessionmaker) -> Tuple[str, asyncio.Queue]:
+        """Subscribe to the realtime view of a filter set"""
+        key = make_cache_key("stream", filters)
+        channel = self._channels.get(key)
+        if channel is None:
+            channel = _Channel(filters, session_factory)
+            self._channels[key] = channel
+            channel.task = asyncio.create_task(self._run(channel))
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        channel.subscribers.add(queue)
+        if channel.snapshot is not None:
+            queue.put_nowait(('snapshot', channel.snapshot))
+        return key, queue
+
+    def unsubscribe(self, key: str, queue: asyncio.Queue) -> None:
+        """Leave a channel, stopping it once nobody listens"""
+        channel = self._channels.get(key)
+        if channel is None:
+            return
+        channel.subscribers.discard(queue)
+        if not channel.subscribers:
+            del self._channels[key]
+            channel.task.cancel()
+
+    async def close(self) -> None:
+        """Stop all channels"""
+        channels, self._channels = list(self._channels.values()), {}
+        for channel in channels:
+            channel.task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await channel.task
+
+    def _seconds_until_close(self) -> float:
+        """Time until the grace period after the end of the current bucket has passed"""
+        width = BUCKET_WIDTH.total_seconds()
+        now = time.time()
+        next_close = ((now - self.close_grace_seconds) // width + 1) * width + self.close_grace_seconds
+        return next_close - now
+
+    async def _compute(self, channel: _Channel) -> Dict[str, Any]:
+        # The channel already shares one computation per bucket; a cached payload could
+        # predate the bucket that just closed, and comes back from a shared backend as JSON
+        query = MetricsQuery(**channel.filters, interval="1min", panels=STREAM_PANELS)
+        async with channel.session_factory() as session:
+            return await MetricsService(session).get_dashboard_payload(query, cached=False)
+
+    async def _run(self, channel: _Channel) -> None:
+        """Compute the channel's payload once per closed bucket until cancelled"""
+        while True:
+            try:
+                payload = await self._compute(channel)
+                self.computations += 1
+                self._publish(channel, payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Realtime stream computation failed for {channel.filters}: {e}")
+            await asyncio.sleep(self._seconds_until_close())
+
+    def _publish(self, channel: _Channel, payload: Dict[str, Any]) -> None:
+        """Send the first payload as a snapshot and later ones as updates with the new and revisable closed buckets"""
+        now = datetime.now(timezone.utc)
+        closed = [point for point in payload['time_series'] if point['bucket'] + BUCKET_WIDTH <= now]
+        revisable = series_cache.closed_before(BUCKET_WIDTH, now)
+        first = channel.snapshot is None
+        channel.snapshot = payload
+
+        if first:
+            event: StreamEvent = ('snapshot', payload)
+        else:
+            event = ('update', {
+                'buckets': [
+                    point for point in closed
+                    if channel.last_bucket is None or point['bucket'] > channel.last_bucket
+                    or point['bucket'] >= revisable
+                ],
+                'metrics_summary': payload['metrics_summary'],
+                'system_overview': payload['system_overview']
+            })
+        if closed:
+            channel.last_bucket = closed[-1]['bucket']
+
+        for queue in channel.subscribers:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A slow subscriber missed updates; replace its backlog with the current state
+                self.resyncs += 1
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(('snapshot', payload))
+
+    def get_stats(self) -> StreamStatsResponse:
+        """Get channel and subscriber counts of this process"""
+        return StreamStatsResponse(
+            channels=len(self._channels),
+            subscribers=sum(len(channel.subscribers) for channel in self._channels.values()),
+            computations=self.computations,
+            resyncs=self.resyncs
+        )
+
+# Global hub shared by all realtime streams of this process
+stream_hub = StreamHub(
+    queue_size=settings.stream_queue_size,
+    # At least one refresh interval, so late rows of a bucket are materialized before it is pushed
+    close_grace_seconds=max(settings.stream_close_grace_seconds, settings.cagg_refresh_interval_seconds)
+)
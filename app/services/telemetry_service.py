@@ -1,6 +1,10 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from app.models.telemetry import TelemetryRequest
+from app.services.dimension_catalog import dimension_catalog
+from app.services.exemplar_service import exemplar_reservoir
+from app.services.refresh_service import refresh_scheduler
+from app.services.data_versions import data_versions
 from typing import List
 from datetime import datetime, timezone
 
@@ -39,7 +43,20 @@ class TelemetryService:
         try:
             await self.db.execute(insert_query, batch_data)
             await self.db.commit()
-            return len(batch_data)
         except Exception as e:
             await self.db.rollback()
-            raise e
\ No newline at end of file
+            raise e
+
+        # Mark the touched buckets so only they get re-materialized
+        refresh_scheduler.mark(row['created_at'] for row in batch_data)
+        data_versions.mark_ingest({row['service'] for row in batch_data})
+
+        # Sample stored rows into the exemplar reservoir, which outlives raw retention
+        for row in batch_data:
+            exemplar_reservoir.offer(row)
+
+        # Record first and last sightings of dimension values for filters and node liveness
+        for row in batch_data:
+            dimension_catalog.observe(row)
+
+        return len(batch_data)
\ No newline at end of file
@@ -0,0 +1,85 @@
+from sqlalchemy import text
+from app.core.config import settings
+from app.services.refresh_service import RAW_SOURCE, refresh_scheduler
+from typing import Dict, Optional, Tuple
+from datetime import datetime
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class MaterializationWatermarks:
+    """
+    Cached end of the materialized range of every continuous aggregate.
+
+    Rows up to the watermark of a view are materialized; anything newer only
+    exists in finer tiers or raw data. Watermarks are re-read after the TTL
+    and after every targeted refresh of this process. If they cannot be read,
+    every view is treated as up to date.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._watermarks: Dict[str, datetime] = {}
+        self._fetched_at = None
+
+    async def get(self, session) -> Dict[str, datetime]:
+        if self._fetched_at is not None and time.monotonic() - self._fetched_at < self.ttl_seconds:
+            return self._watermarks
+
+        # Views without materialized data report the minimum time, which is clamped to the epoch
+        watermark_query = text("""
+            SELECT
+                user_view_name as view_name,
+                GREATEST(
+                    _timescaledb_functions.to_timestamp(_timescaledb_functions.cagg_watermark(mat_hypertable_id)),
+                    'epoch'::timestamptz
+                ) as watermark
+            FROM _timescaledb_catalog.continuous_agg
+        """)
+
+        try:
+            rows = (await session.execute(watermark_query)).fetchall()
+        except Exception as e:
+            await session.rollback()
+            logger.warning(f"Reading continuous aggregate watermarks failed: {e}")
+            return {}
+
+        self._watermarks = {row.view_name: row.watermark for row in rows}
+        self._fetched_at = time.monotonic()
+        return self._watermarks
+
+    def invalidate(self, source: str, start: datetime, end: datetime) -> None:
+        """Refresh listener forgetting the watermarks once a view was refreshed"""
+        if source != RAW_SOURCE:
+            self._fetched_at = None
+
+# Global watermarks shared by all metrics requests of this process
+materialization_watermarks = MaterializationWatermarks(ttl_seconds=settings.tier_watermark_ttl_seconds)
+refresh_scheduler.add_listener(materialization_watermarks.invalidate)
+
+class RollupHistory:
+    """
+    History views of the tiers from before the current aggregates, from rollup_history.
+
+    The table is only written by migrations, so it is read once; until that
+    succeeds, e.g. on installs without the table, no history is used.
+    """
+
+    def __init__(self):
+        self._history: Optional[Dict[str, Tuple[str, datetime]]] = None
+
+    async def get(self, session) -> Dict[str, Tuple[str, datetime]]:
+        if self._history is not None:
+            return self._history
+        try:
+            rows = (await session.execute(text("SELECT tier, history_view, ends_at FROM rollup_history"))).fetchall()
+        except Exception as e:
+            await session.rollback()
+            logger.warning(f"Reading the rollup history failed: {e}")
+            return {}
+        self._history = {row.tier: (row.history_view, row.ends_at) for row in rows}
+        return self._history
+
+# Global rollup history shared by all metrics requests of this process
+rollup_history = RollupHistory()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark encoding dashboard responses.
+
+Builds synthetic panel data with the given number of endpoints and consumers
+and a time series of the given length, and compares the previous path, which
+built the pydantic response models and let FastAPI validate and serialize
+them through response_model, with the payload path of MetricsService encoded
+by orjson. Both outputs are checked to be byte-identical. Needs no database.
+
+Usage:
+    MALTI_CONFIG_PATH=config/malti.toml \\
+        python benchmarks/bench_response_encoding.py --endpoints 5000 --buckets 720
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timezone, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from app.core.responses import dump_json  # noqa: E402
+from app.models.telemetry import DashboardMetricsResponse  # noqa: E402
+from app.services.metrics_service import MetricsService  # noqa: E402
+
+def panel_data(endpoints: int, buckets: int) -> dict:
+    """Plain panel data like split_dashboard_rows produces it"""
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    percentiles = {'p50_latency': 12.5, 'p90_latency': 40.1, 'p95_latency': 61.0, 'p99_latency': 120.7}
+    return {
+        'time_series': [
+            {
+                'bucket': start + timedelta(hours=i),
+                'total_requests': 1000 + i,
+                'error_count': 7,
+                'success_count': 990,
+                'min_latency': 1.0,
+                'avg_latency': 20.25,
+                'max_latency': 900.0,
+                'latency_histogram': (20, (1, 2, 3)),
+                **percentiles
+            }
+            for i in range(buckets)
+        ],
+        'metrics_summary': {
+            'total_requests': 10 ** 6, 'avg_latency': 20.25, 'min_latency': 1.0, 'max_latency': 900.0, **percentiles
+        },
+        'system_overview': {'total_requests': 10 ** 6, 'total_errors': 7000, 'error_rate': 0.7, 'avg_latency': 20.25},
+        'endpoints': [
+            {
+                'endpoint': f"/api/v1/resource/{i}", 'method': 'GET', 'service': 'auth-service',
+                'total_requests': 100 + i, 'error_count': i % 7, 'error_rate': (i % 7) / (100 + i) * 100
+            }
+            for i in range(endpoints)
+        ],
+        'status_distribution': [
+            {
+                'service': f"service-{i}", 'total_requests': 300, 'success_2xx': 200, 'warning_3xx': 50,
+                'error_4xx_5xx': 50, 'status_breakdown': {200: 200, 302: 50, 500: 50}
+            }
+            for i in range(20)
+        ],
+        'consumers': [
+            {
+                'consumer': f"consumer-{i}", 'total_requests': 100 + i,
+                'error_count': i % 5, 'error_rate': (i % 5) / (100 + i) * 100
+            }
+            for i in range(endpoints // 10)
+        ],
+        'distinct_nodes': [f"node-{i}" for i in range(50)],
+        'distinct_contexts': [f"context-{i}" for i in range(20)],
+    }
+
+def model_path(data: dict) -> bytes:
+    """Previous path: build the models, then validate and serialize them as response_model"""
+    response = DashboardMetricsResponse(**data)
+    validated = DashboardMetricsResponse.model_validate(jsonable_encoder(response))
+    return validated.model_dump_json().encode()
+
+def payload_path(data: dict) -> bytes:
+    """Payload path: shape plain data and encode it once"""
+    return dump_json(MetricsService(None)._build_payload(data))
+
+def measure(function, data: dict, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function(data)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", type=int, default=5000, help="Endpoints in the endpoints panel")
+    parser.add_argument("--buckets", type=int, default=720, help="Time series buckets")
+    parser.add_argument("--runs", type=int, default=20, help="Runs per variant")
+    args = parser.parse_args()
+
+    data = panel_data(args.endpoints, args.buckets)
+    if model_path(data) != payload_path(data):
+        sys.exit("Outputs of the two paths differ")
+
+    print(f"{'variant':<10}{'median ms':>12}{'bytes':>12}")
+    for variant, function in (("models", model_path), ("payload", payload_path)):
+        ms = measure(function, data, args.runs)
+        print(f"{variant:<10}{ms:>12.2f}{len(function(data)):>12}")
+
+if __name__ == "__main__":
+    main()
@@ -15,19 +15,94 @@ CREATE TABLE IF NOT EXISTS requests (
 );
 
 -- Convert to hypertable (TimescaleDB requirement)
-SELECT create_hypertable('requests', 'created_at', if_not_exists => TRUE);
+-- The default B-tree on created_at is replaced by the BRIN index below
+SELECT create_hypertable('requests', 'created_at', create_default_indexes => FALSE, if_not_exists => TRUE);
 SELECT set_chunk_time_interval('requests', INTERVAL '1 day');
 
--- Create indexes for better query performance
+-- Create indexes for the actual query shapes
+-- Every raw query (realtime dashboard, continuous aggregate refresh) is bounded by a
+-- created_at range first, and rows arrive in roughly created_at order, so a BRIN index
+-- gives time pruning at a fraction of the B-tree write cost. Service is the only filter
+-- selective enough inside a time range to justify a B-tree; the remaining filters are
+-- applied on the few pages the time range leaves. See benchmarks/bench_indexes.py.
+CREATE INDEX IF NOT EXISTS idx_requests_created_at_brin ON requests USING BRIN (created_at) WITH (pages_per_range = 32);
 CREATE INDEX IF NOT EXISTS idx_requests_service_created_at ON requests (service, created_at DESC);
-CREATE INDEX IF NOT EXISTS idx_requests_status ON requests (status);
-CREATE INDEX IF NOT EXISTS idx_requests_endpoint ON requests (endpoint);
-CREATE INDEX IF NOT EXISTS idx_requests_consumer ON requests (consumer);
-CREATE INDEX IF NOT EXISTS idx_requests_context ON requests (context);
 
--- Create continuous aggregates for 5-minute intervals
-CREATE MATERIALIZED VIEW IF NOT EXISTS requests_5min
-WITH (timescaledb.continuous) AS
+-- Create the exemplar table for sampled raw requests
+-- Keeps a bounded, weighted sample per service, endpoint and hour beyond raw retention
+CREATE TABLE IF NOT EXISTS request_exemplars (
+    bucket TIMESTAMPTZ NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL,
+    service TEXT NOT NULL,
+    node TEXT,
+    method TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    consumer TEXT NOT NULL,
+    context TEXT,
+    status SMALLINT NOT NULL,
+    response_time INT NOT NULL,
+    sample_key DOUBLE PRECISION NOT NULL
+);
+
+SELECT create_hypertable('request_exemplars', 'bucket', chunk_time_interval => INTERVAL '7 days', if_not_exists => TRUE);
+
+CREATE INDEX IF NOT EXISTS idx_request_exemplars_service_endpoint_bucket ON request_exemplars (service, endpoint, bucket DESC, sample_key DESC);
+
+-- Create the dimension catalog
+-- First and last time every dimension value was seen, per service. Maintained by the
+-- ingest path (see app/services/dimension_catalog.py) and searched by prefix for the
+-- dashboard filters, so no DISTINCT scan over requests is needed.
+CREATE TABLE IF NOT EXISTS dimension_catalog (
+    dimension TEXT NOT NULL,
+    service TEXT NOT NULL,
+    value TEXT NOT NULL,
+    first_seen TIMESTAMPTZ NOT NULL,
+    last_seen TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (dimension, service, value)
+);
+
+-- Prefix search across services; LIKE 'prefix%' needs text_pattern_ops under non-C collations
+CREATE INDEX IF NOT EXISTS idx_dimension_catalog_prefix ON dimension_catalog (dimension, value text_pattern_ops);
+
+-- Rollup history from before the histogram aggregates
+-- Installs upgraded through migration 005 keep their older history in legacy views;
+-- migration 009 registers them here. Fresh installs leave this table empty.
+CREATE TABLE IF NOT EXISTS rollup_history (
+    tier TEXT PRIMARY KEY,
+    history_view TEXT NOT NULL,
+    ends_at TIMESTAMPTZ NOT NULL
+);
+
+-- Mergeable latency histograms
+-- The continuous aggregates store a log-scale histogram of response times per bucket
+-- (see app/services/latency_sketch.py). malti_hist_merge adds histograms element-wise,
+-- so percentiles can be computed for any range and filter from pre-aggregated rows.
+CREATE OR REPLACE FUNCTION malti_hist_add(state BIGINT[], histogram BIGINT[])
+RETURNS BIGINT[] LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+    SELECT ARRAY(
+        SELECT s + h
+        FROM unnest(state, histogram) WITH ORDINALITY AS t(s, h, i)
+        ORDER BY i
+    )
+$$;
+
+CREATE OR REPLACE AGGREGATE malti_hist_merge(BIGINT[]) (
+    SFUNC = malti_hist_add,
+    STYPE = BIGINT[],
+    COMBINEFUNC = malti_hist_add,
+    PARALLEL = SAFE
+);
+
+-- Create the continuous aggregate hierarchy
+-- Only the 1-minute tier reads raw requests; every coarser tier is built from the tier
+-- below it, so each refresh only re-aggregates a few already aggregated rows. Counts
+-- and sums add up, min and max combine, and histograms merge, so every tier is exact
+-- with respect to the tier below.
+
+-- 1-minute aggregates from raw requests
+-- Real-time aggregation adds not yet materialized raw rows, so realtime queries stay current
+CREATE MATERIALIZED VIEW IF NOT EXISTS requests_1min
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
 SELECT
     service,
     node,
@@ -36,16 +111,39 @@ SELECT
     consumer,
     context,
     status,
-    time_bucket('5 minutes', created_at) AS bucket,
+    time_bucket('1 minute', created_at) AS bucket,
     COUNT(*) as count_requests,
     MIN(response_time) as min_response_time,
     MAX(response_time) as max_response_time,
-    AVG(response_time) as avg_response_time,
-    PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY response_time) as p95_response_time
+    SUM(response_time)::bigint as sum_response_time,
+    AVG(response_time)::double precision as avg_response_time,
+    -- 128 bins over ln(1 + ms) in [0, ln(1 + 600000)); merge with malti_hist_merge
+    histogram(ln(1 + response_time::double precision), 0, ln(600001), 128)::bigint[] as latency_histogram
 FROM requests
-GROUP BY service, node, method, endpoint, consumer, context, status, bucket;
+GROUP BY service, node, method, endpoint, consumer, context, status, time_bucket('1 minute', created_at);
+
+-- 5-minute aggregates from 1-minute aggregates
+CREATE MATERIALIZED VIEW IF NOT EXISTS requests_5min
+WITH (timescaledb.continuous) AS
+SELECT
+    service,
+    node,
+    method,
+    endpoint,
+    consumer,
+    context,
+    status,
+    time_bucket('5 minutes', bucket) AS bucket,
+    SUM(count_requests)::bigint as count_requests,
+    MIN(min_response_time) as min_response_time,
+    MAX(max_response_time) as max_response_time,
+    SUM(sum_response_time)::bigint as sum_response_time,
+    SUM(sum_response_time)::double precision / SUM(count_requests) as avg_response_time,
+    malti_hist_merge(latency_histogram) as latency_histogram
+FROM requests_1min
+GROUP BY service, node, method, endpoint, consumer, context, status, time_bucket('5 minutes', bucket);
 
--- Create continuous aggregates for 1-hour intervals
+-- 1-hour aggregates from 5-minute aggregates
 CREATE MATERIALIZED VIEW IF NOT EXISTS requests_1hour
 WITH (timescaledb.continuous) AS
 SELECT
@@ -56,32 +154,182 @@ SELECT
     consumer,
     context,
     status,
-    time_bucket('1 hour', created_at) AS bucket,
-    COUNT(*) as count_requests,
-    MIN(response_time) as min_response_time,
-    MAX(response_time) as max_response_time,
-    AVG(response_time) as avg_response_time,
-    PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY response_time) as p95_response_time
-FROM requests
-GROUP BY service, node, method, endpoint, consumer, context, status, bucket;
+    time_bucket('1 hour', bucket) AS bucket,
+    SUM(count_requests)::bigint as count_requests,
+    MIN(min_response_time) as min_response_time,
+    MAX(max_response_time) as max_response_time,
+    SUM(sum_response_time)::bigint as sum_response_time,
+    SUM(sum_response_time)::double precision / SUM(count_requests) as avg_response_time,
+    malti_hist_merge(latency_histogram) as latency_histogram
+FROM requests_5min
+GROUP BY service, node, method, endpoint, consumer, context, status, time_bucket('1 hour', bucket);
+
+-- 1-day aggregates from 1-hour aggregates
+CREATE MATERIALIZED VIEW IF NOT EXISTS requests_1day
+WITH (timescaledb.continuous) AS
+SELECT
+    service,
+    node,
+    method,
+    endpoint,
+    consumer,
+    context,
+    status,
+    time_bucket('1 day', bucket) AS bucket,
+    SUM(count_requests)::bigint as count_requests,
+    MIN(min_response_time) as min_response_time,
+    MAX(max_response_time) as max_response_time,
+    SUM(sum_response_time)::bigint as sum_response_time,
+    SUM(sum_response_time)::double precision / SUM(count_requests) as avg_response_time,
+    malti_hist_merge(latency_histogram) as latency_histogram
+FROM requests_1hour
+GROUP BY service, node, method, endpoint, consumer, context, status, time_bucket('1 day', bucket);
 
 -- Set up data retention policies
 -- Raw data: 7 days
 SELECT add_retention_policy('requests', INTERVAL '7 days');
 
+-- 1-minute aggregates: 14 days
+SELECT add_retention_policy('requests_1min', INTERVAL '14 days');
+
 -- 5-minute aggregates: 90 days
 SELECT add_retention_policy('requests_5min', INTERVAL '90 days');
 
 -- 1-hour aggregates: 720 days
 SELECT add_retention_policy('requests_1hour', INTERVAL '720 days');
 
+-- 1-day aggregates: 5 years
+SELECT add_retention_policy('requests_1day', INTERVAL '1825 days');
+
+-- Exemplar requests: 720 days, matching the 1-hour aggregates they drill down from
+SELECT add_retention_policy('request_exemplars', INTERVAL '720 days');
+
 -- Create refresh policies for continuous aggregates
+-- The backend refreshes exactly the buckets that received new rows on every ingest,
+-- tier by tier from the bottom up (see app/services/refresh_service.py). These
+-- policies are only a safety net for buckets whose dirty state was lost, e.g. when a
+-- backend process was killed.
+SELECT add_continuous_aggregate_policy('requests_1min',
+    start_offset => INTERVAL '3 hours',
+    end_offset => INTERVAL '0',
+    schedule_interval => INTERVAL '30 minutes');
+
 SELECT add_continuous_aggregate_policy('requests_5min',
     start_offset => INTERVAL '3 hours',
     end_offset => INTERVAL '0',
-    schedule_interval => INTERVAL '1 minute');
+    schedule_interval => INTERVAL '1 hour');
 
 SELECT add_continuous_aggregate_policy('requests_1hour',
     start_offset => INTERVAL '1 day',
     end_offset => INTERVAL '0',
-    schedule_interval => INTERVAL '15 minutes');
+    schedule_interval => INTERVAL '6 hours');
+
+SELECT add_continuous_aggregate_policy('requests_1day',
+    start_offset => INTERVAL '3 days',
+    end_offset => INTERVAL '0',
+    schedule_interval => INTERVAL '1 day');
+
+-- Enable native columnar compression
+-- Segment by the dimensions MetricsService filters on and order by time, so
+-- filtered long-range scans only decompress the matching segments
+ALTER TABLE requests SET (
+    timescaledb.compress,
+    timescaledb.compress_segmentby = 'service, endpoint',
+    timescaledb.compress_orderby = 'created_at DESC'
+);
+
+ALTER MATERIALIZED VIEW requests_1min SET (
+    timescaledb.compress = true,
+    timescaledb.compress_segmentby = 'service, endpoint',
+    timescaledb.compress_orderby = 'bucket DESC'
+);
+
+ALTER MATERIALIZED VIEW requests_5min SET (
+    timescaledb.compress = true,
+    timescaledb.compress_segmentby = 'service, endpoint',
+    timescaledb.compress_orderby = 'bucket DESC'
+);
+
+ALTER MATERIALIZED VIEW requests_1hour SET (
+    timescaledb.compress = true,
+    timescaledb.compress_segmentby = 'service, endpoint',
+    timescaledb.compress_orderby = 'bucket DESC'
+);
+
+ALTER MATERIALIZED VIEW requests_1day SET (
+    timescaledb.compress = true,
+    timescaledb.compress_segmentby = 'service, endpoint',
+    timescaledb.compress_orderby = 'bucket DESC'
+);
+
+-- Create compression policies
+-- Chunks are compressed once they are older than the refresh window that still rewrites them
+SELECT add_compression_policy('requests', compress_after => INTERVAL '1 day');
+SELECT add_compression_policy('requests_1min', compress_after => INTERVAL '1 day');
+SELECT add_compression_policy('requests_5min', compress_after => INTERVAL '1 day');
+SELECT add_compression_policy('requests_1hour', compress_after => INTERVAL '7 days');
+SELECT add_compression_policy('requests_1day', compress_after => INTERVAL '30 days');
+
+-- Narrow rollups of the 5-minute, 1-hour and 1-day tiers
+-- Each is built from the full rollup of its tier and keeps only a few dimensions, so
+-- a dashboard that only filters and groups by those reads one row per bucket and
+-- combination of them instead of one per combination of all seven dimensions.
+-- MetricsService picks the smallest rollup that has every dimension a query needs
+-- (see app/services/rollups.py, whose names and dimensions must match these).
+DO $$
+DECLARE
+    -- suffix, dimensions, compression segments
+    families TEXT[] := ARRAY[
+        ['by_service', 'service, status', 'service'],
+        ['by_consumer', 'service, consumer, status', 'service, consumer'],
+        ['by_endpoint', 'service, endpoint, method, status', 'service, endpoint']
+    ];
+    -- full rollup, bucket, retention, refresh start offset, refresh schedule, compress after
+    tiers TEXT[] := ARRAY[
+        ['requests_5min', '5 minutes', '90 days', '3 hours', '1 hour', '1 day'],
+        ['requests_1hour', '1 hour', '720 days', '1 day', '6 hours', '7 days'],
+        ['requests_1day', '1 day', '1825 days', '3 days', '1 day', '30 days']
+    ];
+    rollup TEXT;
+BEGIN
+    FOR t IN 1..array_length(tiers, 1) LOOP
+        FOR f IN 1..array_length(families, 1) LOOP
+            rollup := tiers[t][1] || '_' || families[f][1];
+
+            EXECUTE format(
+                'CREATE MATERIALIZED VIEW IF NOT EXISTS %I
+                WITH (timescaledb.continuous) AS
+                SELECT
+                    %s,
+                    time_bucket(%L, bucket) AS bucket,
+                    SUM(count_requests)::bigint as count_requests,
+                    MIN(min_response_time) as min_response_time,
+                    MAX(max_response_time) as max_response_time,
+                    SUM(sum_response_time)::bigint as sum_response_time,
+                    SUM(sum_response_time)::double precision / SUM(count_requests) as avg_response_time,
+                    malti_hist_merge(latency_histogram) as latency_histogram
+                FROM %I
+                GROUP BY %s, time_bucket(%L, bucket)
+                WITH NO DATA',
+                rollup, families[f][2], tiers[t][2], tiers[t][1], families[f][2], tiers[t][2]
+            );
+
+            PERFORM add_retention_policy(rollup, tiers[t][3]::interval, if_not_exists => TRUE);
+            PERFORM add_continuous_aggregate_policy(rollup,
+                start_offset => tiers[t][4]::interval,
+                end_offset => INTERVAL '0',
+                schedule_interval => tiers[t][5]::interval,
+                if_not_exists => TRUE);
+
+            EXECUTE format(
+                'ALTER MATERIALIZED VIEW %I SET (
+                    timescaledb.compress = true,
+                    timescaledb.compress_segmentby = %L,
+                    timescaledb.compress_orderby = %L
+                )',
+                rollup, families[f][3], 'bucket DESC'
+            );
+            PERFORM add_compression_policy(rollup, compress_after => tiers[t][6]::interval, if_not_exists => TRUE);
+        END LOOP;
+    END LOOP;
+END $$;
@@ -0,0 +1,23 @@
+-- Migration 001: exemplar table for sampled raw requests
+-- New installs get this from init.sql; apply to existing installs with:
+--   psql -U malti_user -d malti -f database/migrations/001_request_exemplars.sql
+
+CREATE TABLE IF NOT EXISTS request_exemplars (
+    bucket TIMESTAMPTZ NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL,
+    service TEXT NOT NULL,
+    node TEXT,
+    method TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    consumer TEXT NOT NULL,
+    context TEXT,
+    status SMALLINT NOT NULL,
+    response_time INT NOT NULL,
+    sample_key DOUBLE PRECISION NOT NULL
+);
+
+SELECT create_hypertable('request_exemplars', 'bucket', chunk_time_interval => INTERVAL '7 days', if_not_exists => TRUE);
+
+CREATE INDEX IF NOT EXISTS idx_request_exemplars_service_endpoint_bucket ON request_exemplars (service, endpoint, bucket DESC, sample_key DESC);
+
+SELECT add_retention_policy('request_exemplars', INTERVAL '720 days', if_not_exists => TRUE);
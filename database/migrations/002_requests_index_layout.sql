@@ -0,0 +1,22 @@
+-- Migration 002: time-leading index layout for the requests hypertable
+-- Replaces five B-tree indexes (plus the default created_at B-tree) with a BRIN
+-- index on created_at and the composite (service, created_at DESC) B-tree.
+-- Apply to existing installs with:
+--   psql -U malti_user -d malti -f database/migrations/002_requests_index_layout.sql
+
+-- Build the new time index before dropping the old one so queries keep a time index.
+-- transaction_per_chunk avoids holding a lock on the whole hypertable during the build.
+CREATE INDEX IF NOT EXISTS idx_requests_created_at_brin ON requests USING BRIN (created_at)
+    WITH (pages_per_range = 32, timescaledb.transaction_per_chunk);
+
+CREATE INDEX IF NOT EXISTS idx_requests_service_created_at ON requests (service, created_at DESC)
+    WITH (timescaledb.transaction_per_chunk);
+
+-- Single-column indexes that no query uses without a time range
+DROP INDEX IF EXISTS idx_requests_status;
+DROP INDEX IF EXISTS idx_requests_endpoint;
+DROP INDEX IF EXISTS idx_requests_consumer;
+DROP INDEX IF EXISTS idx_requests_context;
+
+-- Default index created by create_hypertable
+DROP INDEX IF EXISTS requests_created_at_idx;
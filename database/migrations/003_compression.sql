@@ -0,0 +1,26 @@
+-- Migration 003: native compression for the requests hypertable and continuous aggregates
+-- Apply to existing installs with:
+--   psql -U malti_user -d malti -f database/migrations/003_compression.sql
+-- Existing chunks are compressed by the policies in the background on their next run.
+
+ALTER TABLE requests SET (
+    timescaledb.compress,
+    timescaledb.compress_segmentby = 'service, endpoint',
+    timescaledb.compress_orderby = 'created_at DESC'
+);
+
+ALTER MATERIALIZED VIEW requests_5min SET (
+    timescaledb.compress = true,
+    timescaledb.compress_segmentby = 'service, endpoint',
+    timescaledb.compress_orderby = 'bucket DESC'
+);
+
+ALTER MATERIALIZED VIEW requests_1hour SET (
+    timescaledb.compress = true,
+    timescaledb.compress_segmentby = 'service, endpoint',
+    timescaledb.compress_orderby = 'bucket DESC'
+);
+
+SELECT add_compression_policy('requests', compress_after => INTERVAL '1 day', if_not_exists => TRUE);
+SELECT add_compression_policy('requests_5min', compress_after => INTERVAL '1 day', if_not_exists => TRUE);
+SELECT add_compression_policy('requests_1hour', compress_after => INTERVAL '7 days', if_not_exists => TRUE);
@@ -0,0 +1,17 @@
+-- Migration 004: refresh policies as a safety net for ingest-driven refresh
+-- The backend now refreshes the buckets that received new rows itself, so the
+-- fixed-window policies only need to run rarely.
+-- Apply to existing installs with:
+--   psql -U malti_user -d malti -f database/migrations/004_refresh_policies.sql
+
+SELECT remove_continuous_aggregate_policy('requests_5min', if_exists => TRUE);
+SELECT add_continuous_aggregate_policy('requests_5min',
+    start_offset => INTERVAL '3 hours',
+    end_offset => INTERVAL '0',
+    schedule_interval => INTERVAL '1 hour');
+
+SELECT remove_continuous_aggregate_policy('requests_1hour', if_exists => TRUE);
+SELECT add_continuous_aggregate_policy('requests_1hour',
+    start_offset => INTERVAL '1 day',
+    end_offset => INTERVAL '0',
+    schedule_interval => INTERVAL '6 hours');
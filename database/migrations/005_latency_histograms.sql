@@ -0,0 +1,109 @@
+-- Migration 005: mergeable latency histograms in the continuous aggregates
+-- Continuous aggregates cannot gain columns, so both views are recreated with a
+-- latency_histogram column in place of p95_response_time. The old views are kept
+-- as requests_5min_legacy and requests_1hour_legacy: history older than the raw
+-- retention (7 days) cannot be re-aggregated and stays there until their retention
+-- policies drop it. The new views are backfilled from the raw data that is left.
+-- Apply to existing installs with:
+--   psql -U malti_user -d malti -f database/migrations/005_latency_histograms.sql
+-- psql runs every statement in its own transaction, which the refresh calls require.
+
+CREATE OR REPLACE FUNCTION malti_hist_add(state BIGINT[], histogram BIGINT[])
+RETURNS BIGINT[] LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+    SELECT ARRAY(
+        SELECT s + h
+        FROM unnest(state, histogram) WITH ORDINALITY AS t(s, h, i)
+        ORDER BY i
+    )
+$$;
+
+CREATE OR REPLACE AGGREGATE malti_hist_merge(BIGINT[]) (
+    SFUNC = malti_hist_add,
+    STYPE = BIGINT[],
+    COMBINEFUNC = malti_hist_add,
+    PARALLEL = SAFE
+);
+
+-- Keep the old views read-only until they age out
+SELECT remove_continuous_aggregate_policy('requests_5min', if_exists => TRUE);
+SELECT remove_continuous_aggregate_policy('requests_1hour', if_exists => TRUE);
+ALTER MATERIALIZED VIEW requests_5min RENAME TO requests_5min_legacy;
+ALTER MATERIALIZED VIEW requests_1hour RENAME TO requests_1hour_legacy;
+
+CREATE MATERIALIZED VIEW requests_5min
+WITH (timescaledb.continuous) AS
+SELECT
+    service,
+    node,
+    method,
+    endpoint,
+    consumer,
+    context,
+    status,
+    time_bucket('5 minutes', created_at) AS bucket,
+    COUNT(*) as count_requests,
+    MIN(response_time) as min_response_time,
+    MAX(response_time) as max_response_time,
+    AVG(response_time) as avg_response_time,
+    -- 128 bins over ln(1 + ms) in [0, ln(1 + 600000)); merge with malti_hist_merge
+    histogram(ln(1 + response_time::double precision), 0, ln(600001), 128)::bigint[] as latency_histogram
+FROM requests
+GROUP BY service, node, method, endpoint, consumer, context, status, bucket
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW requests_1hour
+WITH (timescaledb.continuous) AS
+SELECT
+    service,
+    node,
+    method,
+    endpoint,
+    consumer,
+    context,
+    status,
+    time_bucket('1 hour', created_at) AS bucket,
+    COUNT(*) as count_requests,
+    MIN(response_time) as min_response_time,
+    MAX(response_time) as max_response_time,
+    AVG(response_time) as avg_response_time,
+    -- 128 bins over ln(1 + ms) in [0, ln(1 + 600000)); merge with malti_hist_merge
+    histogram(ln(1 + response_time::double precision), 0, ln(600001), 128)::bigint[] as latency_histogram
+FROM requests
+GROUP BY service, node, method, endpoint, consumer, context, status, bucket
+WITH NO DATA;
+
+SELECT add_retention_policy('requests_5min', INTERVAL '90 days');
+SELECT add_retention_policy('requests_1hour', INTERVAL '720 days');
+
+SELECT add_continuous_aggregate_policy('requests_5min',
+    start_offset => INTERVAL '3 hours',
+    end_offset => INTERVAL '0',
+    schedule_interval => INTERVAL '1 hour');
+
+SELECT add_continuous_aggregate_policy('requests_1hour',
+    start_offset => INTERVAL '1 day',
+    end_offset => INTERVAL '0',
+    schedule_interval => INTERVAL '6 hours');
+
+ALTER MATERIALIZED VIEW requests_5min SET (
+    timescaledb.compress = true,
+    timescaledb.compress_segmentby = 'service, endpoint',
+    timescaledb.compress_orderby = 'bucket DESC'
+);
+
+ALTER MATERIALIZED VIEW requests_1hour SET (
+    timescaledb.compress = true,
+    timescaledb.compress_segmentby = 'service, endpoint',
+    timescaledb.compress_orderby = 'bucket DESC'
+);
+
+SELECT add_compression_policy('requests_5min', compress_after => INTERVAL '1 day');
+SELECT add_compression_policy('requests_1hour', compress_after => INTERVAL '7 days');
+
+-- Backfill from the remaining raw data
+CALL refresh_continuous_aggregate('requests_5min', NULL, NULL);
+CALL refresh_continuous_aggregate('requests_1hour', NULL, NULL);
+
+-- Once the legacy history is no longer needed:
+--   DROP MATERIALIZED VIEW requests_5min_legacy;
+--   DROP MATERIALIZED VIEW requests_1hour_legacy;
@@ -0,0 +1,179 @@
+-- Migration 006: hierarchical continuous aggregates (1min -> 5min -> 1hour -> 1day)
+-- requests_1min is built from raw requests and every coarser tier from the tier below.
+-- The existing 5-minute and 1-hour views read raw requests, so they are replaced and
+-- backfilled from the raw data that is left. Views are kept as *_legacy, or as *_v005
+-- when that name is taken by migration 005: their history older than the raw retention
+-- only exists there. Migration 009 serves it through the history views.
+-- Apply to existing installs with:
+--   psql -U malti_user -d malti -f database/migrations/006_rollup_hierarchy.sql
+-- psql runs every statement in its own transaction, which the refresh calls require.
+
+DO $$
+DECLARE
+    view_name TEXT;
+BEGIN
+    FOREACH view_name IN ARRAY ARRAY['requests_5min', 'requests_1hour'] LOOP
+        PERFORM remove_continuous_aggregate_policy(view_name, if_exists => TRUE);
+        IF to_regclass(view_name || '_legacy') IS NULL THEN
+            EXECUTE format('ALTER MATERIALIZED VIEW %I RENAME TO %I', view_name, view_name || '_legacy');
+        ELSE
+            EXECUTE format('ALTER MATERIALIZED VIEW %I RENAME TO %I', view_name, view_name || '_v005');
+        END IF;
+    END LOOP;
+END $$;
+
+-- Create the continuous aggregate hierarchy
+-- Only the 1-minute tier reads raw requests; every coarser tier is built from the tier
+-- below it, so each refresh only re-aggregates a few already aggregated rows. Counts
+-- and sums add up, min and max combine, and histograms merge, so every tier is exact
+-- with respect to the tier below.
+
+-- 1-minute aggregates from raw requests
+-- Real-time aggregation adds not yet materialized raw rows, so realtime queries stay current
+CREATE MATERIALIZED VIEW IF NOT EXISTS requests_1min
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+    service,
+    node,
+    method,
+    endpoint,
+    consumer,
+    context,
+    status,
+    time_bucket('1 minute', created_at) AS bucket,
+    COUNT(*) as count_requests,
+    MIN(response_time) as min_response_time,
+    MAX(response_time) as max_response_time,
+    SUM(response_time)::bigint as sum_response_time,
+    AVG(response_time)::double precision as avg_response_time,
+    -- 128 bins over ln(1 + ms) in [0, ln(1 + 600000)); merge with malti_hist_merge
+    histogram(ln(1 + response_time::double precision), 0, ln(600001), 128)::bigint[] as latency_histogram
+FROM requests
+GROUP BY service, node, method, endpoint, consumer, context, status, time_bucket('1 minute', created_at)
+WITH NO DATA;
+
+-- 5-minute aggregates from 1-minute aggregates
+CREATE MATERIALIZED VIEW IF NOT EXISTS requests_5min
+WITH (timescaledb.continuous) AS
+SELECT
+    service,
+    node,
+    method,
+    endpoint,
+    consumer,
+    context,
+    status,
+    time_bucket('5 minutes', bucket) AS bucket,
+    SUM(count_requests)::bigint as count_requests,
+    MIN(min_response_time) as min_response_time,
+    MAX(max_response_time) as max_response_time,
+    SUM(sum_response_time)::bigint as sum_response_time,
+    SUM(sum_response_time)::double precision / SUM(count_requests) as avg_response_time,
+    malti_hist_merge(latency_histogram) as latency_histogram
+FROM requests_1min
+GROUP BY service, node, method, endpoint, consumer, context, status, time_bucket('5 minutes', bucket)
+WITH NO DATA;
+
+-- 1-hour aggregates from 5-minute aggregates
+CREATE MATERIALIZED VIEW IF NOT EXISTS requests_1hour
+WITH (timescaledb.continuous) AS
+SELECT
+    service,
+    node,
+    method,
+    endpoint,
+    consumer,
+    context,
+    status,
+    time_bucket('1 hour', bucket) AS bucket,
+    SUM(count_requests)::bigint as count_requests,
+    MIN(min_response_time) as min_response_time,
+    MAX(max_response_time) as max_response_time,
+    SUM(sum_response_time)::bigint as sum_response_time,
+    SUM(sum_response_time)::double precision / SUM(count_requests) as avg_response_time,
+    malti_hist_merge(latency_histogram) as latency_histogram
+FROM requests_5min
+GROUP BY service, node, method, endpoint, consumer, context, status, time_bucket('1 hour', bucket)
+WITH NO DATA;
+
+-- 1-day aggregates from 1-hour aggregates
+CREATE MATERIALIZED VIEW IF NOT EXISTS requests_1day
+WITH (timescaledb.continuous) AS
+SELECT
+    service,
+    node,
+    method,
+    endpoint,
+    consumer,
+    context,
+    status,
+    time_bucket('1 day', bucket) AS bucket,
+    SUM(count_requests)::bigint as count_requests,
+    MIN(min_response_time) as min_response_time,
+    MAX(max_response_time) as max_response_time,
+    SUM(sum_response_time)::bigint as sum_response_time,
+    SUM(sum_response_time)::double precision / SUM(count_requests) as avg_response_time,
+    malti_hist_merge(latency_histogram) as latency_histogram
+FROM requests_1hour
+GROUP BY service, node, method, endpoint, consumer, context, status, time_bucket('1 day', bucket)
+WITH NO DATA;
+
+SELECT add_retention_policy('requests_1min', INTERVAL '14 days');
+SELECT add_retention_policy('requests_5min', INTERVAL '90 days');
+SELECT add_retention_policy('requests_1hour', INTERVAL '720 days');
+SELECT add_retention_policy('requests_1day', INTERVAL '1825 days');
+
+SELECT add_continuous_aggregate_policy('requests_1min',
+    start_offset => INTERVAL '3 hours',
+    end_offset => INTERVAL '0',
+    schedule_interval => INTERVAL '30 minutes');
+
+SELECT add_continuous_aggregate_policy('requests_5min',
+    start_offset => INTERVAL '3 hours',
+    end_offset => INTERVAL '0',
+    schedule_interval => INTERVAL '1 hour');
+
+SELECT add_continuous_aggregate_policy('requests_1hour',
+    start_offset => INTERVAL '1 day',
+    end_offset => INTERVAL '0',
+    schedule_interval => INTERVAL '6 hours');
+
+SELECT add_continuous_aggregate_policy('requests_1day',
+    start_offset => INTERVAL '3 days',
+    end_offset => INTERVAL '0',
+    schedule_interval => INTERVAL '1 day');
+
+ALTER MATERIALIZED VIEW requests_1min SET (
+    timescaledb.compress = true,
+    timescaledb.compress_segmentby = 'service, endpoint',
+    timescaledb.compress_orderby = 'bucket DESC'
+);
+
+ALTER MATERIALIZED VIEW requests_5min SET (
+    timescaledb.compress = true,
+    timescaledb.compress_segmentby = 'service, endpoint',
+    timescaledb.compress_orderby = 'bucket DESC'
+);
+
+ALTER MATERIALIZED VIEW requests_1hour SET (
+    timescaledb.compress = true,
+    timescaledb.compress_segmentby = 'service, endpoint',
+    timescaledb.compress_orderby = 'bucket DESC'
+);
+
+ALTER MATERIALIZED VIEW requests_1day SET (
+    timescaledb.compress = true,
+    timescaledb.compress_segmentby = 'service, endpoint',
+    timescaledb.compress_orderby = 'bucket DESC'
+);
+
+SELECT add_compression_policy('requests_1min', compress_after => INTERVAL '1 day');
+SELECT add_compression_policy('requests_5min', compress_after => INTERVAL '1 day');
+SELECT add_compression_policy('requests_1hour', compress_after => INTERVAL '7 days');
+SELECT add_compression_policy('requests_1day', compress_after => INTERVAL '30 days');
+
+-- Backfill bottom-up from the remaining raw data
+CALL refresh_continuous_aggregate('requests_1min', NULL, NULL);
+CALL refresh_continuous_aggregate('requests_5min', NULL, NULL);
+CALL refresh_continuous_aggregate('requests_1hour', NULL, NULL);
+CALL refresh_continuous_aggregate('requests_1day', NULL, NULL);
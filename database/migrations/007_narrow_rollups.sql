@@ -0,0 +1,76 @@
+-- Migration 007: narrow rollups of the 5-minute, 1-hour and 1-day tiers
+-- Adds service x status, service x consumer x status and service x endpoint x method x
+-- status rollups, each built from the full rollup of its tier, and backfills them from
+-- the full rollups, so they cover the same history.
+-- Apply to existing installs with:
+--   psql -U malti_user -d malti -f database/migrations/007_narrow_rollups.sql
+-- psql runs every statement in its own transaction, which the refresh calls require.
+
+DO $$
+DECLARE
+    -- suffix, dimensions, compression segments
+    families TEXT[] := ARRAY[
+        ['by_service', 'service, status', 'service'],
+        ['by_consumer', 'service, consumer, status', 'service, consumer'],
+        ['by_endpoint', 'service, endpoint, method, status', 'service, endpoint']
+    ];
+    -- full rollup, bucket, retention, refresh start offset, refresh schedule, compress after
+    tiers TEXT[] := ARRAY[
+        ['requests_5min', '5 minutes', '90 days', '3 hours', '1 hour', '1 day'],
+        ['requests_1hour', '1 hour', '720 days', '1 day', '6 hours', '7 days'],
+        ['requests_1day', '1 day', '1825 days', '3 days', '1 day', '30 days']
+    ];
+    rollup TEXT;
+BEGIN
+    FOR t IN 1..array_length(tiers, 1) LOOP
+        FOR f IN 1..array_length(families, 1) LOOP
+            rollup := tiers[t][1] || '_' || families[f][1];
+
+            EXECUTE format(
+                'CREATE MATERIALIZED VIEW IF NOT EXISTS %I
+                WITH (timescaledb.continuous) AS
+                SELECT
+                    %s,
+                    time_bucket(%L, bucket) AS bucket,
+                    SUM(count_requests)::bigint as count_requests,
+                    MIN(min_response_time) as min_response_time,
+                    MAX(max_response_time) as max_response_time,
+                    SUM(sum_response_time)::bigint as sum_response_time,
+                    SUM(sum_response_time)::double precision / SUM(count_requests) as avg_response_time,
+                    malti_hist_merge(latency_histogram) as latency_histogram
+                FROM %I
+                GROUP BY %s, time_bucket(%L, bucket)
+                WITH NO DATA',
+                rollup, families[f][2], tiers[t][2], tiers[t][1], families[f][2], tiers[t][2]
+            );
+
+            PERFORM add_retention_policy(rollup, tiers[t][3]::interval, if_not_exists => TRUE);
+            PERFORM add_continuous_aggregate_policy(rollup,
+                start_offset => tiers[t][4]::interval,
+                end_offset => INTERVAL '0',
+                schedule_interval => tiers[t][5]::interval,
+                if_not_exists => TRUE);
+
+            EXECUTE format(
+                'ALTER MATERIALIZED VIEW %I SET (
+                    timescaledb.compress = true,
+                    timescaledb.compress_segmentby = %L,
+                    timescaledb.compress_orderby = %L
+                )',
+                rollup, families[f][3], 'bucket DESC'
+            );
+            PERFORM add_compression_policy(rollup, compress_after => tiers[t][6]::interval, if_not_exists => TRUE);
+        END LOOP;
+    END LOOP;
+END $$;
+
+-- Backfill from the full rollups
+CALL refresh_continuous_aggregate('requests_5min_by_service', NULL, NULL);
+CALL refresh_continuous_aggregate('requests_5min_by_consumer', NULL, NULL);
+CALL refresh_continuous_aggregate('requests_5min_by_endpoint', NULL, NULL);
+CALL refresh_continuous_aggregate('requests_1hour_by_service', NULL, NULL);
+CALL refresh_continuous_aggregate('requests_1hour_by_consumer', NULL, NULL);
+CALL refresh_continuous_aggregate('requests_1hour_by_endpoint', NULL, NULL);
+CALL refresh_continuous_aggregate('requests_1day_by_service', NULL, NULL);
+CALL refresh_continuous_aggregate('requests_1day_by_consumer', NULL, NULL);
+CALL refresh_continuous_aggregate('requests_1day_by_endpoint', NULL, NULL);
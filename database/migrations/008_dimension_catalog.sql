@@ -0,0 +1,45 @@
+-- Migration 008: dimension catalog
+-- Creates dimension_catalog and backfills it from the 1-hour rollup, whose retention
+-- covers the longest history at row level, and then from the 1-minute rollup, which
+-- includes raw requests that are not materialized yet. Backfilled first_seen and
+-- last_seen are bucket starts; later ingest records exact timestamps.
+-- Apply to existing installs with:
+--   psql -U malti_user -d malti -f database/migrations/008_dimension_catalog.sql
+
+-- Create the dimension catalog
+-- First and last time every dimension value was seen, per service. Maintained by the
+-- ingest path (see app/services/dimension_catalog.py) and searched by prefix for the
+-- dashboard filters, so no DISTINCT scan over requests is needed.
+CREATE TABLE IF NOT EXISTS dimension_catalog (
+    dimension TEXT NOT NULL,
+    service TEXT NOT NULL,
+    value TEXT NOT NULL,
+    first_seen TIMESTAMPTZ NOT NULL,
+    last_seen TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (dimension, service, value)
+);
+
+-- Prefix search across services; LIKE 'prefix%' needs text_pattern_ops under non-C collations
+CREATE INDEX IF NOT EXISTS idx_dimension_catalog_prefix ON dimension_catalog (dimension, value text_pattern_ops);
+
+DO $$
+DECLARE
+    dimension_name TEXT;
+    source_name TEXT;
+BEGIN
+    FOREACH source_name IN ARRAY ARRAY['requests_1hour', 'requests_1min'] LOOP
+        FOREACH dimension_name IN ARRAY ARRAY['service', 'node', 'method', 'endpoint', 'consumer', 'context'] LOOP
+            EXECUTE format(
+                'INSERT INTO dimension_catalog (dimension, service, value, first_seen, last_seen)
+                SELECT %L, service, %I, MIN(bucket), MAX(bucket)
+                FROM %I
+                WHERE %I IS NOT NULL
+                GROUP BY service, %I
+                ON CONFLICT (dimension, service, value) DO UPDATE SET
+                    first_seen = LEAST(dimension_catalog.first_seen, EXCLUDED.first_seen),
+                    last_seen = GREATEST(dimension_catalog.last_seen, EXCLUDED.last_seen)',
+                dimension_name, dimension_name, source_name, dimension_name, dimension_name
+            );
+        END LOOP;
+    END LOOP;
+END $$;
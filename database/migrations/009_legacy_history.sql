@@ -0,0 +1,86 @@
+-- Migration 009: serve history from before migration 005 out of the old views
+-- Migrations 005 and 006 rebuilt the 5-minute and 1-hour aggregates from the raw data
+-- that was left, so their history older than the raw retention only exists in the views
+-- they renamed: requests_*_legacy from before 005 and, when 005 and 006 were applied
+-- apart, requests_*_v005 from in between. Those rows cannot be backfilled: continuous
+-- aggregates only materialize from their source, and the legacy rows hold a P95 instead
+-- of a latency histogram. Instead, every tier gets a history view with the measures of
+-- the new rollups, reading the _v005 view and, before its first bucket, the legacy one.
+-- It is registered in rollup_history with the first full day the new aggregates hold.
+-- Queries read ranges before that day from the history view (see
+-- app/services/rollups.py); latency percentiles are not available for legacy rows.
+-- 1-day queries read the 1-hour history.
+-- Apply to existing installs with:
+--   psql -U malti_user -d malti -f database/migrations/009_legacy_history.sql
+
+-- Tiers whose history before ends_at is read from history_view
+CREATE TABLE IF NOT EXISTS rollup_history (
+    tier TEXT PRIMARY KEY,
+    history_view TEXT NOT NULL,
+    ends_at TIMESTAMPTZ NOT NULL
+);
+
+DO $$
+DECLARE
+    tier_name TEXT;
+    source_name TEXT;
+    history_name TEXT;
+    parts TEXT[];
+    ends_at TIMESTAMPTZ;
+BEGIN
+    FOREACH tier_name IN ARRAY ARRAY['requests_5min', 'requests_1hour', 'requests_1day'] LOOP
+        source_name := CASE tier_name WHEN 'requests_5min' THEN 'requests_5min' ELSE 'requests_1hour' END;
+        history_name := source_name || '_history';
+        parts := ARRAY[]::TEXT[];
+
+        -- The sums are rebuilt from the averages
+        IF to_regclass(source_name || '_v005') IS NOT NULL THEN
+            parts := parts || format($part$
+                SELECT
+                    service, node, method, endpoint, consumer, context, status, bucket,
+                    count_requests,
+                    min_response_time,
+                    max_response_time,
+                    round(avg_response_time * count_requests)::bigint as sum_response_time,
+                    avg_response_time::double precision as avg_response_time,
+                    latency_histogram
+                FROM %I
+            $part$, source_name || '_v005');
+        END IF;
+        -- Legacy rows have no histogram, and are only read before the _v005 history
+        IF to_regclass(source_name || '_legacy') IS NOT NULL THEN
+            parts := parts || format($part$
+                SELECT
+                    service, node, method, endpoint, consumer, context, status, bucket,
+                    count_requests,
+                    min_response_time,
+                    max_response_time,
+                    round(avg_response_time * count_requests)::bigint as sum_response_time,
+                    avg_response_time::double precision as avg_response_time,
+                    NULL::bigint[] as latency_histogram
+                FROM %I
+                %s
+            $part$, source_name || '_legacy', CASE WHEN to_regclass(source_name || '_v005') IS NULL THEN ''
+                ELSE format('WHERE bucket < (SELECT COALESCE(MIN(bucket), ''infinity'') FROM %I)', source_name || '_v005') END);
+        END IF;
+        CONTINUE WHEN cardinality(parts) = 0;
+
+        EXECUTE format('CREATE OR REPLACE VIEW %I AS %s', history_name, array_to_string(parts, ' UNION ALL '));
+
+        -- The first day of the new aggregate may be cut by the raw retention
+        EXECUTE format('SELECT time_bucket(''1 day'', COALESCE(MIN(bucket), now())) + INTERVAL ''1 day'' FROM %I', tier_name)
+            INTO ends_at;
+        INSERT INTO rollup_history (tier, history_view, ends_at)
+        VALUES (tier_name, history_name, ends_at)
+        ON CONFLICT (tier) DO NOTHING;
+    END LOOP;
+END $$;
+
+-- Once the old history is no longer needed:
+--   TRUNCATE rollup_history;
+--   DROP VIEW requests_5min_history;
+--   DROP VIEW requests_1hour_history;
+--   DROP MATERIALIZED VIEW IF EXISTS requests_5min_v005;
+--   DROP MATERIALIZED VIEW IF EXISTS requests_1hour_v005;
+--   DROP MATERIALIZED VIEW IF EXISTS requests_5min_legacy;
+--   DROP MATERIALIZED VIEW IF EXISTS requests_1hour_legacy;
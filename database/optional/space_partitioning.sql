@@ -0,0 +1,35 @@
+-- Optional: hash space partitioning of the requests hypertable by service
+--
+-- Adds a second (space) dimension so every time chunk is split into hash partitions
+-- on service. Queries filtered to one service then only touch that service's
+-- partition instead of chunks dominated by the biggest service.
+--
+-- TimescaleDB can only add a dimension while the hypertable is empty, so this must
+-- run right after init.sql on a fresh database. With Docker, mount it next to
+-- init.sql so the entrypoint runs it second:
+--   - ./database/optional/space_partitioning.sql:/docker-entrypoint-initdb.d/init_space_partitioning.sql
+--
+-- Use GET /api/v1/admin/chunk-advisor to pick the number of partitions and the
+-- chunk interval. Override the default of 4 partitions with:
+--   psql -v service_partitions=8 -f database/optional/space_partitioning.sql
+
+\if :{?service_partitions}
+\else
+\set service_partitions 4
+\endif
+
+-- init.sql already enabled compression on requests, and a dimension cannot be added to
+-- a hypertable with compression enabled. The table is still empty, so there are no
+-- compressed chunks: drop the compression policy, disable compression, add the
+-- dimension, then restore the settings and policy of init.sql.
+SELECT remove_compression_policy('requests', if_exists => TRUE);
+ALTER TABLE requests SET (timescaledb.compress = false);
+
+SELECT add_dimension('requests', by_hash('service', :service_partitions));
+
+ALTER TABLE requests SET (
+    timescaledb.compress,
+    timescaledb.compress_segmentby = 'service, endpoint',
+    timescaledb.compress_orderby = 'created_at DESC'
+);
+SELECT add_compression_policy('requests', compress_after => INTERVAL '1 day');
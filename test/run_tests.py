@@ -10,6 +10,7 @@ from datetime import datetime
 from test_health import TestHealthEndpoints
 from test_ingest import TestIngestEndpoint
 from test_metrics import TestMetricsEndpoints
+from test_admin import TestAdminEndpoints
 
 def main():
     """Run the complete test suite"""
@@ -51,6 +52,12 @@ def main():
     metrics_success = metrics_tester.run_all_tests()
     all_results.extend(metrics_tester.test_results)
     
+    # Run admin tests
+    print("\n4️⃣  ADMIN ENDPOINTS")
+    admin_tester = TestAdminEndpoints()
+    admin_success = admin_tester.run_all_tests()
+    all_results.extend(admin_tester.test_results)
+    
     # Calculate overall results
     end_time = time.time()
     duration = end_time - start_time
@@ -0,0 +1,273 @@
+"""
+Test suite for the admin endpoints
+"""
+import requests
+from test_config import (
+    ADMIN_COMPRESSION_ENDPOINT,
+    ADMIN_CHUNK_ADVISOR_ENDPOINT,
+    ADMIN_REFRESH_ENDPOINT,
+    ADMIN_CACHE_ENDPOINT,
+    ADMIN_QUERIES_ENDPOINT,
+    ADMIN_POOLS_ENDPOINT,
+    METRICS_AGGREGATE_ENDPOINT,
+    VALID_USER_API_KEYS,
+    VALID_SERVICE_API_KEYS
+)
+
+class TestAdminEndpoints:
+    """Test cases for the /api/v1/admin/* endpoints"""
+    
+    def __init__(self):
+        self.session = requests.Session()
+        self.test_results = []
+    
+    def log_test(self, test_name: str, success: bool, message: str = ""):
+        """Log test result"""
+        status = "✅ PASS" if success else "❌ FAIL"
+        print(f"{status} {test_name}: {message}")
+        self.test_results.append({
+            "test": test_name,
+            "success": success,
+            "message": message
+        })
+    
+    def test_compression_stats(self):
+        """Test compression statistics with a valid user API key"""
+        print("\n🔍 Testing compression statistics...")
+        
+        api_key = list(VALID_USER_API_KEYS.values())[0]
+        headers = {"X-API-Key": api_key}
+        
+        try:
+            response = self.session.get(ADMIN_COMPRESSION_ENDPOINT, headers=headers)
+            
+            if response.status_code == 200:
+                data = response.json()
+                names = [relation.get('name') for relation in data.get('relations', [])]
+                
+                if 'requests' in names:
+                    self.log_test(
+                        "Compression stats",
+                        True,
+                        f"Retrieved compression stats for {len(names)} relations"
+                    )
+                else:
+                    self.log_test("Compression stats", False, f"requests hypertable missing: {data}")
+            else:
+                self.log_test(
+                    "Compression stats",
+                    False,
+                    f"Status {response.status_code}: {response.text}"
+                )
+                
+        except Exception as e:
+            self.log_test("Compression stats", False, f"Exception: {str(e)}")
+    
+    def test_chunk_advisor(self):
+        """Test chunk sizing advice with a valid user API key"""
+        print("\n🔍 Testing chunk sizing advisor...")
+        
+        api_key = list(VALID_USER_API_KEYS.values())[0]
+        headers = {"X-API-Key": api_key}
+        
+        try:
+            response = self.session.get(ADMIN_CHUNK_ADVISOR_ENDPOINT, headers=headers)
+            
+            if response.status_code == 200:
+                data = response.json()
+                
+                if data.get('recommended_chunk_interval_seconds', 0) > 0 and data.get('recommended_service_partitions', 0) >= 1:
+                    self.log_test(
+                        "Chunk advisor",
+                        True,
+                        f"Recommended {data['recommended_chunk_interval_seconds']}s chunks with {data['recommended_service_partitions']} partitions"
+                    )
+                else:
+                    self.log_test("Chunk advisor", False, f"Invalid response structure: {data}")
+            else:
+                self.log_test(
+                    "Chunk advisor",
+                    False,
+                    f"Status {response.status_code}: {response.text}"
+                )
+                
+        except Exception as e:
+            self.log_test("Chunk advisor", False, f"Exception: {str(e)}")
+    
+    def test_refresh_stats(self):
+        """Test targeted refresh statistics with a valid user API key"""
+        print("\n🔍 Testing refresh statistics...")
+        
+        api_key = list(VALID_USER_API_KEYS.values())[0]
+        headers = {"X-API-Key": api_key}
+        
+        try:
+            response = self.session.get(ADMIN_REFRESH_ENDPOINT, headers=headers)
+            
+            if response.status_code == 200:
+                data = response.json()
+                views = [view.get('view') for view in data.get('views', [])]
+                
+                if views and 'cycles' in data:
+                    self.log_test("Refresh stats", True, f"Retrieved refresh stats for {views}")
+                else:
+                    self.log_test("Refresh stats", False, f"Invalid response structure: {data}")
+            else:
+                self.log_test(
+                    "Refresh stats",
+                    False,
+                    f"Status {response.status_code}: {response.text}"
+                )
+                
+        except Exception as e:
+            self.log_test("Refresh stats", False, f"Exception: {str(e)}")
+    
+    def test_cache_stats(self):
+        """Test that repeated identical metrics queries are served from the result cache"""
+        print("\n🔍 Testing metrics result cache...")
+        
+        api_key = list(VALID_USER_API_KEYS.values())[0]
+        headers = {"X-API-Key": api_key}
+        
+        try:
+            before = self.session.get(ADMIN_CACHE_ENDPOINT, headers=headers).json()
+            for _ in range(3):
+                self.session.get(METRICS_AGGREGATE_ENDPOINT, headers=headers)
+            after = self.session.get(ADMIN_CACHE_ENDPOINT, headers=headers).json()
+            
+            if 'series' not in after:
+                self.log_test("Cache stats", False, f"Missing series cache stats: {after}")
+            elif not after.get('enabled'):
+                self.log_test("Cache stats", True, "Result cache is disabled")
+            elif after['hits'] + after['shared'] >= before['hits'] + before['shared'] + 2:
+                self.log_test("Cache stats", True, f"Repeated queries hit the cache: {after}")
+            else:
+                self.log_test("Cache stats", False, f"Expected cache hits, got before={before} after={after}")
+                
+        except Exception as e:
+            self.log_test("Cache stats", False, f"Exception: {str(e)}")
+        
+        try:
+            response = self.session.delete(ADMIN_CACHE_ENDPOINT, headers=headers)
+            
+            if response.status_code == 200:
+                self.log_test("Cache clear", True, f"Cleared cache: {response.json()}")
+            else:
+                self.log_test("Cache clear", False, f"Status {response.status_code}: {response.text}")
+                
+        except Exception as e:
+            self.log_test("Cache clear", False, f"Exception: {str(e)}")
+    
+    def test_query_stats(self):
+        """Test that metrics statements are reported with their timings"""
+        print("\n🔍 Testing query statistics...")
+        
+        api_key = list(VALID_USER_API_KEYS.values())[0]
+        headers = {"X-API-Key": api_key}
+        
+        try:
+            # A filter value that is never cached, so a statement runs
+            self.session.get(METRICS_AGGREGATE_ENDPOINT, headers=headers, params={"consumer": "query-stats-test"})
+            response = self.session.get(ADMIN_QUERIES_ENDPOINT, headers=headers)
+            
+            if response.status_code == 200:
+                data = response.json()
+                if data['statements'] >= 1 and data['slowest'] and data['outcomes'].get('executed', 0) >= 1:
+                    self.log_test("Query stats", True, f"{data['statements']} canonical statements, slowest: {data['slowest'][0]}")
+                else:
+                    self.log_test("Query stats", False, f"Invalid response structure: {data}")
+            else:
+                self.log_test("Query stats", False, f"Status {response.status_code}: {response.text}")
+                
+        except Exception as e:
+            self.log_test("Query stats", False, f"Exception: {str(e)}")
+    
+    def test_pool_stats(self):
+        """Test that ingest and queries are reported as separate connection pools"""
+        print("\n🔍 Testing connection pool statistics...")
+        
+        api_key = list(VALID_USER_API_KEYS.values())[0]
+        headers = {"X-API-Key": api_key}
+        
+        try:
+            self.session.get(METRICS_AGGREGATE_ENDPOINT, headers=headers)
+            response = self.session.get(ADMIN_POOLS_ENDPOINT, headers=headers)
+            
+            if response.status_code == 200:
+                pools = {pool['name']: pool for pool in response.json().get('pools', [])}
+                if set(pools) == {'ingest', 'query'} and pools['query']['checkouts'] >= 1:
+                    self.log_test("Pool stats", True, f"Query pool waits: avg {pools['query']['avg_wait_ms']:.2f} ms")
+                else:
+                    self.log_test("Pool stats", False, f"Invalid response structure: {response.json()}")
+            else:
+                self.log_test("Pool stats", False, f"Status {response.status_code}: {response.text}")
+                
+        except Exception as e:
+            self.log_test("Pool stats", False, f"Exception: {str(e)}")
+    
+    def test_admin_authentication(self):
+        """Test that admin endpoints reject missing and service API keys"""
+        print("\n🔍 Testing admin endpoint authentication...")
+        
+        try:
+            response = self.session.get(ADMIN_COMPRESSION_ENDPOINT)
+            
+            if response.status_code == 401:
+                self.log_test("Admin missing API key", True, "Correctly rejected")
+            else:
+                self.log_test(
+                    "Admin missing API key",
+                    False,
+                    f"Expected 401, got {response.status_code}: {response.text}"
+                )
+                
+        except Exception as e:
+            self.log_test("Admin missing API key", False, f"Exception: {str(e)}")
+        
+        service_name, api_key = list(VALID_SERVICE_API_KEYS.items())[0]
+        
+        try:
+            response = self.session.get(ADMIN_COMPRESSION_ENDPOINT, headers={"X-API-Key": api_key})
+            
+            if response.status_code == 403:
+                self.log_test(f"Admin service API key '{service_name}' rejected", True, "Correctly rejected")
+            else:
+                self.log_test(
+                    f"Admin service API key '{service_name}' rejected",
+                    False,
+                    f"Expected 403, got {response.status_code}: {response.text}"
+                )
+                
+        except Exception as e:
+            self.log_test(f"Admin service API key '{service_name}' rejected", False, f"Exception: {str(e)}")
+    
+    def run_all_tests(self):
+        """Run all admin endpoint tests"""
+        print("🚀 Starting Admin Endpoints Tests")
+        print("=" * 50)
+        
+        self.test_compression_stats()
+        self.test_chunk_advisor()
+        self.test_refresh_stats()
+        self.test_cache_stats()
+        self.test_query_stats()
+        self.test_pool_stats()
+        self.test_admin_authentication()
+        
+        # Summary
+        passed = sum(1 for result in self.test_results if result["success"])
+        total = len(self.test_results)
+        
+        print("\n" + "=" * 50)
+        print(f"📊 Admin Tests Summary: {passed}/{total} passed")
+        
+        if passed == total:
+            print("🎉 All admin tests passed!")
+        else:
+            print("⚠️  Some admin tests failed!")
+            
+        return passed == total
+
+if __name__ == "__main__":
+    tester = TestAdminEndpoints()
+    tester.run_all_tests()
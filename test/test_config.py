@@ -164,6 +164,17 @@ SAMPLE_TELEMETRY_DATA = generate_sample_telemetry_data()
 INGEST_ENDPOINT = f"{BASE_URL}{INGEST_PATH}"
 METRICS_AGGREGATE_ENDPOINT = f"{BASE_URL}{METRICS_PATH}/aggregate"
 METRICS_REALTIME_ENDPOINT = f"{BASE_URL}{METRICS_PATH}/aggregate/realtime"
+METRICS_EXEMPLARS_ENDPOINT = f"{BASE_URL}{METRICS_PATH}/exemplars"
+METRICS_PANELS_ENDPOINT = f"{BASE_URL}{METRICS_PATH}/panels"
+METRICS_DIMENSIONS_ENDPOINT = f"{BASE_URL}{METRICS_PATH}/dimensions"
+METRICS_STREAM_ENDPOINT = f"{BASE_URL}{METRICS_PATH}/stream"
+ADMIN_COMPRESSION_ENDPOINT = f"{BASE_URL}{API_V1_PREFIX}/admin/compression"
+ADMIN_CHUNK_ADVISOR_ENDPOINT = f"{BASE_URL}{API_V1_PREFIX}/admin/chunk-advisor"
+ADMIN_REFRESH_ENDPOINT = f"{BASE_URL}{API_V1_PREFIX}/admin/refresh"
+ADMIN_CACHE_ENDPOINT = f"{BASE_URL}{API_V1_PREFIX}/admin/cache"
+ADMIN_STREAM_ENDPOINT = f"{BASE_URL}{API_V1_PREFIX}/admin/stream"
+ADMIN_QUERIES_ENDPOINT = f"{BASE_URL}{API_V1_PREFIX}/admin/queries"
+ADMIN_POOLS_ENDPOINT = f"{BASE_URL}{API_V1_PREFIX}/admin/pools"
 HEALTH_ENDPOINT = f"{BASE_URL}/health"
 ROOT_ENDPOINT = f"{BASE_URL}/"
 
@@ -1,8 +1,9 @@
 """
 Test suite for health and basic endpoints
 """
+import re
 import requests
-from test_config import HEALTH_ENDPOINT, ROOT_ENDPOINT
+from test_config import BASE_URL, HEALTH_ENDPOINT, ROOT_ENDPOINT
 
 class TestHealthEndpoints:
     """Test cases for health and basic endpoints"""
@@ -59,6 +60,31 @@ class TestHealthEndpoints:
         except Exception as e:
             self.log_test("Root endpoint", False, f"Exception: {str(e)}")
     
+    def test_static_caching(self):
+        """Test cache headers and precompressed variants of the dashboard assets"""
+        print("\n🔍 Testing static asset caching...")
+        
+        try:
+            response = self.session.get(ROOT_ENDPOINT, headers={"Accept-Encoding": "gzip, br"})
+            if response.headers.get("Cache-Control") != "no-cache":
+                self.log_test("Dashboard index caching", False, f"Cache-Control: {response.headers.get('Cache-Control')}")
+                return
+            self.log_test("Dashboard index caching", True, "index.html is revalidated")
+            
+            assets = re.findall(r'(/static/assets/[^"]+\.js)', response.text)
+            if not assets:
+                self.log_test("Dashboard asset caching", True, "Dashboard not built, no assets to check")
+                return
+            
+            asset = self.session.get(f"{BASE_URL}{assets[0]}", headers={"Accept-Encoding": "gzip, br"})
+            if asset.status_code == 200 and "immutable" in asset.headers.get("Cache-Control", "") \
+                    and asset.headers.get("Content-Encoding") in ("gzip", "br"):
+                self.log_test("Dashboard asset caching", True, f"{assets[0]} is immutable and {asset.headers['Content-Encoding']} encoded")
+            else:
+                self.log_test("Dashboard asset caching", False, f"Status {asset.status_code}, headers {dict(asset.headers)}")
+                
+        except Exception as e:
+            self.log_test("Static asset caching", False, f"Exception: {str(e)}")
     
     def run_all_tests(self):
         """Run all health endpoint tests"""
@@ -67,6 +93,7 @@ class TestHealthEndpoints:
         
         self.test_health_endpoint()
         self.test_root_endpoint()
+        self.test_static_caching()
         
         # Summary
         passed = sum(1 for result in self.test_results if result["success"])
@@ -3,15 +3,27 @@ Test suite for the metrics endpoints
 """
 import requests
 import json
+import time
 from datetime import datetime, timedelta
 from test_config import (
     METRICS_AGGREGATE_ENDPOINT,
     METRICS_REALTIME_ENDPOINT,
+    METRICS_EXEMPLARS_ENDPOINT,
+    METRICS_PANELS_ENDPOINT,
+    METRICS_DIMENSIONS_ENDPOINT,
+    METRICS_STREAM_ENDPOINT,
+    INGEST_ENDPOINT,
+    ADMIN_CACHE_ENDPOINT,
+    ADMIN_REFRESH_ENDPOINT,
+    ADMIN_STREAM_ENDPOINT,
     VALID_USER_API_KEYS,
     INVALID_API_KEYS,
     VALID_SERVICE_API_KEYS
 )
 
+# Longer than the default CAGG_REFRESH_INTERVAL_SECONDS, so one targeted refresh cycle runs
+REFRESH_WAIT_SECONDS = 20
+
 class TestMetricsEndpoints:
     """Test cases for the /api/v1/metrics/* endpoints"""
     
@@ -206,6 +218,7 @@ class TestMetricsEndpoints:
             {"endpoint": "/api/v1/login"},
             {"consumer": "web-app"},
             {"interval": "1hour"},
+            {"interval": "1day"},
             {"service": "auth-service", "method": "POST"},
         ]
 
@@ -559,6 +572,758 @@ class TestMetricsEndpoints:
             except Exception as e:
                 self.log_test(f"Realtime service API key '{service_name}' rejected", False, f"Exception: {str(e)}")
     
+    def test_exemplars_endpoint(self):
+        """Test the exemplar drill-down endpoint"""
+        print("\n🔍 Testing exemplar drill-down endpoint...")
+
+        # Use the first valid user API key
+        api_key = list(VALID_USER_API_KEYS.values())[0]
+        headers = {"X-API-Key": api_key}
+        service_name = list(VALID_SERVICE_API_KEYS.keys())[0]
+
+        try:
+            response = self.session.get(METRICS_EXEMPLARS_ENDPOINT, headers=headers, params={"service": service_name})
+
+            if response.status_code == 200:
+                data = response.json()
+                if isinstance(data.get('buckets'), list) and data.get('service') == service_name:
+                    exemplar_count = sum(len(bucket['exemplars']) for bucket in data['buckets'])
+                    self.log_test(
+                        "Exemplars drill-down",
+                        True,
+                        f"Retrieved {len(data['buckets'])} hourly buckets with {exemplar_count} exemplars"
+                    )
+                else:
+                    self.log_test("Exemplars drill-down", False, f"Invalid response structure: {data}")
+            else:
+                self.log_test(
+                    "Exemplars drill-down",
+                    False,
+                    f"Status {response.status_code}: {response.text}"
+                )
+
+        except Exception as e:
+            self.log_test("Exemplars drill-down", False, f"Exception: {str(e)}")
+
+        # The service parameter is required
+        try:
+            response = self.session.get(METRICS_EXEMPLARS_ENDPOINT, headers=headers)
+
+            if response.status_code == 422:
+                self.log_test("Exemplars missing service", True, "Correctly rejected with 422 status")
+            else:
+                self.log_test(
+                    "Exemplars missing service",
+                    False,
+                    f"Expected 422, got {response.status_code}: {response.text}"
+                )
+
+        except Exception as e:
+            self.log_test("Exemplars missing service", False, f"Exception: {str(e)}")
+    
+    def test_panel_selection(self):
+        """Test panels= selection and the per-panel endpoints"""
+        print("\n🧩 Testing panel selection...")
+
+        # Use the first valid user API key
+        api_key = list(VALID_USER_API_KEYS.values())[0]
+        headers = {"X-API-Key": api_key}
+
+        try:
+            params = {"panels": "time_series,metrics_summary"}
+            response = self.session.get(METRICS_AGGREGATE_ENDPOINT, headers=headers, params=params)
+
+            if response.status_code == 200:
+                data = response.json()
+                if (isinstance(data.get('time_series'), list) and data.get('metrics_summary')
+                        and data.get('endpoints') == [] and data.get('system_overview') is None):
+                    self.log_test("Aggregate with panels=", True, "Only the selected panels were computed")
+                else:
+                    self.log_test("Aggregate with panels=", False, f"Unexpected panels in response: {list(data.keys())}")
+            else:
+                self.log_test("Aggregate with panels=", False, f"Status {response.status_code}: {response.text}")
+
+        except Exception as e:
+            self.log_test("Aggregate with panels=", False, f"Exception: {str(e)}")
+
+        try:
+            response = self.session.get(METRICS_AGGREGATE_ENDPOINT, headers=headers, params={"panels": "not_a_panel"})
+
+            if response.status_code == 422:
+                self.log_test("Aggregate with invalid panel", True, "Correctly rejected with 422 status")
+            else:
+                self.log_test(
+                    "Aggregate with invalid panel",
+                    False,
+                    f"Expected 422, got {response.status_code}: {response.text}"
+                )
+
+        except Exception as e:
+            self.log_test("Aggregate with invalid panel", False, f"Exception: {str(e)}")
+
+        panel_endpoints = {
+            "time-series": list,
+            "summary": dict,
+            "endpoints": list,
+            "status-distribution": list,
+            "consumers": list,
+            "overview": dict,
+        }
+        for panel, expected_type in panel_endpoints.items():
+            try:
+                response = self.session.get(f"{METRICS_PANELS_ENDPOINT}/{panel}", headers=headers)
+
+                if response.status_code == 200 and isinstance(response.json(), expected_type):
+                    self.log_test(f"Panel endpoint '{panel}'", True, "Returned panel data")
+                else:
+                    self.log_test(f"Panel endpoint '{panel}'", False, f"Status {response.status_code}: {response.text}")
+
+            except Exception as e:
+                self.log_test(f"Panel endpoint '{panel}'", False, f"Exception: {str(e)}")
+    
+    def test_latency_percentiles(self):
+        """Test that latency percentiles are reported and ordered"""
+        print("\n📐 Testing latency percentiles...")
+
+        # Use the first valid user API key
+        api_key = list(VALID_USER_API_KEYS.values())[0]
+        headers = {"X-API-Key": api_key}
+
+        for interval in ("5min", "1hour", "1day"):
+            try:
+                response = self.session.get(
+                    METRICS_AGGREGATE_ENDPOINT, headers=headers, params={"interval": interval, "panels": "metrics_summary"}
+                )
+
+                if response.status_code != 200:
+                    self.log_test(f"Latency percentiles ({interval})", False, f"Status {response.status_code}: {response.text}")
+                    continue
+
+                summary = response.json()['metrics_summary']
+                percentiles = [summary.get(name) for name in ('p50_latency', 'p90_latency', 'p95_latency', 'p99_latency')]
+                if all(value is None for value in percentiles):
+                    self.log_test(f"Latency percentiles ({interval})", True, "No successful requests in range")
+                elif None not in percentiles and percentiles == sorted(percentiles) and \
+                        summary['min_latency'] <= percentiles[0] and percentiles[-1] <= summary['max_latency']:
+                    self.log_test(f"Latency percentiles ({interval})", True, f"p50/p90/p95/p99: {percentiles}")
+                else:
+                    self.log_test(f"Latency percentiles ({interval})", False, f"Inconsistent percentiles: {summary}")
+
+            except Exception as e:
+                self.log_test(f"Latency percentiles ({interval})", False, f"Exception: {str(e)}")
+
+    def test_narrow_rollups(self):
+        """Test that panels served by narrow rollups match the full rollup"""
+        print("\n🪄 Testing narrow rollups...")
+
+        # Use the first valid user API key
+        api_key = list(VALID_USER_API_KEYS.values())[0]
+        headers = {"X-API-Key": api_key}
+
+        # A closed range, so both requests see the same data
+        end_time = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+        params = {
+            "interval": "1hour",
+            "start_time": (end_time - timedelta(days=1)).isoformat(),
+            "end_time": end_time.isoformat()
+        }
+
+        try:
+            response = self.session.get(METRICS_AGGREGATE_ENDPOINT, headers=headers, params=params)
+            if response.status_code != 200:
+                self.log_test("Narrow rollups", False, f"Status {response.status_code}: {response.text}")
+                return
+
+            services = [item['service'] for item in response.json()['status_distribution']]
+            if not services:
+                self.log_test("Narrow rollups", True, "No requests in range")
+                return
+            params["service"] = services[0]
+
+            # The full dashboard includes the node and context lists, so it reads the full rollup
+            full = self.session.get(METRICS_AGGREGATE_ENDPOINT, headers=headers, params=params).json()
+            narrow = self.session.get(
+                METRICS_AGGREGATE_ENDPOINT,
+                headers=headers,
+                params={**params, "panels": "time_series,endpoints,consumers,status_distribution"}
+            ).json()
+
+            mismatched = [
+                panel for panel in ('endpoints', 'consumers', 'status_distribution')
+                if sorted(map(json.dumps, full[panel])) != sorted(map(json.dumps, narrow[panel]))
+            ]
+            narrow_total = sum(point['total_requests'] for point in narrow['time_series'])
+            if narrow_total != full['metrics_summary']['total_requests']:
+                mismatched.append('time_series')
+
+            if not mismatched:
+                self.log_test("Narrow rollups", True, f"Panels of service '{services[0]}' match the full rollup")
+            else:
+                self.log_test("Narrow rollups", False, f"Panels differ from the full rollup: {mismatched}")
+
+        except Exception as e:
+            self.log_test("Narrow rollups", False, f"Exception: {str(e)}")
+
+    def test_dimension_catalog(self):
+        """Test dimension value search with prefix and service filters"""
+        print("\n📇 Testing dimension catalog...")
+
+        # Use the first valid user API key
+        api_key = list(VALID_USER_API_KEYS.values())[0]
+        headers = {"X-API-Key": api_key}
+
+        try:
+            response = self.session.get(METRICS_DIMENSIONS_ENDPOINT, headers=headers, params={"dimension": "service"})
+            if response.status_code != 200:
+                self.log_test("Dimension catalog", False, f"Status {response.status_code}: {response.text}")
+                return
+
+            values = response.json()['values']
+            if any(item['first_seen'] > item['last_seen'] for item in values):
+                self.log_test("Dimension catalog", False, f"first_seen after last_seen: {values}")
+            elif [item['value'] for item in values] != sorted(item['value'] for item in values):
+                self.log_test("Dimension catalog", False, "Values are not sorted")
+            else:
+                self.log_test("Dimension catalog", True, f"Listed {len(values)} services")
+
+            if values:
+                service = values[0]['value']
+                response = self.session.get(
+                    METRICS_DIMENSIONS_ENDPOINT,
+                    headers=headers,
+                    params={"dimension": "service", "prefix": service[:2]}
+                )
+                matched = [item['value'] for item in response.json()['values']]
+                if service in matched and all(value.startswith(service[:2]) for value in matched):
+                    self.log_test("Dimension prefix search", True, f"Prefix '{service[:2]}' matched {len(matched)} values")
+                else:
+                    self.log_test("Dimension prefix search", False, f"Unexpected matches: {matched}")
+
+                response = self.session.get(
+                    METRICS_DIMENSIONS_ENDPOINT,
+                    headers=headers,
+                    params={"dimension": "endpoint", "service": service, "limit": 5}
+                )
+                if response.status_code == 200 and len(response.json()['values']) <= 5:
+                    self.log_test("Dimension values per service", True, f"Listed endpoints of '{service}'")
+                else:
+                    self.log_test("Dimension values per service", False, f"Status {response.status_code}: {response.text}")
+
+        except Exception as e:
+            self.log_test("Dimension catalog", False, f"Exception: {str(e)}")
+
+        try:
+            response = self.session.get(METRICS_DIMENSIONS_ENDPOINT, headers=headers, params={"dimension": "status"})
+
+            if response.status_code == 422:
+                self.log_test("Invalid dimension", True, "Correctly rejected with 422 status")
+            else:
+                self.log_test("Invalid dimension", False, f"Expected 422, got {response.status_code}: {response.text}")
+
+        except Exception as e:
+            self.log_test("Invalid dimension", False, f"Exception: {str(e)}")
+
+    def test_distinct_lists_ignore_own_filter(self):
+        """Test that the node list is not narrowed down by the node filter itself"""
+        print("\n🔀 Testing filter value lists...")
+
+        # Use the first valid user API key
+        api_key = list(VALID_USER_API_KEYS.values())[0]
+        headers = {"X-API-Key": api_key}
+        params = {"interval": "1hour", "panels": "distinct_nodes"}
+
+        try:
+            nodes = self.session.get(METRICS_AGGREGATE_ENDPOINT, headers=headers, params=params).json()['distinct_nodes']
+            if len(nodes) < 2:
+                self.log_test("Node list with node filter", True, f"Skipped, only {len(nodes)} nodes stored")
+                return
+
+            response = self.session.get(METRICS_AGGREGATE_ENDPOINT, headers=headers, params={**params, "node": nodes[0]})
+            filtered = response.json()['distinct_nodes'] if response.status_code == 200 else []
+            if response.status_code == 200 and set(filtered) == set(nodes):
+                self.log_test("Node list with node filter", True, f"All {len(nodes)} nodes still listed")
+            else:
+                self.log_test("Node list with node filter", False, f"Status {response.status_code}, listed {filtered}")
+
+        except Exception as e:
+            self.log_test("Node list with node filter", False, f"Exception: {str(e)}")
+    
+    def test_stitched_fresh_data(self):
+        """Test that rollup tier queries include requests that are not materialized yet"""
+        print("\n🧵 Testing tier stitching...")
+
+        # Use the first valid user and service API keys
+        headers = {"X-API-Key": list(VALID_USER_API_KEYS.values())[0]}
+        service_name, service_key = next(iter(VALID_SERVICE_API_KEYS.items()))
+        params = {
+            "service": service_name,
+            "interval": "1hour",
+            "start_time": (datetime.utcnow() - timedelta(days=1)).isoformat(),
+            "panels": "metrics_summary"
+        }
+
+        def total_requests():
+            # Bypass cached results, which would hide the new requests
+            self.session.delete(ADMIN_CACHE_ENDPOINT, headers=headers)
+            response = self.session.get(METRICS_AGGREGATE_ENDPOINT, headers=headers, params=params)
+            response.raise_for_status()
+            return response.json()['metrics_summary']['total_requests']
+
+        try:
+            before = total_requests()
+            payload = {"requests": [{
+                "service": service_name,
+                "node": "stitch-node",
+                "method": "GET",
+                "endpoint": "/api/v1/stitch",
+                "status": 200,
+                "response_time": 42,
+                "consumer": "stitch-consumer",
+                "created_at": datetime.utcnow().isoformat()
+            } for _ in range(3)]}
+            response = self.session.post(INGEST_ENDPOINT, json=payload, headers={"X-API-Key": service_key})
+            if response.status_code != 200:
+                self.log_test("Tier stitching", False, f"Ingest failed with {response.status_code}: {response.text}")
+                return
+
+            after = total_requests()
+            if after >= before + 3:
+                self.log_test("Tier stitching", True, f"New requests visible right away ({before} -> {after})")
+            else:
+                self.log_test("Tier stitching", False, f"Expected at least {before + 3} requests, got {after}")
+
+        except Exception as e:
+            self.log_test("Tier stitching", False, f"Exception: {str(e)}")
+    
+    def test_backdated_ingest(self):
+        """Test that a row older than the raw retention does not shrink existing aggregates"""
+        print("\n⏪ Testing backdated ingest...")
+
+        # Use the first valid user and service API keys
+        headers = {"X-API-Key": list(VALID_USER_API_KEYS.values())[0]}
+        service_name, service_key = next(iter(VALID_SERVICE_API_KEYS.items()))
+        backdated = datetime.utcnow() - timedelta(days=9)
+        params = {
+            "service": service_name,
+            "interval": "1hour",
+            "start_time": (backdated - timedelta(days=1)).isoformat(),
+            "end_time": (backdated + timedelta(days=1)).isoformat(),
+            "panels": "metrics_summary"
+        }
+
+        def total_requests():
+            # Bypass cached results, which would hide a refreshed bucket
+            self.session.delete(ADMIN_CACHE_ENDPOINT, headers=headers)
+            response = self.session.get(METRICS_AGGREGATE_ENDPOINT, headers=headers, params=params)
+            response.raise_for_status()
+            return response.json()['metrics_summary']['total_requests']
+
+        try:
+            before = total_requests()
+            payload = {"requests": [{
+                "service": service_name,
+                "node": "backdated-node",
+                "method": "GET",
+                "endpoint": "/api/v1/backdated",
+                "status": 200,
+                "response_time": 23,
+                "created_at": backdated.isoformat()
+            }]}
+            response = self.session.post(INGEST_ENDPOINT, json=payload, headers={"X-API-Key": service_key})
+            if response.status_code != 200:
+                self.log_test("Backdated ingest", False, f"Ingest failed with {response.status_code}: {response.text}")
+                return
+
+            # Give the targeted refresh a cycle to pick the row up
+            time.sleep(REFRESH_WAIT_SECONDS)
+            after = total_requests()
+            if after >= before:
+                self.log_test("Backdated ingest", True, f"Aggregates kept their history ({before} -> {after})")
+            else:
+                self.log_test("Backdated ingest", False, f"Aggregates shrank from {before} to {after} requests")
+
+            stats = self.session.get(ADMIN_REFRESH_ENDPOINT, headers=headers).json()
+            skipped = sum(view['skipped_buckets'] for view in stats['views'])
+            if skipped > 0:
+                self.log_test("Backdated buckets skipped", True, f"{skipped} buckets past the refresh horizon")
+            else:
+                self.log_test("Backdated buckets skipped", False, f"Unexpected refresh stats: {stats}")
+
+        except Exception as e:
+            self.log_test("Backdated ingest", False, f"Exception: {str(e)}")
+    
+    def test_columnar_format(self):
+        """Test the columnar time series encoding and MessagePack negotiation"""
+        print("\n🧮 Testing columnar format...")
+
+        # Use the first valid user API key
+        api_key = list(VALID_USER_API_KEYS.values())[0]
+        headers = {"X-API-Key": api_key}
+
+        # A closed range, so both requests see the same data
+        end_time = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+        params = {
+            "interval": "1hour",
+            "start_time": (end_time - timedelta(days=1)).isoformat(),
+            "end_time": end_time.isoformat(),
+            "panels": "time_series"
+        }
+
+        try:
+            rows = self.session.get(METRICS_AGGREGATE_ENDPOINT, headers=headers, params=params)
+            columnar = self.session.get(METRICS_AGGREGATE_ENDPOINT, headers=headers, params={**params, "format": "columnar"})
+
+            if rows.status_code != 200 or columnar.status_code != 200:
+                self.log_test("Columnar time series", False, f"Status {rows.status_code}/{columnar.status_code}: {columnar.text}")
+            else:
+                points = rows.json()['time_series']
+                series = columnar.json()['time_series']
+                matches = series['count'] == len(points) and all(
+                    series[name] == [point[name] for point in points]
+                    for name in ('total_requests', 'avg_latency', 'p99_latency', 'max_latency')
+                )
+                if matches and series['step_seconds'] == 3600:
+                    self.log_test("Columnar time series", True, f"{series['count']} buckets, {len(columnar.content)} vs {len(rows.content)} bytes")
+                else:
+                    self.log_test("Columnar time series", False, f"Columns differ from rows: {series}")
+
+        except Exception as e:
+            self.log_test("Columnar time series", False, f"Exception: {str(e)}")
+
+        try:
+            response = self.session.get(METRICS_AGGREGATE_ENDPOINT, headers=headers, params={"format": "csv"})
+
+            if response.status_code == 422:
+                self.log_test("Invalid format", True, "Correctly rejected with 422 status")
+            else:
+                self.log_test("Invalid format", False, f"Expected 422, got {response.status_code}: {response.text}")
+
+        except Exception as e:
+            self.log_test("Invalid format", False, f"Exception: {str(e)}")
+
+        try:
+            response = self.session.get(
+                METRICS_AGGREGATE_ENDPOINT, headers={**headers, "Accept": "application/msgpack"}, params=params
+            )
+            content_type = response.headers.get("content-type", "")
+
+            if response.status_code != 200:
+                self.log_test("MessagePack negotiation", False, f"Status {response.status_code}: {response.text}")
+            elif content_type.startswith("application/msgpack") or content_type.startswith("application/json"):
+                # The server falls back to JSON when msgpack is not installed
+                self.log_test("MessagePack negotiation", True, f"Content-Type {content_type}")
+            else:
+                self.log_test("MessagePack negotiation", False, f"Unexpected Content-Type {content_type}")
+
+        except Exception as e:
+            self.log_test("MessagePack negotiation", False, f"Exception: {str(e)}")
+    
+    def test_max_points(self):
+        """Test that max_points re-buckets the time series without changing totals"""
+        print("\n📏 Testing max_points...")
+
+        # Use the first valid user API key
+        api_key = list(VALID_USER_API_KEYS.values())[0]
+        headers = {"X-API-Key": api_key}
+
+        # A closed range, so both requests see the same data
+        end_time = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+        params = {
+            "interval": "1hour",
+            "start_time": (end_time - timedelta(days=1)).isoformat(),
+            "end_time": end_time.isoformat(),
+            "panels": "time_series,metrics_summary"
+        }
+
+        try:
+            hourly = self.session.get(METRICS_AGGREGATE_ENDPOINT, headers=headers, params=params)
+            limited = self.session.get(METRICS_AGGREGATE_ENDPOINT, headers=headers, params={**params, "max_points": 6})
+
+            if hourly.status_code != 200 or limited.status_code != 200:
+                self.log_test("max_points", False, f"Status {hourly.status_code}/{limited.status_code}: {limited.text}")
+            else:
+                hourly_data, limited_data = hourly.json(), limited.json()
+                points = limited_data['time_series']
+                steps = {
+                    (datetime.fromisoformat(b['bucket'].replace('Z', '+00:00')) -
+                     datetime.fromisoformat(a['bucket'].replace('Z', '+00:00')))
+                    for a, b in zip(points, points[1:])
+                }
+                totals_match = sum(point['total_requests'] for point in points) == \
+                    sum(point['total_requests'] for point in hourly_data['time_series']) == \
+                    limited_data['metrics_summary']['total_requests']
+                if len(points) <= 6 and steps <= {timedelta(hours=6)} and totals_match:
+                    self.log_test("max_points", True, f"{len(hourly_data['time_series'])} hourly buckets re-bucketed to {len(points)}")
+                else:
+                    self.log_test("max_points", False, f"{len(points)} buckets with steps {steps}, totals match: {totals_match}")
+
+        except Exception as e:
+            self.log_test("max_points", False, f"Exception: {str(e)}")
+
+        try:
+            response = self.session.get(METRICS_AGGREGATE_ENDPOINT, headers=headers, params={"max_points": 0})
+
+            if response.status_code == 422:
+                self.log_test("Invalid max_points", True, "Correctly rejected with 422 status")
+            else:
+                self.log_test("Invalid max_points", False, f"Expected 422, got {response.status_code}: {response.text}")
+
+        except Exception as e:
+            self.log_test("Invalid max_points", False, f"Exception: {str(e)}")
+    
+    def test_top_k(self):
+        """Test top_k limits with the (other) item and cursor pagination"""
+        print("\n🔝 Testing top_k...")
+
+        # Use the first valid user API key
+        api_key = list(VALID_USER_API_KEYS.values())[0]
+        headers = {"X-API-Key": api_key}
+
+        # A closed range, so all requests see the same data
+        end_time = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+        params = {
+            "interval": "1hour",
+            "start_time": (end_time - timedelta(days=1)).isoformat(),
+            "end_time": end_time.isoformat()
+        }
+
+        try:
+            full = self.session.get(
+                METRICS_AGGREGATE_ENDPOINT, headers=headers, params={**params, "panels": "endpoints,system_overview"}
+            )
+            limited = self.session.get(
+                METRICS_AGGREGATE_ENDPOINT, headers=headers,
+                params={**params, "panels": "endpoints,system_overview", "top_k": 1}
+            )
+
+            if full.status_code != 200 or limited.status_code != 200:
+                self.log_test("top_k", False, f"Status {full.status_code}/{limited.status_code}: {limited.text}")
+            else:
+                full_items, limited_items = full.json()['endpoints'], limited.json()['endpoints']
+                totals_match = sum(item['total_requests'] for item in full_items) == \
+                    sum(item['total_requests'] for item in limited_items)
+                overview_match = full.json()['system_overview'] == limited.json()['system_overview']
+                expected = 2 if len(full_items) > 1 else len(full_items)
+                if len(limited_items) == expected and totals_match and overview_match and \
+                        (len(full_items) <= 1 or limited_items[-1]['is_other']):
+                    self.log_test("top_k", True, f"{len(full_items)} endpoints cut to {len(limited_items)} items")
+                else:
+                    self.log_test("top_k", False, f"Unexpected items: {limited_items}")
+
+        except Exception as e:
+            self.log_test("top_k", False, f"Exception: {str(e)}")
+
+        try:
+            full = self.session.get(f"{METRICS_PANELS_ENDPOINT}/endpoints", headers=headers, params=params)
+            pages, cursor = [], None
+            while len(pages) <= len(full.json()):
+                page_params = {**params, "top_k": 2, **({"cursor": cursor} if cursor else {})}
+                response = self.session.get(f"{METRICS_PANELS_ENDPOINT}/endpoints", headers=headers, params=page_params)
+                if response.status_code != 200:
+                    break
+                pages.extend(item for item in response.json() if not item['is_other'])
+                cursor = response.headers.get("X-Next-Cursor")
+                if not cursor:
+                    break
+
+            if pages == full.json():
+                self.log_test("Cursor pagination", True, f"{len(pages)} endpoints in pages of 2")
+            else:
+                self.log_test("Cursor pagination", False, f"Pages hold {len(pages)} endpoints, expected {len(full.json())}")
+
+        except Exception as e:
+            self.log_test("Cursor pagination", False, f"Exception: {str(e)}")
+
+        try:
+            response = self.session.get(f"{METRICS_PANELS_ENDPOINT}/endpoints", headers=headers, params={"cursor": "x"})
+
+            if response.status_code == 422:
+                self.log_test("Cursor without top_k", True, "Correctly rejected with 422 status")
+            else:
+                self.log_test("Cursor without top_k", False, f"Expected 422, got {response.status_code}: {response.text}")
+
+        except Exception as e:
+            self.log_test("Cursor without top_k", False, f"Exception: {str(e)}")
+    
+    def test_etag(self):
+        """Test ETag validation with 304 responses and new ETags after ingest"""
+        print("\n🏷️  Testing ETags...")
+
+        # Use the first valid user and service API keys
+        headers = {"X-API-Key": list(VALID_USER_API_KEYS.values())[0]}
+        service_name, service_key = next(iter(VALID_SERVICE_API_KEYS.items()))
+        params = {"service": service_name, "interval": "1hour", "panels": "metrics_summary"}
+
+        try:
+            response = self.session.get(METRICS_AGGREGATE_ENDPOINT, headers=headers, params=params)
+            etag = response.headers.get("ETag")
+            if response.status_code != 200 or not etag or "max-age" not in response.headers.get("Cache-Control", ""):
+                self.log_test("ETag", False, f"Status {response.status_code}, headers {dict(response.headers)}")
+                return
+
+            response = self.session.get(METRICS_AGGREGATE_ENDPOINT, headers={**headers, "If-None-Match": etag}, params=params)
+            if response.status_code == 304 and not response.content:
+                self.log_test("ETag", True, "Unchanged data answered with 304")
+            else:
+                self.log_test("ETag", False, f"Expected 304, got {response.status_code}")
+
+            payload = {"requests": [{
+                "service": service_name,
+                "node": "etag-node",
+                "method": "GET",
+                "endpoint": "/api/v1/etag",
+                "status": 200,
+                "response_time": 17,
+                "created_at": datetime.utcnow().isoformat()
+            }]}
+            ingest = self.session.post(INGEST_ENDPOINT, json=payload, headers={"X-API-Key": service_key})
+            if ingest.status_code != 200:
+                self.log_test("ETag after ingest", False, f"Ingest failed with {ingest.status_code}: {ingest.text}")
+                return
+
+            response = self.session.get(METRICS_AGGREGATE_ENDPOINT, headers={**headers, "If-None-Match": etag}, params=params)
+            if response.status_code == 200 and response.headers.get("ETag") != etag:
+                self.log_test("ETag after ingest", True, "New data produced a new ETag")
+            else:
+                self.log_test("ETag after ingest", False, f"Expected 200 with a new ETag, got {response.status_code}")
+
+        except Exception as e:
+            self.log_test("ETag", False, f"Exception: {str(e)}")
+    
+    def test_delta_refresh(self):
+        """Test that a since cursor returns only the buckets after it with full summaries"""
+        print("\n🔁 Testing delta refresh...")
+
+        # Use the first valid user API key
+        api_key = list(VALID_USER_API_KEYS.values())[0]
+        headers = {"X-API-Key": api_key}
+
+        try:
+            full = self.session.get(METRICS_REALTIME_ENDPOINT, headers=headers)
+            cursor = full.headers.get("X-Delta-Cursor")
+            delta = self.session.get(METRICS_REALTIME_ENDPOINT, headers=headers, params={"since": cursor})
+
+            if full.status_code != 200 or delta.status_code != 200 or not cursor:
+                self.log_test("Delta refresh", False, f"Status {full.status_code}/{delta.status_code}, cursor {cursor}")
+            else:
+                full_buckets = [point['bucket'] for point in full.json()['time_series']]
+                delta_buckets = [point['bucket'] for point in delta.json()['time_series']]
+                if delta_buckets and len(delta_buckets) < len(full_buckets) and delta.json()['metrics_summary'] \
+                        and delta_buckets[0] in full_buckets and delta.headers.get("X-Delta-Cursor"):
+                    self.log_test("Delta refresh", True, f"{len(delta_buckets)} of {len(full_buckets)} buckets sent again")
+                else:
+                    self.log_test("Delta refresh", False, f"Unexpected delta buckets: {delta_buckets}")
+
+            # A realtime cursor does not fit the 5-minute tier
+            response = self.session.get(METRICS_AGGREGATE_ENDPOINT, headers=headers, params={"since": cursor})
+            if response.status_code == 422:
+                self.log_test("Delta cursor of another width", True, "Rejected with 422")
+            else:
+                self.log_test("Delta cursor of another width", False, f"Expected 422, got {response.status_code}")
+
+        except Exception as e:
+            self.log_test("Delta refresh", False, f"Exception: {str(e)}")
+    
+    def test_delta_refresh_cached(self):
+        """Test that since works on payloads served from the result cache, including the redis backend"""
+        print("\n🗄️ Testing delta refresh from the result cache...")
+
+        # Use the first valid user API key
+        api_key = list(VALID_USER_API_KEYS.values())[0]
+        headers = {"X-API-Key": api_key}
+
+        try:
+            backend = self.session.get(ADMIN_CACHE_ENDPOINT, headers=headers).json()['backend']
+            cursor = self.session.get(METRICS_REALTIME_ENDPOINT, headers=headers).headers.get("X-Delta-Cursor")
+
+            # The first request fills the cache, the second trims the cached payload
+            responses = [
+                self.session.get(METRICS_REALTIME_ENDPOINT, headers=headers, params={"since": cursor})
+                for _ in range(2)
+            ]
+            if any(response.status_code != 200 for response in responses):
+                self.log_test(f"Cached delta refresh ({backend})", False, f"Status {[r.status_code for r in responses]}")
+            elif responses[0].json()['time_series'] == responses[1].json()['time_series']:
+                self.log_test(f"Cached delta refresh ({backend})", True, "Cached payload trimmed like a fresh one")
+            else:
+                self.log_test(f"Cached delta refresh ({backend})", False, "Cached and fresh delta buckets differ")
+
+        except Exception as e:
+            self.log_test("Cached delta refresh", False, f"Exception: {str(e)}")
+    
+    def test_query_governance(self):
+        """Test that long unfiltered ranges are served from coarser tiers or rejected, never failed"""
+        print("\n🛡️ Testing query governance...")
+
+        # Use the first valid user API key
+        api_key = list(VALID_USER_API_KEYS.values())[0]
+        headers = {"X-API-Key": api_key}
+        end_time = datetime.utcnow()
+        params = {
+            "interval": "1hour",
+            "start_time": (end_time - timedelta(days=365)).isoformat(),
+            "end_time": end_time.isoformat()
+        }
+
+        try:
+            response = self.session.get(METRICS_AGGREGATE_ENDPOINT, headers=headers, params=params)
+            if response.status_code == 200:
+                self.log_test("Query governance", True, f"Served {len(response.json()['time_series'])} buckets")
+            elif response.status_code == 422 and "too expensive" in response.json().get("detail", ""):
+                self.log_test("Query governance", True, "Rejected by the cost guard")
+            else:
+                self.log_test("Query governance", False, f"Status {response.status_code}: {response.text}")
+
+        except Exception as e:
+            self.log_test("Query governance", False, f"Exception: {str(e)}")
+    
+    def test_realtime_stream(self):
+        """Test that realtime streams with the same filters share one computation"""
+        print("\n📡 Testing realtime stream...")
+
+        # Use the first valid user API key
+        api_key = list(VALID_USER_API_KEYS.values())[0]
+        headers = {"X-API-Key": api_key}
+        params = {"service": next(iter(VALID_SERVICE_API_KEYS))}
+
+        def first_event(response):
+            lines = []
+            for line in response.iter_lines(decode_unicode=True):
+                if not line:
+                    if any(l.startswith("event:") for l in lines):
+                        break
+                    lines = []
+                    continue
+                lines.append(line)
+            event = next(l.split(":", 1)[1].strip() for l in lines if l.startswith("event:"))
+            data = json.loads(next(l.split(":", 1)[1] for l in lines if l.startswith("data:")))
+            return event, data
+
+        streams = []
+        try:
+            for _ in range(2):
+                streams.append(requests.get(METRICS_STREAM_ENDPOINT, headers=headers, params=params, stream=True, timeout=30))
+
+            events = [first_event(stream) for stream in streams]
+            if any(stream.status_code != 200 for stream in streams):
+                self.log_test("Realtime stream", False, f"Status {[stream.status_code for stream in streams]}")
+            elif all(event == "snapshot" and isinstance(data.get('time_series'), list) for event, data in events):
+                self.log_test("Realtime stream", True, f"Snapshots with {len(events[0][1]['time_series'])} buckets")
+            else:
+                self.log_test("Realtime stream", False, f"Unexpected first events: {[event for event, _ in events]}")
+
+            stats = self.session.get(ADMIN_STREAM_ENDPOINT, headers=headers).json()
+            if stats['subscribers'] >= 2 and stats['channels'] < stats['subscribers']:
+                self.log_test("Shared stream computation", True, f"{stats['subscribers']} subscribers on {stats['channels']} channels")
+            else:
+                self.log_test("Shared stream computation", False, f"Unexpected stream stats: {stats}")
+
+        except Exception as e:
+            self.log_test("Realtime stream", False, f"Exception: {str(e)}")
+        finally:
+            for stream in streams:
+                stream.close()
+    
     def run_all_tests(self):
         """Run all metrics endpoint tests"""
         print("🚀 Starting Metrics Endpoints Tests")
@@ -574,6 +1339,22 @@ class TestMetricsEndpoints:
         self.test_realtime_endpoint()
         self.test_realtime_endpoint_time_limits()
         self.test_realtime_endpoint_authentication()
+        self.test_exemplars_endpoint()
+        self.test_panel_selection()
+        self.test_latency_percentiles()
+        self.test_narrow_rollups()
+        self.test_dimension_catalog()
+        self.test_distinct_lists_ignore_own_filter()
+        self.test_stitched_fresh_data()
+        self.test_backdated_ingest()
+        self.test_columnar_format()
+        self.test_max_points()
+        self.test_top_k()
+        self.test_etag()
+        self.test_delta_refresh()
+        self.test_delta_refresh_cached()
+        self.test_query_governance()
+        self.test_realtime_stream()
         
         # Summary
         passed = sum(1 for result in self.test_results if result["success"])